@@ -0,0 +1,175 @@
+"""Asyncio variant of ShopFlow.
+
+Every stage is a coroutine. Agent tasks and LLM calls run in the default
+thread pool and are awaited, and prompts are awaited through ``ask_async``, so
+a single event loop can drive many shopping sessions at once. Within a session,
+independent work overlaps: the no-results suggestions are requested alongside
+the Catalog agent's search.
+"""
+import asyncio
+import inspect
+
+from crewai.flow.flow import listen, start
+
+from my_shopping_agent.llm import ProviderUnavailable
+from my_shopping_agent.main import ShopFlow
+from my_shopping_agent.telemetry import span
+
+
+# Worker threads for blocking agent and LLM calls, shared by all flows on a loop
+DEFAULT_MAX_WORKERS = 64
+
+
+class AsyncShopFlow(ShopFlow):
+    """ShopFlow whose stages can be awaited side by side with other flows.
+
+    Each stage is redeclared as a coroutine. The shopper's dialogs, parsing and
+    printing are shared with ``ShopFlow``; only the extraction and search
+    stages, whose agent calls can overlap, have their own code.
+    """
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._suggestions_agent = None
+
+    async def ask_async(self, prompt):
+        """Await the shopper's answer; reads the terminal without blocking the loop."""
+        return await asyncio.to_thread(self.ask, prompt)
+
+    async def _converse_async(self, dialog):
+        """``_converse`` on the event loop: prompts go through ``ask_async``, blocking work to a worker thread."""
+        try:
+            step = next(dialog)
+            while True:
+                if isinstance(step, str):
+                    answer = await self.ask_async(step)
+                elif inspect.iscoroutinefunction(step):
+                    answer = await step()
+                else:
+                    answer = await asyncio.to_thread(step)
+                step = dialog.send(answer)
+        except StopIteration as end:
+            return end.value
+
+    async def _execute(self, agent_name, agent_factory, task_factory, *args):
+        """Build the agent and task and run the task in a worker thread.
+
+        ``agent_name`` picks the agent's time budget and circuit breaker.
+        """
+        return await asyncio.to_thread(lambda: self._run_task(agent_name, agent_factory(), task_factory(*args)))
+
+    def _suggestions_catalog(self):
+        # Runs alongside the Catalog agent's search, so it needs its own agent
+        if self._suggestions_agent is None:
+            self._suggestions_agent = self.shop_crew.Catalog().copy()
+        return self._suggestions_agent
+
+    @start()
+    async def interaction_with_user(self):
+        """Get the user's shopping query."""
+        print("Welcome to our Agentic AI Shopping Mart!")
+        user_input = await self.ask_async("What would you like to shop for today? ")
+        return user_input
+
+    @listen(interaction_with_user)
+    async def extract_shopping_details(self, user_input):
+        """Extract shopping details from the user query."""
+        print("Analyzing your shopping needs...")
+
+        self._prefetch = None
+        shopping_details = self._known_shopping_details(user_input)
+        if shopping_details is not None:
+            return shopping_details
+
+        print("Extracting details...")
+        self._start_prefetch(user_input)
+
+        try:
+            result = await self._execute("Orchestrator", self.shop_crew.Orchestrator, self._extraction_task, user_input)
+        except ProviderUnavailable as e:
+            return self._fallback_shopping_details(user_input, e)
+        return self._parse_shopping_details(result, user_input)
+
+    @listen(extract_shopping_details)
+    async def search_product_catalog(self, shopping_details):
+        """Find matching products, asking for suggestions at the same time."""
+        print("Searching product catalog for matching items...")
+
+        product_name, search_criteria_text = self._search_criteria(shopping_details)
+        wants_suggestions = product_name and product_name != "unknown product"
+        suggestions_call = None
+
+        try:
+            if self.use_llm_scoring:
+                # The agent's search is slow enough to hide the suggestions call behind it
+                if wants_suggestions:
+                    suggestions_call = asyncio.ensure_future(
+                        self._execute("Catalog", self._suggestions_catalog, self._suggestions_task, product_name)
+                    )
+                    # Unused results and errors are dropped without a warning
+                    suggestions_call.add_done_callback(lambda call: call.cancelled() or call.exception())
+                matching_products = await asyncio.to_thread(self._llm_match_products, search_criteria_text, shopping_details)
+            else:
+                # The local search takes milliseconds; only ask for suggestions if it finds nothing
+                matching_products = await asyncio.to_thread(self._score_locally, shopping_details)
+                if matching_products["products"]:
+                    await self._explain_matches_async(matching_products, search_criteria_text)
+
+            matching_products = self._finalize_matches(matching_products)
+            self._add_facet_counts(shopping_details, matching_products)
+            if matching_products["products"]:
+                # The suggestions are not needed; let the call finish in the background
+                await self._converse_async(self._product_menu(matching_products))
+            else:
+                suggestions = []
+                if wants_suggestions:
+                    if suggestions_call is None:
+                        suggestions_call = self._execute("Catalog", self.shop_crew.Catalog, self._suggestions_task, product_name)
+                    try:
+                        suggestions = self._parse_suggestions(await suggestions_call)
+                    except ProviderUnavailable as e:
+                        print(f"No suggestions available: {e}")
+                self._report_suggestions(matching_products, suggestions)
+
+            return self._search_result(shopping_details, matching_products)
+
+        except Exception as e:
+            return self._search_error(shopping_details, e)
+
+    async def _explain_matches_async(self, matching_products, search_criteria_text):
+        try:
+            prompt = self._explanation_prompt(matching_products, search_criteria_text)
+            result = await asyncio.to_thread(self._explain, prompt)
+            self._apply_explanation(matching_products, result)
+        except Exception as e:
+            # The deterministic reasoning is already in place
+            print(f"Could not generate match explanations: {str(e)}")
+
+    @listen(search_product_catalog)
+    async def handle_product_selection(self, search_results):
+        """Handle the next steps after product search results."""
+        return await self._converse_async(self._selection_dialog(search_results))
+
+    @listen(handle_product_selection)
+    async def save_cart_to_file(self, selection_result):
+        """Save the purchase to the order ledger."""
+        return await asyncio.to_thread(super().save_cart_to_file, selection_result)
+
+    @listen(save_cart_to_file)
+    async def complete_shopping_session(self, cart_result):
+        """Complete the shopping session and provide summary."""
+        return await self._converse_async(self._session_dialog(cart_result))
+
+    async def _run_stage(self, stage, *args):
+        with span(stage.__name__, kind="stage"):
+            result = await stage(*args)
+        await asyncio.to_thread(self._checkpoint, stage.__name__, result)
+        return result
+
+    async def _shop_again(self):
+        """Run the stages from the shopping query to saving the order once more."""
+        result = await self._run_stage(self.interaction_with_user)
+        for stage in (self.extract_shopping_details, self.search_product_catalog,
+                      self.handle_product_selection, self.save_cart_to_file):
+            result = await self._run_stage(stage, result)
+        return result
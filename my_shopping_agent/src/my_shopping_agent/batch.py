@@ -0,0 +1,163 @@
+"""Headless batch runs of ShopFlow.
+
+Replays a JSONL file of shopper scripts, one session per line, on a process
+pool and writes one JSON result per session. A script holds the query and the
+answers to every later prompt, in the order the flow asks them:
+
+    {"id": "laptop-buy", "query": "I want a laptop under 500",
+     "answers": ["1", "1", "y", "Ann Lee", "1 Main St", "555-0100", "Visa", "4111", "n"]}
+
+Run ``batch scripts.jsonl -o results.jsonl --workers 8``.
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, Optional
+
+from my_shopping_agent.catalog import DEFAULT_CANDIDATES
+from my_shopping_agent.main import ShopFlow
+
+
+DEFAULT_WORKERS = 4
+
+
+class ScriptExhausted(EOFError):
+    """The flow asked more questions than the script answers."""
+
+
+class IncompleteSession(RuntimeError):
+    """The flow ended without its session summary, or before using every answer."""
+
+
+class ScriptedShopFlow(ShopFlow):
+    """ShopFlow that answers its prompts from a script instead of the terminal."""
+
+    def __init__(self, answers: List[str], **options):
+        super().__init__(**options)
+        self.answers = list(answers)
+        self.transcript: List[Dict[str, str]] = []
+        # Flow swallows errors raised inside listeners, so remember the first one
+        self.error: Optional[BaseException] = None
+
+    async def _execute_method(self, method_name, method, *args, **kwargs):
+        try:
+            return await super()._execute_method(method_name, method, *args, **kwargs)
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            raise
+
+    def ask(self, prompt):
+        if not self.answers:
+            raise ScriptExhausted(f"No scripted answer for prompt: {prompt.strip()}")
+        answer = str(self.answers.pop(0))
+        self.transcript.append({"prompt": prompt.strip(), "answer": answer})
+        return answer
+
+
+def read_scripts(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the scripts in a JSONL file, numbering the ones without an id."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            script = json.loads(line)
+            script.setdefault("id", str(line_number))
+            yield script
+
+
+def run_script(script: Dict[str, Any], flow_options: Dict[str, Any], keep_output: bool = False) -> Dict[str, Any]:
+    """Run one scripted session and describe how it went."""
+    flow = ScriptedShopFlow([script["query"], *script.get("answers", [])], **flow_options)
+    flow.trace_id = f"batch-{script['id']}"
+    output = io.StringIO()
+    started = time.perf_counter()
+    record: Dict[str, Any] = {"id": script["id"], "query": script["query"]}
+    try:
+        with contextlib.redirect_stdout(output):
+            record["result"] = flow.kickoff()
+        if flow.error is not None:
+            raise flow.error
+        if not (isinstance(record["result"], dict) and "session_status" in record["result"]):
+            raise IncompleteSession("the flow ended before its session summary")
+        if flow.answers:
+            raise IncompleteSession(f"the flow ended with {len(flow.answers)} answer(s) unused")
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    record["prompts"] = len(flow.transcript)
+    record["unused_answers"] = len(flow.answers)
+    if flow.trace is not None:
+        record["trace_id"] = flow.trace.trace_id
+    if keep_output:
+        record["transcript"] = flow.transcript
+        record["output"] = output.getvalue()
+    return record
+
+
+def run_batch(scripts, out, workers: int = DEFAULT_WORKERS, keep_output: bool = False, **flow_options) -> Dict[str, Any]:
+    """
+    Run scripts on a process pool, writing each result to ``out`` as it finishes.
+
+    Returns:
+        Counts and timings for the whole batch
+    """
+    started = time.perf_counter()
+    counts = {"ok": 0, "error": 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        runs = [pool.submit(run_script, script, flow_options, keep_output) for script in scripts]
+        for run in as_completed(runs):
+            record = run.result()
+            counts[record["status"]] += 1
+            out.write(json.dumps(record, default=str) + "\n")
+            out.flush()
+    elapsed = time.perf_counter() - started
+    sessions = counts["ok"] + counts["error"]
+    return {
+        "sessions": sessions,
+        "ok": counts["ok"],
+        "errors": counts["error"],
+        "elapsed_seconds": round(elapsed, 3),
+        "sessions_per_second": round(sessions / elapsed, 3) if elapsed else None,
+    }
+
+
+def batch(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay shopper scripts through ShopFlow")
+    parser.add_argument("scripts", help="JSONL file with one shopper script per line")
+    parser.add_argument("-o", "--output", help="where to write the JSONL results (default: stdout)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes")
+    parser.add_argument("--keep-output", action="store_true", help="include each session's transcript and prints")
+    parser.add_argument("--llm-scoring", action="store_true", help="let the Catalog agent score products")
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES,
+                        help="with --llm-scoring, rows the local search picks for the agent to score "
+                             "(0 = let the agent search the whole catalog)")
+    parser.add_argument("--trace-dir", help="write each session's trace JSON to this directory")
+    args = parser.parse_args(argv)
+
+    scripts = list(read_scripts(args.scripts))
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        summary = run_batch(
+            scripts, out, args.workers, args.keep_output,
+            use_llm_scoring=args.llm_scoring, trace_dir=args.trace_dir,
+            catalog_candidates=args.candidates,
+        )
+    finally:
+        if args.output:
+            out.close()
+    print(
+        f"{summary['sessions']} sessions ({summary['errors']} failed) in "
+        f"{summary['elapsed_seconds']}s, {summary['sessions_per_second']} sessions/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    batch()
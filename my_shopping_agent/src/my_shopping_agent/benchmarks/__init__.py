@@ -0,0 +1,9 @@
+from my_shopping_agent.benchmarks.catalogs import generate_catalog
+from my_shopping_agent.benchmarks.stubs import StubAgent, StubCrew, StubLLM
+
+__all__ = [
+    "StubAgent",
+    "StubCrew",
+    "StubLLM",
+    "generate_catalog",
+]
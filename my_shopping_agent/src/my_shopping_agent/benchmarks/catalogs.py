@@ -0,0 +1,71 @@
+"""Synthetic product catalogs shaped like ``knowledge/spreadsheet.xlsx``.
+
+Rows have the real catalog's columns (pd_id, product_name, quality, price).
+Names combine a brand, one of the real catalog's product types and a model
+number, so name lookups hit a realistic number of rows at every size.
+Generation is seeded, so the same size always gives the same catalog.
+"""
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+DEFAULT_CACHE_DIR = Path(".cache") / "benchmarks"
+
+# Product types of the real catalog, with a typical price for each
+PRODUCT_TYPES = {
+    "smart phone": 10000,
+    "LCD": 1000,
+    "Ladies wear": 200,
+    "Mens wear": 800,
+    "Mens watch": 1000,
+    "airbuds": 1500,
+    "Apple Laptop": 20000,
+    "perfume": 9000,
+    "Laptop": 20000,
+    "Ladies watch": 500,
+}
+BRANDS = [
+    "Acme", "Nova", "Zenith", "Orion", "Vertex", "Lumen", "Apex", "Stellar", "Quantum", "Echo",
+    "Pulse", "Summit", "Crest", "Vivid", "Aurora", "Titan", "Nimbus", "Falcon", "Cobalt", "Sierra",
+]
+QUALITIES = ["low", "medium", "high"]
+
+
+def generate_catalog(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A catalog of ``rows`` products."""
+    rng = np.random.default_rng(seed)
+    types = np.array(list(PRODUCT_TYPES))
+    type_index = rng.integers(len(types), size=rows)
+    brands = np.array(BRANDS)[rng.integers(len(BRANDS), size=rows)]
+    models = rng.integers(100, 10000, size=rows)
+    base_prices = np.array(list(PRODUCT_TYPES.values()))[type_index]
+    prices = np.maximum(np.round(base_prices * rng.lognormal(0.0, 0.5, size=rows)), 1).astype(np.int64)
+
+    names = pd.Series(brands).str.cat([pd.Series(types[type_index]), pd.Series(models.astype(str))], sep=" ")
+    return pd.DataFrame({
+        "pd_id": np.arange(1, rows + 1, dtype=np.int64),
+        "product_name": names,
+        "quality": np.array(QUALITIES)[rng.integers(len(QUALITIES), size=rows)],
+        "price": prices,
+    })
+
+
+def catalog_workdir(rows: int, cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR) -> Path:
+    """
+    Working directory holding ``knowledge/spreadsheet.xlsx`` with ``rows`` products.
+
+    The spreadsheet is generated on first use and kept, since writing (and the
+    snapshot built from it on first load) takes minutes at a million rows.
+    """
+    workdir = Path(cache_dir).resolve() / f"catalog-{rows}"
+    catalog_file = workdir / "knowledge" / "spreadsheet.xlsx"
+    if not catalog_file.exists():
+        catalog_file.parent.mkdir(parents=True, exist_ok=True)
+        partial = catalog_file.with_name("spreadsheet.tmp.xlsx")
+        generate_catalog(rows).to_excel(partial, index=False)
+        partial.replace(catalog_file)
+    return workdir
@@ -0,0 +1,221 @@
+"""Per-stage benchmarks of ShopFlow against synthetic catalogs.
+
+For every catalog size, a fresh interpreter is started in a working directory
+holding that catalog and times each stage with stub agents and LLMs (see
+``stubs``). The results are written as JSON and, given a baseline from an
+earlier run, compared stage by stage; the command exits with status 1 when a
+stage got slower than the tolerance allows.
+
+    benchmark --sizes 1000 100000 --output bench.json --save-baseline baseline.json
+    benchmark --sizes 1000 100000 --baseline baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from my_shopping_agent.benchmarks.catalogs import DEFAULT_CACHE_DIR, DEFAULT_SIZES, catalog_workdir
+
+
+DEFAULT_REPEAT = 5
+# A stage regresses when its median is this much slower than the baseline's...
+DEFAULT_TOLERANCE = 0.25
+# ...and at least this many milliseconds slower, so timer noise is ignored
+MIN_REGRESSION_MS = 1.0
+
+QUERY = "I want a high quality laptop under 25000"
+FALLBACK_TEXT = "\n".join(
+    f"Product ID: {i}\nProduct Name: Acme Laptop {i}\nPrice: ${1000 + i}\n"
+    f"Quality: high\nMatch Score: 80\n"
+    for i in range(1, 4)
+) + "Summary: three laptops match"
+
+
+def _time(function: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Run ``function`` ``warmup + repeat`` times; timings of the last ``repeat`` runs in ms."""
+    for _ in range(warmup):
+        function()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3),
+    }
+
+
+def measure_stages(repeat: int = DEFAULT_REPEAT) -> Dict[str, Dict[str, float]]:
+    """Time each stage against the catalog in the current working directory."""
+    from my_shopping_agent.benchmarks.stubs import StubCrew, StubLLM
+    from my_shopping_agent.catalog import get_search_engine
+    from my_shopping_agent.main import ShopFlow
+    from my_shopping_agent.tools.SearchCatalogTool import ProductCatalogTool
+
+    class BenchmarkFlow(ShopFlow):
+        def __init__(self, **options):
+            super().__init__(cache_extractions=False, **options)
+            self.shop_crew = StubCrew()
+            self.stub_llm = StubLLM()
+
+        def ask(self, prompt):
+            return "1"
+
+        def _explanation_llm(self):
+            return self.stub_llm
+
+    timings = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        get_search_engine()
+        timings["catalog_load"] = {"runs": 1, "median_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+        flow = BenchmarkFlow()
+        llm_flow = BenchmarkFlow(fast_path_threshold=None)
+        tool = ProductCatalogTool()
+        shopping_details = flow.extract_shopping_details(QUERY)
+        purchase = {
+            "status": "purchase_complete",
+            "order_id": "ORD-BENCH-1",
+            "product": {"product_id": 1, "product_name": "Acme Laptop 1", "price": 1000, "quality": "high"},
+            "customer": {"name": "Bench Mark", "address": "1 Test St", "phone": "555-0100"},
+            "payment_status": "completed",
+            "shipping_status": "processing",
+            "estimated_delivery": "2026-01-05 to 2026-01-07",
+        }
+
+        stages = {
+            "extract_shopping_details[rule_based]": lambda: flow.extract_shopping_details(QUERY),
+            "extract_shopping_details[llm]": lambda: llm_flow.extract_shopping_details(QUERY),
+            "search_product_catalog": lambda: flow.search_product_catalog(shopping_details),
+            "_fallback_parsing": lambda: flow._fallback_parsing(FALLBACK_TEXT),
+            "ProductCatalogTool._run": lambda: tool._run("laptop", max_price=25000),
+            "save_cart_to_file": lambda: flow.save_cart_to_file(purchase),
+        }
+        for name, stage in stages.items():
+            timings[name] = _time(stage, repeat)
+    return timings
+
+
+def run_size(rows: int, repeat: int = DEFAULT_REPEAT, cache_dir=DEFAULT_CACHE_DIR) -> Dict[str, Any]:
+    """Benchmark one catalog size in a fresh interpreter, so no cache carries over."""
+    workdir = catalog_workdir(rows, cache_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / "stages.json"
+        subprocess.run(
+            [sys.executable, "-m", "my_shopping_agent.benchmarks.runner",
+             "--worker", str(output), "--repeat", str(repeat)],
+            cwd=workdir,
+            check=True,
+        )
+        stages = json.loads(output.read_text())
+    return {"catalog_rows": rows, "stages": stages}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat: int = DEFAULT_REPEAT, cache_dir=DEFAULT_CACHE_DIR) -> Dict[str, Any]:
+    results = {}
+    for rows in sizes:
+        print(f"Benchmarking a {rows:,}-row catalog...")
+        results[str(rows)] = run_size(rows, repeat, cache_dir)
+    return {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_regression_ms: float = MIN_REGRESSION_MS,
+) -> List[Dict[str, Any]]:
+    """Stage-by-stage median comparison for the sizes and stages both runs have."""
+    rows = []
+    for size, result in current["results"].items():
+        baseline_stages = baseline.get("results", {}).get(size, {}).get("stages", {})
+        for stage, timing in result["stages"].items():
+            if stage not in baseline_stages:
+                continue
+            before = baseline_stages[stage]["median_ms"]
+            after = timing["median_ms"]
+            rows.append({
+                "catalog_rows": int(size),
+                "stage": stage,
+                "baseline_ms": before,
+                "current_ms": after,
+                "change": (after - before) / before if before else 0.0,
+                "regressed": after > before * (1 + tolerance) and after - before >= min_regression_ms,
+            })
+    return rows
+
+
+def print_results(results: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]] = None) -> None:
+    changes = {(row["catalog_rows"], row["stage"]): row for row in comparison or []}
+    print("=" * 78)
+    print("BENCHMARK RESULTS (median ms)")
+    print("=" * 78)
+    for size, result in results["results"].items():
+        print(f"\nCatalog rows: {int(size):,}")
+        for stage, timing in result["stages"].items():
+            line = f"    {stage:<40} {timing['median_ms']:>12.3f}"
+            row = changes.get((int(size), stage))
+            if row:
+                line += f"   {row['change']:+7.1%} vs {row['baseline_ms']:.3f}"
+                if row["regressed"]:
+                    line += "  REGRESSION"
+            print(line)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ShopFlow stages on synthetic catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="catalog sizes in rows")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per stage")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--save-baseline", help="also write the results JSON here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown of a stage's median (0.25 = 25%%)")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="where generated catalogs are kept")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        Path(args.worker).write_text(json.dumps(measure_stages(args.repeat)))
+        return
+
+    results = run_benchmarks(args.sizes, args.repeat, args.cache_dir)
+    comparison = None
+    if args.baseline:
+        comparison = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        results["comparison"] = comparison
+    print_results(results, comparison)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        Path(path).write_text(json.dumps(results, indent=2))
+        print(f"Results written to {path}")
+
+    regressions = [row for row in comparison or [] if row["regressed"]]
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Deterministic stand-ins for the crew's LLMs and agents.
+
+They return fixed replies (optionally after a fixed delay) so that benchmark
+timings measure the flow's own work rather than a model's latency.
+"""
+import json
+import time
+from typing import Any, Dict
+
+from crewai import LLM, Agent
+
+
+EXTRACTION_REPLY = json.dumps({
+    "product_name": "laptop",
+    "price": "0-25000",
+    "pd_id": None,
+    "quality": "high",
+    "is_valid": True,
+})
+EXPLANATION_REPLY = json.dumps({"reasons": {}, "search_summary": "Matches scored locally"})
+ORDER_REPLY = json.dumps({
+    "order_id": "ORD-BENCH-1",
+    "payment_status": "completed",
+    "shipping_status": "processing",
+    "estimated_delivery": "2026-01-05 to 2026-01-07",
+})
+
+
+class StubLLM(LLM):
+    """LLM that answers every call with the same text."""
+
+    def __init__(self, reply: str = EXPLANATION_REPLY, latency: float = 0.0):
+        super().__init__(model="openai/stub")
+        self.reply = reply
+        self.latency = latency
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.reply
+
+
+class StubAgent(Agent):
+    """Agent whose tasks complete with a canned reply, without any LLM call."""
+
+    reply: str = ""
+    latency: float = 0.0
+
+    def execute_task(self, task, context=None, tools=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.reply
+
+
+class StubCrew:
+    """Drop-in for ``ShopCrew`` whose agents are ``StubAgent``s."""
+
+    def __init__(self, replies: Dict[str, str] = None, latency: float = 0.0):
+        replies = {"Orchestrator": EXTRACTION_REPLY, "Catalog": "[]", "Cart": ORDER_REPLY, **(replies or {})}
+        llm = StubLLM(latency=latency)
+        self._agents: Dict[str, Any] = {
+            role: StubAgent(role=role, goal=role, backstory=role, llm=llm, reply=reply, latency=latency)
+            for role, reply in replies.items()
+        }
+
+    def Orchestrator(self) -> StubAgent:
+        return self._agents["Orchestrator"]
+
+    def Catalog(self) -> StubAgent:
+        return self._agents["Catalog"]
+
+    def CatalogRanker(self) -> StubAgent:
+        return self._agents["Catalog"]
+
+    def Cart(self) -> StubAgent:
+        return self._agents["Cart"]
@@ -0,0 +1,36 @@
+from my_shopping_agent.catalog.search import (
+    DEFAULT_CANDIDATES,
+    DEFAULT_CATALOG_FILE,
+    CatalogSearchEngine,
+    get_search_engine,
+    parse_price,
+    price_range,
+    swap_search_engine,
+)
+from my_shopping_agent.catalog.facets import FacetIndex
+from my_shopping_agent.catalog.snapshot import CatalogSnapshot, load_catalog, open_snapshot
+from my_shopping_agent.catalog.text_index import TextIndex
+from my_shopping_agent.catalog.vector_index import SemanticCatalogIndex, VectorIndex, get_semantic_index
+from my_shopping_agent.catalog.reload import CatalogWatcher
+from my_shopping_agent.catalog.prefetch import MIN_PREFETCH_OVERLAP, CatalogPrefetch
+
+__all__ = [
+    "DEFAULT_CANDIDATES",
+    "DEFAULT_CATALOG_FILE",
+    "CatalogSearchEngine",
+    "get_search_engine",
+    "parse_price",
+    "price_range",
+    "swap_search_engine",
+    "FacetIndex",
+    "CatalogSnapshot",
+    "load_catalog",
+    "open_snapshot",
+    "TextIndex",
+    "SemanticCatalogIndex",
+    "VectorIndex",
+    "get_semantic_index",
+    "CatalogWatcher",
+    "MIN_PREFETCH_OVERLAP",
+    "CatalogPrefetch",
+]
@@ -0,0 +1,209 @@
+"""Content-addressed, on-disk cache of text embeddings.
+
+Vectors are keyed by ``sha256(model name + chunk text)`` and stored in an
+append-only raw ``float32`` file that is memory-mapped for reads, next to a
+text file holding one key per row. Only chunks that are not in the cache are
+sent to the real embedder, in batches, so a worker's cold start costs a file
+read once the catalog has been embedded by any process.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+
+
+DEFAULT_CACHE_DIR = Path("knowledge") / ".embeddings"
+DEFAULT_BATCH_SIZE = 100
+LOCK_TIMEOUT = 30.0
+
+
+@contextmanager
+def _file_lock(path: Path, timeout: float = LOCK_TIMEOUT) -> Iterator[None]:
+    """Cross-process lock based on exclusive creation of ``path``."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            # Break locks left behind by a crashed writer
+            try:
+                if time.time() - path.stat().st_mtime > timeout:
+                    path.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for lock: {path}")
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class EmbeddingCache:
+    """Append-only store of embedding vectors for one embedder model."""
+
+    def __init__(self, model_name: str, cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR):
+        self.model_name = model_name
+        self.directory = Path(cache_dir) / re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._keys_path = self.directory / "keys.txt"
+        self._vectors_path = self.directory / "vectors.f32"
+        self._meta_path = self.directory / "meta.json"
+        self._lock_path = self.directory / ".lock"
+
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._keys_offset = 0
+        self._vectors: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        self._refresh()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _refresh(self) -> None:
+        """Pick up rows appended since the last read, by this or another process."""
+        if self.dim is None and self._meta_path.exists():
+            self.dim = json.loads(self._meta_path.read_text())["dim"]
+        if self.dim is None or not self._keys_path.exists():
+            return
+
+        with open(self._keys_path, "rb") as handle:
+            handle.seek(self._keys_offset)
+            data = handle.read()
+        # Ignore a trailing partial line from a writer that has not finished
+        complete = data[: data.rfind(b"\n") + 1]
+        for line in complete.decode("ascii").splitlines():
+            self._rows.setdefault(line, len(self._rows))
+        self._keys_offset += len(complete)
+
+        n_rows = len(self._rows)
+        if n_rows and (self._vectors is None or len(self._vectors) != n_rows):
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n_rows, self.dim))
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached vector for each text, or None where there is none."""
+        keys = [self.key(text) for text in texts]
+        if any(key not in self._rows for key in keys):
+            self._refresh()
+        vectors = [
+            np.asarray(self._vectors[self._rows[key]]) if key in self._rows else None
+            for key in keys
+        ]
+        found = sum(vector is not None for vector in vectors)
+        self.hits += found
+        self.misses += len(vectors) - found
+        return vectors
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Any]) -> None:
+        """Append vectors for texts that are not cached yet."""
+        if not texts:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with _file_lock(self._lock_path):
+            self._refresh()
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+                self._meta_path.write_text(json.dumps({"model": self.model_name, "dim": self.dim}))
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding dimension {matrix.shape[1]} does not match cache dimension {self.dim}"
+                )
+
+            new_keys, new_rows = [], []
+            for text, vector in zip(texts, matrix):
+                key = self.key(text)
+                if key not in self._rows and key not in new_keys:
+                    new_keys.append(key)
+                    new_rows.append(vector)
+            if not new_keys:
+                return
+
+            # Drop vectors orphaned by a writer that died before writing its keys,
+            # then write vectors before keys so a key never points past the end
+            with open(self._vectors_path, "ab") as handle:
+                handle.truncate(len(self._rows) * self.dim * 4)
+                handle.write(np.asarray(new_rows, dtype=np.float32).tobytes())
+            with open(self._keys_path, "ab") as handle:
+                handle.write("".join(f"{key}\n" for key in new_keys).encode("ascii"))
+            self._refresh()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    """Embedding function that serves vectors from an ``EmbeddingCache`` and
+    sends only the misses to the wrapped embedder, ``batch_size`` at a time.
+
+    The wrapped embedder is built on the first miss, so a fully cached run
+    never creates an API client.
+    """
+
+    def __init__(
+        self,
+        embedder_factory: Callable[[], Any],
+        cache: EmbeddingCache,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self._embedder_factory = embedder_factory
+        self._embedder = None
+        self.cache = cache
+        self.batch_size = batch_size
+
+    def __call__(self, input: Documents) -> Embeddings:
+        texts = list(input)
+        vectors = self.cache.get_many(texts)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            if self._embedder is None:
+                self._embedder = self._embedder_factory()
+            embedded = self._embedder([texts[index] for index in batch])
+            self.cache.put_many([texts[index] for index in batch], embedded)
+            for index, vector in zip(batch, embedded):
+                vectors[index] = np.asarray(vector, dtype=np.float32)
+        return vectors
+
+
+def cached_embedder(
+    embedder_config: Dict[str, Any],
+    cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Wrap a crewAI embedder config so every embedding goes through the disk cache.
+
+    Args:
+        embedder_config: A crewAI embedder config, e.g. ``{"provider": "google", ...}``
+        cache_dir: Directory holding the cache files
+        batch_size: Maximum number of texts per call to the real embedder
+
+    Returns:
+        A ``"custom"`` embedder config usable wherever crewAI takes ``embedder=``
+    """
+    from crewai.utilities import EmbeddingConfigurator
+
+    model_name = f"{embedder_config.get('provider')}/{embedder_config.get('config', {}).get('model', 'default')}"
+    function = CachedEmbeddingFunction(
+        lambda: EmbeddingConfigurator().configure_embedder(embedder_config),
+        EmbeddingCache(model_name, cache_dir),
+        batch_size=batch_size,
+    )
+    return {"provider": "custom", "config": {"embedder": function}}
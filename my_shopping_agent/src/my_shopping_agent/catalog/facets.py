@@ -0,0 +1,236 @@
+"""Price range and facet indexes, built once when the catalog is loaded.
+
+Rows are kept sorted by price, so the rows in a price window are one slice
+found by bisection. Each value of ``quality`` (and of any other low-cardinality
+text column, such as a category) has a packed bitmap of its rows, plus its rows
+in price order. Filters start from the smallest of these row sets and test the
+others through their bitmaps, so a filter costs in proportion to the rows it
+reads rather than to the size of the catalog. Counting one facet value within a
+price window is two bisections.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+# Text columns with at most this many distinct values are indexed as facets
+MAX_FACET_VALUES = 64
+# Never facets, however few distinct values they have
+NON_FACET_COLUMNS = ("pd_id", "product_name", "description")
+
+# A facet filter: one value, or any of several
+FacetValues = Union[str, Iterable[str]]
+
+
+def _factorize(values: pd.Series) -> Optional[Tuple[np.ndarray, List[str]]]:
+    """Codes and labels of a column's values, stripped and lowercased ("" for missing).
+
+    None if the column has more than ``MAX_FACET_VALUES`` distinct values.
+    """
+    codes, uniques = pd.factorize(values)
+    # Normalize the distinct values only, then merge the ones that became equal
+    if len(uniques) > 4 * MAX_FACET_VALUES:
+        return None
+    normalized = [str(value).strip().lower() for value in uniques] + [""]
+    merged, labels = pd.factorize(pd.Series(normalized))
+    if len([label for label in labels if label]) > MAX_FACET_VALUES:
+        return None
+    return merged[codes].astype(np.int32), [str(label) for label in labels]
+
+
+def _bounds(sorted_prices: np.ndarray, low: float, high: float) -> Tuple[int, int]:
+    """Slice of ``sorted_prices`` from ``low`` to ``high``; unpriced rows (sorted last) only without bounds."""
+    if low == -np.inf and high == np.inf:
+        return 0, len(sorted_prices)
+    return int(np.searchsorted(sorted_prices, low, side="left")), int(np.searchsorted(sorted_prices, high, side="right"))
+
+
+def _probe(bitmap: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Whether each of ``rows`` is set in a ``np.packbits`` bitmap."""
+    return ((bitmap[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+
+class Facet:
+    """Bitmaps and price-sorted rows for each value of one column."""
+
+    def __init__(self, codes: np.ndarray, labels: List[str], prices: np.ndarray):
+        self.codes = codes
+        self.labels = labels
+        # One sort groups the rows by value, and by price within each value
+        order = np.lexsort((prices, codes))
+        bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+        self.bitmaps: Dict[str, np.ndarray] = {}
+        self.rows: Dict[str, np.ndarray] = {}
+        self.prices: Dict[str, np.ndarray] = {}
+        for code, label in enumerate(self.labels):
+            if not label:
+                continue
+            rows = order[bounds[code]:bounds[code + 1]]
+            member = np.zeros(len(codes), dtype=bool)
+            member[rows] = True
+            self.bitmaps[label] = np.packbits(member)
+            self.rows[label] = rows
+            self.prices[label] = prices[rows]
+
+    def values(self, wanted: FacetValues) -> List[str]:
+        """The indexed values among ``wanted`` (case-insensitive)."""
+        if isinstance(wanted, str):
+            wanted = [wanted]
+        return [value for value in (str(item).strip().lower() for item in wanted) if value in self.bitmaps]
+
+    def values_containing(self, text: str) -> List[str]:
+        """The indexed values that contain ``text`` (case-insensitive)."""
+        text = str(text).strip().lower()
+        return [label for label in self.bitmaps if text in label]
+
+    def count(self, value: str, low: float, high: float) -> int:
+        start, end = _bounds(self.prices[value], low, high)
+        return end - start
+
+    def slice(self, value: str, low: float, high: float) -> np.ndarray:
+        start, end = _bounds(self.prices[value], low, high)
+        return self.rows[value][start:end]
+
+    def contains(self, values: List[str], rows: np.ndarray) -> np.ndarray:
+        """Whether each of ``rows`` has any of ``values``."""
+        keep = np.zeros(len(rows), dtype=bool)
+        for value in values:
+            keep |= _probe(self.bitmaps[value], rows)
+        return keep
+
+
+class FacetIndex:
+    """Sorted price index and per-value facet bitmaps over a catalog."""
+
+    def __init__(self, catalog: pd.DataFrame, prices: np.ndarray):
+        """
+        Args:
+            catalog: The catalog, with rows numbered from 0
+            prices: Numeric price of each row (NaN where unknown)
+        """
+        self._prices = prices
+        # NaN prices sort last and never fall inside a window
+        self.price_order = np.argsort(prices, kind="stable")
+        self.sorted_prices = prices[self.price_order]
+        self.facets: Dict[str, Facet] = {}
+        for column in catalog.columns:
+            if column in NON_FACET_COLUMNS or column == "price":
+                continue
+            if not (pd.api.types.is_string_dtype(catalog[column]) or pd.api.types.is_object_dtype(catalog[column])):
+                continue
+            factorized = _factorize(catalog[column])
+            if factorized is not None:
+                self.facets[str(column)] = Facet(*factorized, prices)
+
+    @staticmethod
+    def _window(low: Optional[float], high: Optional[float]) -> Tuple[float, float]:
+        return (-np.inf if low is None else float(low)), (np.inf if high is None else float(high))
+
+    def price_rows(self, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """Rows priced from ``low`` to ``high`` (inclusive), cheapest first."""
+        start, end = _bounds(self.sorted_prices, *self._window(low, high))
+        return self.price_order[start:end]
+
+    def _facet_values(self, facets: Dict[str, FacetValues]) -> Optional[Dict[str, List[str]]]:
+        """Facet filters resolved to indexed values; None if one of them matches nothing."""
+        resolved = {}
+        for column, wanted in facets.items():
+            if wanted is None:
+                continue
+            if column not in self.facets:
+                raise KeyError(f"'{column}' is not a facet of this catalog")
+            values = self.facets[column].values(wanted)
+            if not values:
+                return None
+            resolved[column] = values
+        return resolved
+
+    def filter(
+        self,
+        rows: Optional[np.ndarray] = None,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+        **facets: FacetValues,
+    ) -> np.ndarray:
+        """
+        Rows within the price window that have the given facet values.
+
+        Args:
+            rows: Rows to filter, e.g. a name match, kept in their order; all
+                rows by default, returned cheapest first
+            low: Lowest price, None for no minimum
+            high: Highest price, None for no maximum
+            facets: Column name to a value, or list of values, the row must
+                have (e.g. ``quality="high"``)
+        """
+        resolved = self._facet_values(facets)
+        if resolved is None:
+            return np.empty(0, dtype=np.int64)
+        low, high = self._window(low, high)
+
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            keep = np.ones(len(rows), dtype=bool)
+            if low > -np.inf or high < np.inf:
+                prices = self._prices[rows]
+                keep &= (prices >= low) & (prices <= high)
+            for column, values in resolved.items():
+                keep[keep] = self.facets[column].contains(values, rows[keep])
+            return rows[keep]
+
+        # Read the smallest row set and test the rest through their bitmaps
+        sizes = {
+            column: sum(self.facets[column].count(value, low, high) for value in values)
+            for column, values in resolved.items()
+        }
+        lead = min(sizes, key=sizes.get, default=None)
+        in_window = self.price_rows(low, high)
+        if lead is None or len(in_window) <= sizes[lead]:
+            candidates, lead = in_window, None
+        else:
+            parts = [self.facets[lead].slice(value, low, high) for value in resolved[lead]]
+            candidates = np.concatenate(parts)
+            if len(parts) > 1:
+                candidates = candidates[np.argsort(self._prices[candidates], kind="stable")]
+        for column, values in resolved.items():
+            if column != lead:
+                candidates = candidates[self.facets[column].contains(values, candidates)]
+        return candidates
+
+    def count(self, low: Optional[float] = None, high: Optional[float] = None, **facets: FacetValues) -> int:
+        """How many rows ``filter`` would return; bisections only for at most one facet."""
+        resolved = self._facet_values(facets)
+        if resolved is None:
+            return 0
+        low, high = self._window(low, high)
+        if not resolved:
+            start, end = _bounds(self.sorted_prices, low, high)
+            return end - start
+        if len(resolved) == 1:
+            (column, values), = resolved.items()
+            return sum(self.facets[column].count(value, low, high) for value in values)
+        return len(self.filter(None, low, high, **facets))
+
+    def counts(
+        self,
+        column: str,
+        rows: Optional[np.ndarray] = None,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+    ) -> Dict[str, int]:
+        """
+        Rows per value of ``column`` within the price window, most common first.
+
+        Over the whole catalog this takes two bisections per value; over
+        ``rows`` (e.g. a name match) it reads each of them once.
+        """
+        facet = self.facets[column]
+        if rows is None:
+            low, high = self._window(low, high)
+            counts = {value: facet.count(value, low, high) for value in facet.bitmaps}
+        else:
+            rows = self.filter(rows, low, high)
+            tally = np.bincount(facet.codes[rows], minlength=len(facet.labels))
+            counts = {facet.labels[code]: int(n) for code, n in enumerate(tally) if facet.labels[code]}
+        return {value: n for value, n in sorted(counts.items(), key=lambda item: -item[1]) if n}
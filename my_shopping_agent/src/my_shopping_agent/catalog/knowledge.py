@@ -0,0 +1,143 @@
+"""crewAI knowledge source backed by the catalog snapshot.
+
+The workbook is stored one product per chunk, keyed by ``pd_id``, with a hash
+of the row in the chunk's metadata. Each time the source is added to a
+knowledge store it diffs the catalog against those hashes and only upserts
+rows that were added or changed, and deletes rows that are gone, so editing
+one price re-embeds one row instead of the whole workbook.
+"""
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from crewai.knowledge.source.base_knowledge_source import BaseKnowledgeSource
+from crewai.utilities.constants import KNOWLEDGE_DIRECTORY
+from pydantic import Field
+
+from my_shopping_agent.catalog.snapshot import load_catalog
+
+
+# Chunks written per call; Chroma caps the size of a single batch
+UPSERT_BATCH_SIZE = 1000
+# Chunks read per call when diffing; paging by offset gets slower the smaller the page
+READ_PAGE_SIZE = 10000
+
+
+def _row_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CatalogKnowledgeSource(BaseKnowledgeSource):
+    """Drop-in replacement for ``ExcelKnowledgeSource`` that reads the binary
+    snapshot of the workbook instead of parsing the XLSX on every start, and
+    keeps the knowledge store in sync row by row.
+
+    Each chunk is the CSV header followed by one product's row (or rows, if
+    the ``pd_id`` repeats), so a retrieved chunk is readable on its own.
+    """
+
+    file_paths: List[Union[Path, str]] = Field(default_factory=lambda: ["spreadsheet.xlsx"])
+    # Chunk ID ("<file name>:<pd_id>") -> chunk text
+    rows: Dict[str, str] = Field(default_factory=dict)
+    # Chunk ID -> pd_id, as a string
+    row_ids: Dict[str, str] = Field(default_factory=dict)
+    # Counts from the last sync: added, changed, removed, unchanged
+    sync_stats: Dict[str, int] = Field(default_factory=dict)
+
+    def model_post_init(self, _) -> None:
+        self.validate_content()
+        for path in self.safe_file_paths:
+            catalog = load_catalog(path)
+            text_columns = catalog.select_dtypes(include="object").columns
+            # One CSV line per product, even when a description spans lines
+            catalog[text_columns] = catalog[text_columns].replace(r"[\r\n]+", " ", regex=True)
+            header, *lines = catalog.to_csv(index=False, lineterminator="\n").splitlines()
+            for pd_id, line in zip(catalog["pd_id"].astype(str).str.strip(), lines):
+                chunk_id = f"{path.name}:{pd_id}"
+                if chunk_id in self.rows:
+                    self.rows[chunk_id] += f"\n{line}"
+                else:
+                    self.rows[chunk_id] = f"{header}\n{line}"
+                    self.row_ids[chunk_id] = pd_id
+
+    @property
+    def safe_file_paths(self) -> List[Path]:
+        # Plain strings are relative to the knowledge directory, as in crewAI
+        return [
+            Path(KNOWLEDGE_DIRECTORY) / path if isinstance(path, str) else path
+            for path in self.file_paths
+        ]
+
+    def validate_content(self) -> None:
+        """Make sure every catalog file exists."""
+        for path in self.safe_file_paths:
+            if not path.is_file():
+                raise FileNotFoundError(f"File not found: {path}")
+
+    def add(self) -> None:
+        """Bring the knowledge storage's collection up to date with the catalog."""
+        if not self.storage or not self.storage.collection:
+            raise ValueError("No storage found to save documents.")
+        self.chunks = list(self.rows.values())
+        self.sync(self.storage.collection)
+
+    def sync(self, collection: Any) -> Dict[str, int]:
+        """
+        Upsert added and changed rows into a Chroma ``collection`` and delete removed ones.
+
+        Chunks without a row hash were written by the old whole-workbook
+        ingestion and are deleted too; the catalog is the only source these
+        collections hold.
+
+        Returns:
+            Counts of added, changed, removed and unchanged rows
+        """
+        row_hashes = {chunk_id: _row_hash(text) for chunk_id, text in self.rows.items()}
+        digest = _row_hash("".join(f"{chunk_id}\0{row_hash}\n" for chunk_id, row_hash in row_hashes.items()))
+        if (collection.metadata or {}).get("catalog_digest") == digest:
+            # Nothing changed since the last sync
+            self.sync_stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": len(row_hashes)}
+            return self.sync_stats
+
+        stored_hashes = {}
+        # Read in pages: one get() of a large collection exceeds SQLite's variable limit
+        while True:
+            page = collection.get(include=["metadatas"], limit=READ_PAGE_SIZE, offset=len(stored_hashes))
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+                stored_hashes[chunk_id] = (metadata or {}).get("row_hash")
+            if len(page["ids"]) < READ_PAGE_SIZE:
+                break
+
+        upserts = []
+        stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        for chunk_id, text in self.rows.items():
+            row_hash = row_hashes[chunk_id]
+            if chunk_id not in stored_hashes:
+                stats["added"] += 1
+            elif stored_hashes[chunk_id] != row_hash:
+                stats["changed"] += 1
+            else:
+                stats["unchanged"] += 1
+                continue
+            upserts.append((chunk_id, text, row_hash))
+
+        removed = [chunk_id for chunk_id in stored_hashes if chunk_id not in self.rows]
+        stats["removed"] = len(removed)
+        for start in range(0, len(removed), UPSERT_BATCH_SIZE):
+            collection.delete(ids=removed[start:start + UPSERT_BATCH_SIZE])
+
+        # Only the upserted rows are embedded
+        for start in range(0, len(upserts), UPSERT_BATCH_SIZE):
+            batch = upserts[start:start + UPSERT_BATCH_SIZE]
+            collection.upsert(
+                ids=[chunk_id for chunk_id, _, _ in batch],
+                documents=[text for _, text, _ in batch],
+                metadatas=[
+                    {"pd_id": self.row_ids[chunk_id], "row_hash": row_hash, "source": chunk_id.split(":", 1)[0]}
+                    for chunk_id, _, row_hash in batch
+                ],
+            )
+
+        collection.modify(metadata={**(collection.metadata or {}), "catalog_digest": digest})
+        self.sync_stats = stats
+        return stats
@@ -0,0 +1,151 @@
+"""Speculative catalog search on the raw query, started before its details are extracted.
+
+While the Orchestrator works out the structured details of a query, a
+``CatalogPrefetch`` searches the catalog for the product name, price and
+quality that the rule-based extractor found in the raw query. Whether that
+work is used depends on how much the extracted product name shares with the
+raw one:
+
+* same terms: the prefetched name matches are the search's ("reused"), and so
+  are its products if the price and quality agree as well
+* fewer terms, overlapping enough: only the prefetched rows can match, so
+  just those are rescored for the narrower name ("refined")
+* otherwise the prefetch is dropped and the search runs as usual ("discarded")
+"""
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from my_shopping_agent.catalog.search import CatalogSearchEngine, parse_price
+from my_shopping_agent.telemetry import REGISTRY
+
+
+# Least Jaccard overlap between the raw and extracted name terms for the
+# prefetched rows to be refined rather than searched afresh
+MIN_PREFETCH_OVERLAP = 0.5
+
+REUSED, REFINED, DISCARDED = "reused", "refined", "discarded"
+
+PREFETCH_OUTCOMES = REGISTRY.counter(
+    "shopflow_search_prefetch_total", "Speculative catalog searches by outcome (reused, refined, discarded)"
+)
+
+
+def _term_set(resolved: List[Dict[str, float]]) -> FrozenSet[str]:
+    return frozenset(term for term_weights in resolved for term in term_weights)
+
+
+def _canonical(resolved: List[Dict[str, float]]) -> List[Tuple[Tuple[str, float], ...]]:
+    # Name scores do not depend on the order of the query terms
+    return sorted(tuple(sorted(term_weights.items())) for term_weights in resolved)
+
+
+def _same_text(a: Any, b: Any) -> bool:
+    return str(a if a is not None else "").strip().lower() == str(b if b is not None else "").strip().lower()
+
+
+class CatalogPrefetch:
+    """A search for a raw query's details, run (usually in the background) ahead of the real one."""
+
+    def __init__(
+        self,
+        engine: CatalogSearchEngine,
+        product_name: Optional[str],
+        price: Any = None,
+        quality: Optional[str] = None,
+        pd_id: Any = None,
+    ):
+        self.engine = engine
+        self.product_name = product_name
+        self.price = price
+        self.quality = quality
+        self.pd_id = pd_id
+        # Resolving the terms is cheap; reading their postings is what run() does
+        resolved = engine.name_terms(product_name)
+        self.resolved = _canonical(resolved)
+        self.terms = _term_set(resolved)
+        self.rows: Optional[np.ndarray] = None
+        self.scores: Optional[np.ndarray] = None
+        self.products: Optional[List[Dict[str, Any]]] = None
+        self._done = threading.Event()
+
+    def run(self) -> "CatalogPrefetch":
+        """Look up the rows the raw query's name matches and search them."""
+        try:
+            self.rows, self.scores = self.engine.name_scores(self.product_name, self.pd_id)
+            self.products = self.engine.search(
+                self.product_name, self.price, self.quality, self.pd_id, name_match=(self.rows, self.scores)
+            )
+        finally:
+            self._done.set()
+        return self
+
+    def overlap(self, product_name: Optional[str]) -> float:
+        """Jaccard overlap between the raw query's name terms and ``product_name``'s."""
+        terms = _term_set(self.engine.name_terms(product_name))
+        union = self.terms | terms
+        return len(self.terms & terms) / len(union) if union else 1.0
+
+    def outcome(self, engine: CatalogSearchEngine, product_name: Optional[str], pd_id: Any = None) -> str:
+        """Whether a search for these details can reuse, refine or must discard the prefetch."""
+        if engine is not self.engine or not _same_text(pd_id, self.pd_id):
+            return DISCARDED
+        resolved = engine.name_terms(product_name)
+        if _canonical(resolved) == self.resolved:
+            return REUSED
+        terms = _term_set(resolved)
+        # Any row matching a subset of the terms is among the prefetched rows
+        if terms and terms <= self.terms and self.overlap(product_name) >= MIN_PREFETCH_OVERLAP:
+            return REFINED
+        return DISCARDED
+
+    def name_match(
+        self, engine: CatalogSearchEngine, product_name: Optional[str], pd_id: Any = None
+    ) -> Tuple[str, Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        The ``name_scores`` of a search for these details, from the prefetched rows.
+
+        Waits for ``run`` to finish unless the prefetch is discarded.
+
+        Returns:
+            ``(outcome, name_match)``; ``name_match`` is None when discarded
+        """
+        outcome = self.outcome(engine, product_name, pd_id)
+        if outcome != DISCARDED:
+            self._done.wait()
+            if self.rows is None:
+                # The lookup failed; the search repeats it and reports the error
+                outcome = DISCARDED
+        PREFETCH_OUTCOMES.inc(outcome=outcome)
+        if outcome == REUSED:
+            return outcome, (self.rows, self.scores)
+        if outcome == REFINED:
+            return outcome, engine.name_scores(product_name, pd_id, within=self.rows)
+        return outcome, None
+
+    def search(
+        self,
+        engine: CatalogSearchEngine,
+        product_name: Optional[str] = None,
+        price: Any = None,
+        quality: Optional[str] = None,
+        pd_id: Any = None,
+        semantic: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        ``engine.search`` for these details, using as much of the prefetch as still fits.
+
+        Returns:
+            ``(outcome, products)``
+        """
+        outcome, name_match = self.name_match(engine, product_name, pd_id)
+        if (
+            outcome == REUSED
+            and semantic is None
+            and self.products is not None
+            and parse_price(price) == parse_price(self.price)
+            and _same_text(quality, self.quality)
+        ):
+            return outcome, self.products
+        return outcome, engine.search(product_name, price, quality, pd_id, semantic=semantic, name_match=name_match)
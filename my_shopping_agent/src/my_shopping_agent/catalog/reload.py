@@ -0,0 +1,142 @@
+"""Hot reload of the catalog while the process keeps serving.
+
+``CatalogWatcher`` polls the spreadsheet's modification time and size from a
+background thread. When they change it builds a new search engine (through a
+fresh snapshot, written by a child process so the workbook parse does not
+compete with searches for the GIL), plus any structures derived from the
+engine being served,
+and only then swaps the new engine in. The engine being served is never
+modified: searches already running finish against the version they started
+with, and readers never wait for a reload. A reload that fails, for instance
+on a half-written file, keeps the current catalog and is retried once the
+file changes again.
+"""
+import multiprocessing
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Tuple, Union
+
+from my_shopping_agent.catalog.search import (
+    DEFAULT_CATALOG_FILE,
+    CatalogSearchEngine,
+    get_search_engine,
+    swap_search_engine,
+)
+from my_shopping_agent.catalog.snapshot import open_snapshot
+from my_shopping_agent.catalog.vector_index import prepare_semantic_indexes
+from my_shopping_agent.telemetry import REGISTRY
+
+
+DEFAULT_POLL_INTERVAL = 2.0
+# Workbooks at least this large are parsed in a child process; starting one
+# takes longer than parsing a small catalog in-process
+SUBPROCESS_MIN_BYTES = 1 << 20
+
+CATALOG_GENERATION = REGISTRY.gauge("shopflow_catalog_generation", "Catalog version being served, +1 per reload")
+CATALOG_ROWS = REGISTRY.gauge("shopflow_catalog_rows", "Rows in the catalog being served")
+CATALOG_RELOAD_SECONDS = REGISTRY.histogram(
+    "shopflow_catalog_reload_duration_seconds", "Time to rebuild the catalog structures on a reload"
+)
+CATALOG_RELOAD_FAILURES = REGISTRY.counter("shopflow_catalog_reload_failures_total", "Catalog reloads that failed")
+
+# Called with the new engine; ``prepare`` hooks before it is served, ``on_swap`` hooks after
+EngineHook = Callable[[CatalogSearchEngine], None]
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CatalogWatcher:
+    """Reloads the catalog in the background whenever its spreadsheet changes."""
+
+    def __init__(
+        self,
+        catalog_file: Union[str, Path] = DEFAULT_CATALOG_FILE,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        prepare: Iterable[EngineHook] = (),
+        on_swap: Iterable[EngineHook] = (),
+    ):
+        """
+        Args:
+            catalog_file: The catalog spreadsheet to watch
+            interval: Seconds between checks of the file
+            prepare: Hooks that build per-engine structures (e.g. the fast
+                extractor) for the new engine before it is served
+            on_swap: Hooks run once the new engine is being served (e.g. to
+                drop caches built from the old catalog)
+        """
+        self.catalog_file = Path(catalog_file)
+        self.interval = interval
+        self.prepare = list(prepare)
+        self.on_swap = list(on_swap)
+        self._signature = _file_signature(self.catalog_file)
+        # A version that failed to load is not retried until the file changes again
+        self._failed_signature = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        engine = get_search_engine(self.catalog_file)
+        CATALOG_GENERATION.set(engine.generation)
+        CATALOG_ROWS.set(len(engine))
+
+    def start(self) -> "CatalogWatcher":
+        """Start polling from a daemon thread."""
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self) -> bool:
+        """Reload if the file changed since the last successful load; True if it was reloaded."""
+        signature = _file_signature(self.catalog_file)
+        if signature is None or signature in (self._signature, self._failed_signature):
+            return False
+        try:
+            self.reload()
+        except Exception:
+            CATALOG_RELOAD_FAILURES.inc()
+            self._failed_signature = signature
+            print(f"Catalog reload failed, still serving the previous version:\n{traceback.format_exc()}")
+            return False
+        self._signature = signature
+        return True
+
+    def reload(self) -> CatalogSearchEngine:
+        """Build the catalog structures from the file and swap them in."""
+        start = time.perf_counter()
+        previous = get_search_engine(self.catalog_file)
+        if self.catalog_file.stat().st_size >= SUBPROCESS_MIN_BYTES:
+            # Parsing the workbook is pure Python and would hold the GIL against
+            # the searches being served; build the snapshot in a child process
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                pool.submit(open_snapshot, self.catalog_file).result()
+        engine = CatalogSearchEngine.from_file(self.catalog_file)
+        prepare_semantic_indexes(previous, engine)
+        for hook in self.prepare:
+            hook(engine)
+
+        generation = swap_search_engine(engine, self.catalog_file)
+        duration = time.perf_counter() - start
+        CATALOG_RELOAD_SECONDS.observe(duration)
+        CATALOG_GENERATION.set(generation)
+        CATALOG_ROWS.set(len(engine))
+        for hook in self.on_swap:
+            hook(engine)
+        print(f"Catalog reloaded: generation {generation}, {len(engine):,} rows in {duration:.2f}s")
+        return engine
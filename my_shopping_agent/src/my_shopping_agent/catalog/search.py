@@ -0,0 +1,347 @@
+"""Deterministic in-process search over the product catalog.
+
+The Catalog agent used to score every product itself. This module applies the
+same rules (50 points for the name, 40 for the price, 10 for the quality, keep
+scores of 60 or more, return the top 3) with vectorized NumPy operations, so a
+search costs milliseconds and always returns the same ranking.
+"""
+import math
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from my_shopping_agent.catalog.facets import FacetIndex
+from my_shopping_agent.catalog.snapshot import load_catalog
+from my_shopping_agent.catalog.text_index import TextIndex
+
+
+DEFAULT_CATALOG_FILE = Path("knowledge") / "spreadsheet.xlsx"
+
+NAME_WEIGHT = 50
+PRICE_WEIGHT = 40
+QUALITY_WEIGHT = 10
+MIN_MATCH_SCORE = 60
+MAX_RESULTS = 3
+# Rows handed to the Catalog agent when it scores candidates instead of the whole catalog
+DEFAULT_CANDIDATES = 20
+# Cosine similarity at which a semantic match starts earning name points
+SEMANTIC_FLOOR = 0.6
+
+_NUMBER_RE = r"\$?\s*(\d+(?:,\d{3})*(?:\.\d+)?)\s*(k)?"
+
+
+def _to_number(value: str, thousands: Optional[str] = None) -> float:
+    number = float(value.replace(",", ""))
+    return number * 1000 if thousands else number
+
+
+def price_range(
+    low: str, low_thousands: Optional[str], high: str, high_thousands: Optional[str]
+) -> Tuple[float, float]:
+    """The ``(low, high)`` window of a matched range's two numbers and their "k" suffixes.
+
+    A "k" on the second number only applies to the first as well when that
+    keeps the range in order: "10-20k" is 10000-20000, "500-2k" is 500-2000.
+    """
+    first, second = _to_number(low, low_thousands), _to_number(high, high_thousands)
+    if high_thousands and not low_thousands and first <= _to_number(high):
+        first *= 1000
+    return min(first, second), max(first, second)
+
+
+def parse_price(price: Any) -> Tuple[Optional[float], Optional[float]]:
+    """Turn an extracted price into a ``(low, high)`` window.
+
+    Accepts numbers ("around" that price), ranges like ``"10-20"`` and phrases
+    like ``"under 500"`` or ``"over 1000"``. Returns ``(None, None)`` when the
+    shopper gave no usable price.
+    """
+    if price is None or isinstance(price, bool):
+        return None, None
+    if isinstance(price, (int, float, np.integer, np.floating)):
+        if isinstance(price, float) and math.isnan(price):
+            return None, None
+        return float(price), float(price)
+
+    text = str(price).strip().lower()
+    if not text or text == "market price":
+        return None, None
+
+    range_match = re.search(_NUMBER_RE + r"\s*(?:-|to|and)\s*" + _NUMBER_RE, text)
+    if range_match:
+        return price_range(*range_match.groups())
+
+    number_match = re.search(_NUMBER_RE, text)
+    if not number_match:
+        return None, None
+    number = _to_number(number_match.group(1), number_match.group(2))
+
+    if re.search(r"\b(?:under|below|less than|max(?:imum)?|up to|within|at most)\b", text):
+        return 0.0, number
+    if re.search(r"\b(?:over|above|more than|min(?:imum)?|at least|from)\b", text):
+        return number, math.inf
+    return number, number
+
+
+class CatalogSearchEngine:
+    """Scores every catalog row against the shopper's extracted details."""
+
+    def __init__(self, catalog: pd.DataFrame):
+        self.catalog = catalog.reset_index(drop=True)
+        self.text_index = TextIndex(self.catalog["product_name"].fillna("").astype(str).tolist())
+        self._prices = pd.to_numeric(self.catalog["price"], errors="coerce").to_numpy(dtype=np.float64)
+        self._qualities = self.catalog["quality"].fillna("").astype(str).str.strip().str.lower().to_numpy()
+        self._ids = self.catalog["pd_id"].astype(str).str.strip().to_numpy()
+        self.facets = FacetIndex(self.catalog, self._prices)
+        # Bumped each time a reloaded catalog replaces the one being served
+        self.generation = 0
+
+    @classmethod
+    def from_file(cls, catalog_file: Union[str, Path] = DEFAULT_CATALOG_FILE) -> "CatalogSearchEngine":
+        """Load the catalog (through its binary snapshot) and build an engine over it."""
+        return cls(load_catalog(catalog_file))
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    @staticmethod
+    def _name_query(product_name: Optional[str]) -> str:
+        return " ".join(
+            token for token in str(product_name or "").lower().split() if token not in ("unknown", "product")
+        )
+
+    def name_terms(self, product_name: Optional[str]) -> List[Dict[str, float]]:
+        """The index terms (with their weights) ``name_scores`` looks up, one dict per query term."""
+        return self.text_index.resolve(self._name_query(product_name))
+
+    def name_scores(
+        self, product_name: Optional[str], pd_id: Any = None, within: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Name similarity for the rows that match the query, from 0 to ``NAME_WEIGHT``.
+
+        Coverage of the query terms counts for 80% and the share of the
+        product name that was matched for the remaining 20%, so "Laptop" ranks
+        above "Apple Laptop" for the query "laptop". Rows that match nothing
+        are left out.
+
+        Args:
+            within: Sorted rows to score instead of the whole catalog, such as
+                the rows an earlier, broader query matched
+
+        Returns:
+            ``(rows, scores)`` for the matching rows only
+        """
+        rows, matched, n_terms = self.text_index.match(self._name_query(product_name), within)
+        if n_terms:
+            counts = self.text_index.term_counts[rows]
+            coverage = matched / n_terms
+            precision = np.minimum(matched, counts) / counts
+            scores = NAME_WEIGHT * (0.8 * coverage + 0.2 * precision)
+        else:
+            scores = np.empty(0, dtype=np.float64)
+
+        if pd_id not in (None, ""):
+            if within is None:
+                id_rows = np.flatnonzero(self._ids == str(pd_id).strip())
+            else:
+                id_rows = within[self._ids[within] == str(pd_id).strip()]
+            rows = np.concatenate((rows, id_rows))
+            scores = np.concatenate((scores, np.full(len(id_rows), float(NAME_WEIGHT))))
+            rows, first = np.unique(rows[::-1], return_index=True)
+            scores = scores[::-1][first]
+        return rows, scores
+
+    def match_rows(self, query: str) -> np.ndarray:
+        """
+        Return the rows whose product name matches ``query``, best match first.
+
+        Rows matching every query term are preferred; if there are none, rows
+        matching any term are returned instead.
+        """
+        rows, matched, n_terms = self.text_index.match(query)
+        full = matched >= n_terms - 1e-9
+        if full.any():
+            rows, matched = rows[full], matched[full]
+        return rows[np.argsort(-matched, kind="stable")]
+
+    def price_scores(self, price: Any, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Price match for ``rows`` (all rows by default), from 0 to ``PRICE_WEIGHT``.
+
+        Rows inside the requested window get full points; outside it the score
+        falls off linearly with the relative distance to the nearest bound.
+        """
+        prices = self._prices if rows is None else self._prices[rows]
+        low, high = parse_price(price)
+        if low is None:
+            return np.full(len(prices), float(PRICE_WEIGHT))
+
+        distance = np.where(prices < low, low - prices, np.where(prices > high, prices - high, 0.0))
+        reference = max(high if math.isfinite(high) else low, 1.0)
+        scores = PRICE_WEIGHT * np.clip(1.0 - distance / reference, 0.0, 1.0)
+        return np.nan_to_num(scores, nan=0.0)
+
+    def quality_scores(self, quality: Optional[str], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Quality match for ``rows`` (all rows by default), either 0 or ``QUALITY_WEIGHT``."""
+        qualities = self._qualities if rows is None else self._qualities[rows]
+        if not quality:
+            return np.full(len(qualities), float(QUALITY_WEIGHT))
+        return np.where(qualities == str(quality).strip().lower(), float(QUALITY_WEIGHT), 0.0)
+
+    def search(
+        self,
+        product_name: Optional[str] = None,
+        price: Any = None,
+        quality: Optional[str] = None,
+        pd_id: Any = None,
+        limit: int = MAX_RESULTS,
+        min_score: float = MIN_MATCH_SCORE,
+        semantic: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        name_match: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the best matching products, highest score first.
+
+        Only rows whose name (or ID) matches are scored, since the price and
+        quality alone cannot reach the default threshold.
+
+        Args:
+            product_name: Product name or keywords from the shopper
+            price: Target price, range such as "10-20", or phrase such as "under 500"
+            quality: Desired quality (e.g. "high")
+            pd_id: Exact product ID, if the shopper gave one
+            limit: Maximum number of products to return
+            min_score: Minimum match score a product needs to be returned
+            semantic: Optional ``(rows, similarities)`` from a vector index; a
+                row's name score is the better of its lexical and semantic score
+            name_match: ``name_scores(product_name, pd_id)`` if it was already
+                computed, e.g. by a ``CatalogPrefetch``
+
+        Returns:
+            Product dicts in the same shape the Catalog agent used to return
+        """
+        rows, name = name_match if name_match is not None else self.name_scores(product_name, pd_id)
+        if semantic is not None and len(semantic[0]):
+            semantic_rows, similarities = semantic
+            semantic_name = NAME_WEIGHT * np.clip((similarities - SEMANTIC_FLOOR) / (1.0 - SEMANTIC_FLOOR), 0.0, 1.0)
+            rows = np.concatenate((rows, semantic_rows))
+            name = np.concatenate((name, semantic_name))
+            # Keep the best name score per row
+            order = np.lexsort((-name, rows))
+            rows, name = rows[order], name[order]
+            first = np.concatenate(([True], rows[1:] != rows[:-1]))
+            rows, name = rows[first], name[first]
+        if min_score <= PRICE_WEIGHT + QUALITY_WEIGHT:
+            # Rows without a name match can still qualify, so score everything
+            all_name = np.zeros(len(self.catalog), dtype=np.float64)
+            all_name[rows] = name
+            rows, name = np.arange(len(self.catalog)), all_name
+
+        price_part = self.price_scores(price, rows)
+        quality_part = self.quality_scores(quality, rows)
+        total = np.rint(name + price_part + quality_part)
+
+        keep = np.flatnonzero(total >= min_score)
+        if len(keep) == 0:
+            return []
+        # Highest score first, cheaper product first on ties
+        order = keep[np.lexsort((self._prices[rows[keep]], -total[keep]))][:limit]
+        return [
+            self._to_product(rows[i], name[i], price_part[i], quality_part[i], total[i])
+            for i in order
+        ]
+
+    def candidates(
+        self,
+        product_name: Optional[str] = None,
+        price: Any = None,
+        quality: Optional[str] = None,
+        pd_id: Any = None,
+        k: int = DEFAULT_CANDIDATES,
+        name_match: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the ``k`` rows most worth showing the Catalog agent, unscored.
+
+        Rows are ranked with the same name, price and quality rules as
+        ``search`` but without a threshold, so the agent always gets ``k``
+        rows to judge however large the catalog is. When fewer than ``k``
+        names match, the rest are filled with the best rows by price and
+        quality alone. ``name_match`` is as for ``search``.
+        """
+        rows, name = name_match if name_match is not None else self.name_scores(product_name, pd_id)
+        if len(rows) < k:
+            all_name = np.zeros(len(self.catalog), dtype=np.float64)
+            all_name[rows] = name
+            rows, name = np.arange(len(self.catalog)), all_name
+        if len(rows) == 0 or k <= 0:
+            return []
+
+        total = name + self.price_scores(price, rows) + self.quality_scores(quality, rows)
+        if len(rows) > k:
+            top = np.argpartition(-total, k - 1)[:k]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.lexsort((self._prices[rows[top]], -total[top]))]
+        return [self._to_record(rows[i]) for i in top]
+
+    def _to_record(self, row: int) -> Dict[str, Any]:
+        record = self.catalog.iloc[row]
+        product_price = record["price"]
+        product_price = product_price.item() if hasattr(product_price, "item") else product_price
+        product_quality = str(record["quality"])
+        in_stock = bool(record["in_stock"]) if "in_stock" in record.index else True
+        if "description" in record.index and pd.notna(record["description"]):
+            description = str(record["description"])
+        else:
+            description = f"{product_quality.title()} quality {record['product_name']}"
+
+        return {
+            "product_id": record["pd_id"].item() if hasattr(record["pd_id"], "item") else record["pd_id"],
+            "product_name": str(record["product_name"]),
+            "price": product_price,
+            "quality": product_quality,
+            "in_stock": in_stock,
+            "description": description,
+        }
+
+    def _to_product(self, row: int, name: float, price: float, quality: float, total: float) -> Dict[str, Any]:
+        return {
+            **self._to_record(row),
+            "match_score": int(total),
+            "reasoning": (
+                f"Name match {name:.0f}/{NAME_WEIGHT}, price match {price:.0f}/{PRICE_WEIGHT}, "
+                f"quality match {quality:.0f}/{QUALITY_WEIGHT}"
+            ),
+        }
+
+
+# Current engine per resolved catalog path. Engines are never modified once
+# published: a reload builds a new one and replaces the entry, so searches
+# already holding the old engine finish against it and readers never wait.
+_engines: Dict[str, CatalogSearchEngine] = {}
+_load_lock = threading.Lock()
+
+
+def get_search_engine(catalog_file: Union[str, Path] = DEFAULT_CATALOG_FILE) -> CatalogSearchEngine:
+    """Return the process-wide engine for ``catalog_file``, loading it on first use."""
+    key = str(Path(catalog_file).resolve())
+    engine = _engines.get(key)
+    if engine is None:
+        with _load_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = _engines[key] = CatalogSearchEngine.from_file(key)
+    return engine
+
+
+def swap_search_engine(engine: CatalogSearchEngine, catalog_file: Union[str, Path] = DEFAULT_CATALOG_FILE) -> int:
+    """Publish ``engine`` as the one for ``catalog_file`` and return its generation."""
+    key = str(Path(catalog_file).resolve())
+    previous = _engines.get(key)
+    engine.generation = previous.generation + 1 if previous is not None else 0
+    _engines[key] = engine
+    return engine.generation
@@ -0,0 +1,175 @@
+"""Columnar binary snapshots of the catalog spreadsheet.
+
+Parsing XLSX is slow, so the workbook is converted once into one NumPy ``.npy``
+file per column under ``knowledge/.snapshots/``. Snapshots are keyed by the
+source file's content hash, and a small pointer file records the mtime and size
+the hash was computed for, so an unchanged spreadsheet is never re-read or
+re-hashed. Editing the spreadsheet triggers a rebuild on the next load.
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+SNAPSHOT_DIR_NAME = ".snapshots"
+SNAPSHOT_FORMAT = 1
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(data, indent=2))
+    os.replace(tmp_path, path)
+
+
+def _column_to_array(column: pd.Series) -> np.ndarray:
+    """Convert a column to a fixed-width array that ``np.load`` can memory-map."""
+    if pd.api.types.is_bool_dtype(column) or pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column.to_numpy(dtype="datetime64[ns]")
+    return column.fillna("").astype(str).to_numpy(dtype=np.str_)
+
+
+class CatalogSnapshot:
+    """A snapshot of one workbook, stored as one ``.npy`` file per column."""
+
+    def __init__(self, directory: Path, manifest: Dict[str, Any]):
+        self.directory = directory
+        self.manifest = manifest
+
+    @property
+    def sha256(self) -> str:
+        return self.manifest["sha256"]
+
+    @property
+    def columns(self) -> list:
+        return [column["name"] for column in self.manifest["columns"]]
+
+    def load_columns(self, mmap: bool = True) -> Dict[str, np.ndarray]:
+        """Return each column as a NumPy array, memory-mapped by default."""
+        mode = "r" if mmap else None
+        return {
+            column["name"]: np.load(self.directory / column["file"], mmap_mode=mode)
+            for column in self.manifest["columns"]
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the snapshot as a DataFrame with the spreadsheet's columns."""
+        return pd.DataFrame(self.load_columns(), columns=self.columns)
+
+    @classmethod
+    def read(cls, directory: Path) -> Optional["CatalogSnapshot"]:
+        """Open an existing snapshot directory, or return None if it is incomplete."""
+        manifest_path = directory / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if manifest.get("format") != SNAPSHOT_FORMAT:
+            return None
+        return cls(directory, manifest)
+
+    @classmethod
+    def build(cls, source: Path, directory: Path, sha256: str) -> "CatalogSnapshot":
+        """Parse ``source`` and write its snapshot to ``directory``."""
+        frame = pd.read_excel(source)
+        tmp_dir = directory.with_name(f"{directory.name}.{uuid.uuid4().hex}.tmp")
+        tmp_dir.mkdir(parents=True)
+        try:
+            columns = []
+            for index, name in enumerate(frame.columns):
+                file_name = f"{index:03d}.npy"
+                np.save(tmp_dir / file_name, _column_to_array(frame[name]), allow_pickle=False)
+                columns.append({"name": str(name), "file": file_name})
+            manifest = {
+                "format": SNAPSHOT_FORMAT,
+                "source": source.name,
+                "sha256": sha256,
+                "rows": len(frame),
+                "columns": columns,
+            }
+            (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+            try:
+                os.replace(tmp_dir, directory)
+            except OSError:
+                # Another process published the same snapshot first
+                if cls.read(directory) is None:
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return cls.read(directory)
+
+
+def open_snapshot(catalog_file: Union[str, Path]) -> CatalogSnapshot:
+    """
+    Return an up-to-date snapshot of ``catalog_file``, building it if needed.
+
+    Args:
+        catalog_file: Path to the catalog spreadsheet
+
+    Returns:
+        The snapshot matching the spreadsheet's current contents
+    """
+    source = Path(catalog_file)
+    if not source.exists():
+        raise FileNotFoundError(f"Product catalog file not found: {source}")
+
+    root = source.parent / SNAPSHOT_DIR_NAME
+    root.mkdir(exist_ok=True)
+    pointer_path = root / f"{source.stem}.json"
+    stat = source.stat()
+
+    pointer: Dict[str, Any] = {}
+    if pointer_path.exists():
+        try:
+            pointer = json.loads(pointer_path.read_text())
+        except (OSError, ValueError):
+            pointer = {}
+
+    # Fast path: same mtime and size as when the hash was last computed
+    if pointer.get("mtime_ns") == stat.st_mtime_ns and pointer.get("size") == stat.st_size:
+        snapshot = CatalogSnapshot.read(root / pointer.get("directory", ""))
+        if snapshot is not None:
+            return snapshot
+
+    sha256 = _file_sha256(source)
+    directory = root / f"{source.stem}-{sha256[:16]}"
+    snapshot = CatalogSnapshot.read(directory)
+    if snapshot is None:
+        snapshot = CatalogSnapshot.build(source, directory, sha256)
+
+    _write_json_atomic(pointer_path, {
+        "source": source.name,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha256,
+        "directory": directory.name,
+    })
+
+    # Drop snapshots of older versions of this spreadsheet
+    for stale in root.glob(f"{source.stem}-*"):
+        if stale.is_dir() and stale != directory and not stale.name.endswith(".tmp"):
+            shutil.rmtree(stale, ignore_errors=True)
+    return snapshot
+
+
+def load_catalog(catalog_file: Union[str, Path]) -> pd.DataFrame:
+    """Load the catalog spreadsheet through its snapshot."""
+    return open_snapshot(catalog_file).to_frame()
@@ -0,0 +1,183 @@
+"""Inverted token index with trigram fuzzy matching over product names.
+
+Lookups walk only the posting lists of the query's terms, so their cost grows
+with the number of matching rows rather than with the size of the catalog.
+Typos ("labtop"), plurals ("perfumes") and split words ("lap top") are resolved
+against the index vocabulary before the posting lists are read.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+FUZZY_THRESHOLD = 0.5
+MAX_FUZZY_TERMS = 3
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Any) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    if text is None:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+@lru_cache(maxsize=65536)
+def normalize_token(token: str) -> str:
+    """Reduce a token to a crude singular form ("watches" -> "watch")."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def index_terms(text: str) -> List[str]:
+    """Tokenize and normalize text, dropping single letters."""
+    return [
+        normalize_token(token)
+        for token in tokenize(text)
+        if len(token) > 1 or token.isdigit()
+    ]
+
+
+def trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TextIndex:
+    """Maps name terms to the catalog rows that contain them."""
+
+    def __init__(self, names: Sequence[str]):
+        postings: Dict[str, List[int]] = defaultdict(list)
+        term_counts = np.ones(len(names), dtype=np.float64)
+
+        for row, name in enumerate(names):
+            terms = index_terms(name)
+            term_counts[row] = max(len(terms), 1)
+            # Adjacent pairs are indexed joined too, so "smartphone" finds "smart phone"
+            joined = [a + b for a, b in zip(terms, terms[1:])]
+            for term in dict.fromkeys(terms + joined):
+                postings[term].append(row)
+
+        self.postings: Dict[str, np.ndarray] = {
+            term: np.asarray(rows, dtype=np.int64) for term, rows in postings.items()
+        }
+        self.term_counts = term_counts
+
+        self._trigram_terms: Dict[str, List[str]] = defaultdict(list)
+        self._trigram_sizes: Dict[str, int] = {}
+        for term in self.postings:
+            grams = trigrams(term)
+            self._trigram_sizes[term] = len(grams)
+            for gram in grams:
+                self._trigram_terms[gram].append(term)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.postings
+
+    def fuzzy_terms(self, term: str, threshold: float = FUZZY_THRESHOLD) -> Dict[str, float]:
+        """Return vocabulary terms similar to ``term`` with their trigram Dice score."""
+        grams = trigrams(term)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigram_terms.get(gram, ()):
+                shared[candidate] += 1
+
+        scored = {
+            candidate: 2.0 * count / (len(grams) + self._trigram_sizes[candidate])
+            for candidate, count in shared.items()
+        }
+        best = sorted(
+            ((score, candidate) for candidate, score in scored.items() if score >= threshold),
+            reverse=True,
+        )[:MAX_FUZZY_TERMS]
+        return {candidate: score for score, candidate in best}
+
+    def resolve(self, query: str) -> List[Dict[str, float]]:
+        """
+        Map each query term to the index terms it should match.
+
+        Returns:
+            One ``{index_term: weight}`` dict per query term; exact matches weigh
+            1.0 and fuzzy matches their similarity. Terms that match nothing are
+            kept as empty dicts so they still count against coverage.
+        """
+        terms = index_terms(query)
+        resolved: List[Dict[str, float]] = []
+        position = 0
+        while position < len(terms):
+            term = terms[position]
+            if position + 1 < len(terms):
+                following = terms[position + 1]
+                joined = term + following
+                # "lap top" -> "laptop" when the split words are not both real terms
+                if joined in self.postings and not (term in self.postings and following in self.postings):
+                    resolved.append({joined: 1.0})
+                    position += 2
+                    continue
+            if term in self.postings:
+                resolved.append({term: 1.0})
+            else:
+                resolved.append(self.fuzzy_terms(term))
+            position += 1
+        return resolved
+
+    def match(self, query: str, within: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Find the rows whose names match the query.
+
+        Args:
+            query: Free-text product name or keywords
+            within: Sorted row numbers to restrict the match to; each posting
+                list is then probed for these rows instead of being read whole
+
+        Returns:
+            ``(rows, matched, n_terms)``: the matching row numbers, the weighted
+            number of query terms each row matched, and how many terms the
+            query resolved to
+        """
+        resolved = self.resolve(query)
+        row_parts: List[np.ndarray] = []
+        weight_parts: List[np.ndarray] = []
+        for term_weights in resolved:
+            rows, weights = self._best_per_row(term_weights.items(), within)
+            row_parts.append(rows)
+            weight_parts.append(weights)
+
+        if not row_parts or not any(len(rows) for rows in row_parts):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), len(resolved)
+
+        rows, inverse = np.unique(np.concatenate(row_parts), return_inverse=True)
+        matched = np.bincount(inverse, weights=np.concatenate(weight_parts))
+        return rows, matched, len(resolved)
+
+    def _best_per_row(
+        self, term_weights: Iterable[Tuple[str, float]], within: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Union the postings of alternative terms, keeping each row's best weight."""
+        rows_list, weights_list = [], []
+        for term, weight in term_weights:
+            rows = self.postings[term]
+            if within is not None:
+                # Postings are sorted, so probing them costs log(postings) per row of ``within``
+                found = np.minimum(np.searchsorted(rows, within), len(rows) - 1)
+                rows = within[rows[found] == within]
+            rows_list.append(rows)
+            weights_list.append(np.full(len(rows), weight))
+        if not rows_list:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        rows = np.concatenate(rows_list)
+        weights = np.concatenate(weights_list)
+        order = np.lexsort((-weights, rows))
+        rows, weights = rows[order], weights[order]
+        first = np.concatenate(([True], rows[1:] != rows[:-1]))
+        return rows[first], weights[first]
@@ -0,0 +1,262 @@
+"""Local vector index over product-row embeddings.
+
+Small catalogs are searched exactly with one matrix product. Large catalogs use
+an IVF (inverted file) index: rows are clustered with k-means and a query only
+scans the ``n_probe`` clusters closest to it. ``evaluate`` and ``sweep`` report
+recall@k against exact search together with latency, so ``n_lists`` and
+``n_probe`` can be chosen for the catalog at hand.
+
+Run ``python -m my_shopping_agent.catalog.vector_index --rows 100000`` for a
+parameter sweep on synthetic data.
+"""
+import argparse
+import json
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from my_shopping_agent.catalog.search import DEFAULT_CATALOG_FILE, CatalogSearchEngine, get_search_engine
+
+
+EXACT_MAX_ROWS = 20000
+DEFAULT_N_PROBE = 8
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50000
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class VectorIndex:
+    """Cosine-similarity index with an exact and an IVF mode."""
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        mode: str = "auto",
+        n_lists: Optional[int] = None,
+        n_probe: int = DEFAULT_N_PROBE,
+        seed: int = 0,
+    ):
+        """
+        Build the index.
+
+        Args:
+            vectors: One embedding per catalog row, shape ``(rows, dim)``
+            mode: "exact", "ivf", or "auto" (IVF above ``EXACT_MAX_ROWS`` rows)
+            n_lists: Number of IVF clusters; defaults to about sqrt(rows)
+            n_probe: Number of clusters scanned per query in IVF mode
+            seed: Seed for the k-means initialisation
+        """
+        self.vectors = _normalize(vectors)
+        if mode == "auto":
+            mode = "ivf" if len(self.vectors) > EXACT_MAX_ROWS else "exact"
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown vector index mode: {mode}")
+        self.mode = mode
+        self.n_probe = n_probe
+        self.n_lists = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        if mode == "ivf":
+            self.n_lists = n_lists or max(1, int(np.sqrt(len(self.vectors))))
+            self._train(seed)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def _train(self, seed: int) -> None:
+        """Cluster the rows with spherical k-means and build the inverted lists."""
+        rng = np.random.default_rng(seed)
+        sample = self.vectors
+        if len(sample) > KMEANS_SAMPLE:
+            sample = sample[rng.choice(len(sample), KMEANS_SAMPLE, replace=False)]
+        n_lists = min(self.n_lists, len(sample))
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(n_lists):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        self.centroids = centroids
+        self.n_lists = n_lists
+        assignment = np.concatenate([
+            np.argmax(chunk @ centroids.T, axis=1)
+            for chunk in np.array_split(self.vectors, max(1, len(self.vectors) // 65536))
+        ])
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+
+    def search(self, query: np.ndarray, k: int = 10, n_probe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the rows most similar to a query embedding.
+
+        Args:
+            query: Query embedding, shape ``(dim,)``
+            k: Number of rows to return
+            n_probe: Override the number of IVF clusters to scan
+
+        Returns:
+            ``(rows, similarities)``, most similar first
+        """
+        query = _normalize(query)
+        if self.mode == "exact":
+            scores = self.vectors @ query
+            top = _top_k(scores, k)
+            return top, scores[top]
+
+        probes = _top_k(self.centroids @ query, min(n_probe or self.n_probe, self.n_lists))
+        candidates = np.concatenate([self.lists[cluster] for cluster in probes])
+        scores = self.vectors[candidates] @ query
+        top = _top_k(scores, k)
+        return candidates[top], scores[top]
+
+    def evaluate(self, queries: np.ndarray, k: int = 10, n_probe: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Measure recall@k against exact search and per-query latency.
+
+        Args:
+            queries: Query embeddings, shape ``(n_queries, dim)``
+            k: Cut-off for recall
+            n_probe: Override the number of IVF clusters to scan
+
+        Returns:
+            Dict with the index parameters, ``recall_at_k`` and latency percentiles in ms
+        """
+        queries = _normalize(queries)
+        latencies, hits = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            rows, _ = self.search(query, k, n_probe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            exact = _top_k(self.vectors @ query, k)
+            hits += len(np.intersect1d(rows, exact))
+
+        return {
+            "mode": self.mode,
+            "rows": len(self.vectors),
+            "n_lists": self.n_lists,
+            "n_probe": (n_probe or self.n_probe) if self.mode == "ivf" else None,
+            "k": k,
+            "recall_at_k": hits / (len(queries) * min(k, len(self.vectors))) if len(queries) else 1.0,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if latencies else 0.0,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if latencies else 0.0,
+        }
+
+
+def sweep(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    n_lists_options: Iterable[Optional[int]] = (None,),
+    n_probe_options: Iterable[int] = (1, 4, 8, 16, 32),
+) -> List[Dict[str, Any]]:
+    """Evaluate the exact index and every IVF parameter combination."""
+    results = [VectorIndex(vectors, mode="exact").evaluate(queries, k)]
+    for n_lists in n_lists_options:
+        index = VectorIndex(vectors, mode="ivf", n_lists=n_lists)
+        for n_probe in n_probe_options:
+            results.append(index.evaluate(queries, k, n_probe))
+    return results
+
+
+def product_texts(catalog: pd.DataFrame) -> List[str]:
+    """Text embedded for each catalog row."""
+    return [
+        f"{name}, {quality} quality"
+        for name, quality in zip(catalog["product_name"].astype(str), catalog["quality"].astype(str))
+    ]
+
+
+class SemanticCatalogIndex:
+    """Vector index over the catalog rows, queried with free text."""
+
+    def __init__(self, catalog: pd.DataFrame, embed: Callable[[Sequence[str]], Sequence[Any]], **index_options):
+        """
+        Args:
+            catalog: Catalog rows, in the same order as the search engine's
+            embed: Embedding function (e.g. the cached crew embedder)
+            **index_options: Passed to ``VectorIndex``
+        """
+        self.embed = embed
+        self.index = VectorIndex(np.asarray(embed(product_texts(catalog))), **index_options)
+
+    def search(self, text: str, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(rows, similarities)`` for the catalog rows closest to ``text``."""
+        return self.index.search(np.asarray(self.embed([text])[0]), k)
+
+
+# Semantic indexes per search engine (and so per catalog version), by embedding function
+_semantic_indexes: "weakref.WeakKeyDictionary[CatalogSearchEngine, Dict[Callable, SemanticCatalogIndex]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_semantic_index(
+    embed: Callable,
+    catalog_file: Union[str, Path] = DEFAULT_CATALOG_FILE,
+    engine: Optional[CatalogSearchEngine] = None,
+) -> SemanticCatalogIndex:
+    """
+    Return the semantic index over ``engine``'s rows, building it on first use.
+
+    Pass the engine the search will run on, so the index rows match it even
+    if the catalog is reloaded in between; by default the current engine for
+    ``catalog_file`` is used.
+    """
+    engine = engine or get_search_engine(catalog_file)
+    indexes = _semantic_indexes.setdefault(engine, {})
+    if embed not in indexes:
+        indexes[embed] = SemanticCatalogIndex(engine.catalog, embed)
+    return indexes[embed]
+
+
+def prepare_semantic_indexes(previous: CatalogSearchEngine, engine: CatalogSearchEngine) -> None:
+    """Build, for ``engine``, the semantic indexes that were in use for ``previous``."""
+    for embed in list(_semantic_indexes.get(previous, {})):
+        get_semantic_index(embed, engine=engine)
+
+
+def _synthetic(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, rows)] + 0.5 * rng.normal(size=(rows, dim))).astype(np.float32)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recall@k / latency sweep for the vector index")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, nargs="*", default=[None])
+    parser.add_argument("--n-probe", type=int, nargs="*", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args(argv)
+
+    data = _synthetic(args.rows + args.queries, args.dim, clusters=max(16, args.rows // 500))
+    for result in sweep(data[:args.rows], data[args.rows:], args.k, args.n_lists, args.n_probe):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+from my_shopping_agent.checkpoints.store import CheckpointStore, get_checkpoint_store
+
+__all__ = [
+    "CheckpointStore",
+    "get_checkpoint_store",
+]
@@ -0,0 +1,104 @@
+"""Stage checkpoints, so an interrupted shopping session can be resumed.
+
+When a flow stage completes, its output is saved under the session's ID, one
+row per stage holding zlib-compressed JSON, in a SQLite database (WAL mode)
+shared by every worker on the machine. Checkpoints form a prefix of the flow:
+saving a stage drops any saved for the stages after it, so a session that
+went round again never mixes outputs from two rounds. Sessions left
+unfinished are dropped after ``ttl`` seconds.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
+
+
+DEFAULT_CHECKPOINT_PATH = Path(".cache") / "checkpoints.db"
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+
+class CheckpointStore:
+    """Completed stage outputs of unfinished sessions, keyed by session ID."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_CHECKPOINT_PATH, ttl: float = DEFAULT_TTL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                session_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                stage TEXT NOT NULL,
+                value BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (session_id, position)
+            )"""
+        )
+        self._db.execute("DELETE FROM checkpoints WHERE created_at <= ?", (time.time() - self.ttl,))
+
+    def save(self, session_id: str, position: int, stage: str, value: Any) -> int:
+        """
+        Save ``value`` as the output of ``stage``, the ``position``-th stage of the flow.
+
+        Returns:
+            The size of the stored checkpoint in bytes
+        """
+        payload = zlib.compress(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "DELETE FROM checkpoints WHERE session_id = ? AND position >= ?", (session_id, position)
+                )
+                self._db.execute(
+                    "INSERT INTO checkpoints (session_id, position, stage, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, position, stage, payload, time.time()),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(payload)
+
+    def load(self, session_id: str) -> List[Tuple[str, Any]]:
+        """The session's checkpoints as ``(stage, value)`` pairs, in flow order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT stage, value FROM checkpoints WHERE session_id = ? AND created_at > ? ORDER BY position",
+                (session_id, time.time() - self.ttl),
+            ).fetchall()
+        return [(stage, json.loads(zlib.decompress(value))) for stage, value in rows]
+
+    def discard(self, session_id: str) -> None:
+        """Drop a session's checkpoints, once it has finished."""
+        with self._lock:
+            self._db.execute("DELETE FROM checkpoints WHERE session_id = ?", (session_id,))
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        """Unfinished sessions, most recently active first, with their last completed stage."""
+        with self._lock:
+            # Stage and time come from each session's last row, its most recent save
+            rows = self._db.execute(
+                """SELECT session_id, stage, MAX(position), created_at FROM checkpoints
+                WHERE created_at > ? GROUP BY session_id ORDER BY created_at DESC""",
+                (time.time() - self.ttl,),
+            ).fetchall()
+        return [
+            {"session_id": session_id, "last_stage": stage, "updated_at": updated_at}
+            for session_id, stage, _, updated_at in rows
+        ]
+
+
+@lru_cache(maxsize=None)
+def get_checkpoint_store() -> CheckpointStore:
+    """Return the process-wide checkpoint store."""
+    return CheckpointStore()
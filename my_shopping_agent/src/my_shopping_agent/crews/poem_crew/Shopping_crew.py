@@ -1,52 +1,112 @@
 from crewai import Agent, Crew, Process, Task, LLM
 from crewai.project import CrewBase, agent, crew, task
-from crewai.knowledge.source.excel_knowledge_source import ExcelKnowledgeSource
+from crewai.project.utils import memoize
+from functools import lru_cache
 import os
 from dotenv import load_dotenv
 
-load_dotenv()
-
-# llm configuration
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GOOGLE_API_KEY_1 = os.getenv("GOOGLE_API_KEY_1")
-GOOGLE_API_KEY_2 = os.getenv("GOOGLE_API_KEY_2")
-GOOGLE_API_KEY_3 = os.getenv("GOOGLE_API_KEY_3")
-
-
-
-# LLM initialization
-llm1 = LLM(
-    model="gemini/gemini-1.5-flash",
-    api_key=GOOGLE_API_KEY_1,
-    temperature=0.7
-)
-
-llm2 = LLM(
-    model="gemini/gemini-1.5-flash",
-    api_key=GOOGLE_API_KEY_2,
-    temperature=0.7
-)
-
-llm3 = LLM(
-    model="gemini/gemini-1.5-flash",
-    api_key=GOOGLE_API_KEY_3,
-    temperature=0.7
-)
-
-# Fix: Embedder configuration
-embedder = {
-    "provider": "google",
-    "config": {
-        "api_key": GEMINI_API_KEY,
-        "model": "models/text-embedding-004"
-    }
+# Everything below is built on first use rather than at import time, so
+# importing this module (for `plot`, tests or a worker that never reaches a
+# given stage) does not create LLM clients or read and embed the catalog.
+
+LLM_MODEL = "gemini/gemini-1.5-flash"
+# Seconds one request to the provider may take; also ends calls whose task timed out
+LLM_REQUEST_TIMEOUT = 60.0
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+
+@lru_cache(maxsize=None)
+def load_environment():
+    """Load the .env file once."""
+    load_dotenv()
+
+
+# LLM initialization: every agent draws from one shared pool of API keys
+@lru_cache(maxsize=None)
+def get_key_pool():
+    """Return the scheduler shared by all LLM calls, over GOOGLE_API_KEY_1..3."""
+    from my_shopping_agent.llm.key_pool import (
+        DEFAULT_REQUESTS_PER_MINUTE,
+        DEFAULT_TOKENS_PER_MINUTE,
+        KeyPool,
+    )
+
+    load_environment()
+    names = [f"GOOGLE_API_KEY_{index}" for index in (1, 2, 3)]
+    api_keys = [(name, os.getenv(name)) for name in names if os.getenv(name)]
+    return KeyPool(
+        api_keys or [(names[0], None)],
+        requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE)),
+        tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", DEFAULT_TOKENS_PER_MINUTE)),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_llm(index):
+    """Return the LLM for agent slot ``index`` (1-3).
+
+    Each slot gets its own LLM object (agents set their own stop words on it),
+    but calls are routed over the shared key pool rather than one fixed key.
+    LLM_MODEL and LLM_BASE_URL point the crew at another endpoint, such as the
+    local stub in ``my_shopping_agent.llm.stub_server``.
+    """
+    from my_shopping_agent.llm.key_pool import PooledLLM
+
+    load_environment()
+    return PooledLLM(
+        model=os.getenv("LLM_MODEL", LLM_MODEL),
+        pool=get_key_pool(),
+        base_url=os.getenv("LLM_BASE_URL"),
+        temperature=0.7,
+        timeout=LLM_REQUEST_TIMEOUT,
+    )
+
+
+# Fix: Embedder configuration (vectors are cached on disk, only new chunks hit the API)
+@lru_cache(maxsize=None)
+def get_embedder():
+    """Return the crewAI embedder config shared by the agents and the crew."""
+    from my_shopping_agent.catalog.embedding_cache import cached_embedder
+
+    load_environment()
+    return cached_embedder({
+        "provider": "google",
+        "config": {
+            "api_key": os.getenv("GEMINI_API_KEY"),
+            "model": EMBEDDING_MODEL
+        }
+    })
+
+
+# Excel source configuration (loaded from the catalog's binary snapshot)
+@lru_cache(maxsize=None)
+def get_knowledge_source():
+    """Return the catalog knowledge source."""
+    from my_shopping_agent.catalog.knowledge import CatalogKnowledgeSource
+
+    return CatalogKnowledgeSource(
+        file_paths=["spreadsheet.xlsx"]
+    )
+
+
+_LAZY_GLOBALS = {
+    "llm1": lambda: get_llm(1),
+    "llm2": lambda: get_llm(2),
+    "llm3": lambda: get_llm(3),
+    "embedder": get_embedder,
+    "excel_source": get_knowledge_source,
 }
 
-# Excel source configuration
-excel_source = ExcelKnowledgeSource(
-    file_paths=["spreadsheet.xlsx"],
-    embedder=embedder
-)
+
+def __getattr__(name):
+    # Keep `from ...Shopping_crew import llm1, embedder, excel_source` working
+    if name in _LAZY_GLOBALS:
+        return _LAZY_GLOBALS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Agents do not retry failed tasks themselves (crewAI would, back to back);
+# ShopFlow retries with backoff and a circuit breaker instead
 
 @CrewBase
 class ShopCrew:
@@ -60,19 +120,32 @@ class ShopCrew:
         return Agent(
             config=self.agents_config['Orchestrator'],
             verbose=True,
-            knowledge_sources=[excel_source],
-            llm=llm1,
-            embedder=embedder
+            knowledge_sources=[get_knowledge_source()],
+            llm=get_llm(1),
+            max_retry_limit=0,
+            embedder=get_embedder()
         )
     
     @agent
     def Catalog(self) -> Agent:
         return Agent(
             config=self.agents_config['Catalog'],
-            knowledge_sources=[excel_source],
-            llm=llm2,
+            knowledge_sources=[get_knowledge_source()],
+            llm=get_llm(2),
+            max_retry_limit=0,
             verbose=True,
-            embedder=embedder
+            embedder=get_embedder()
+        )
+    
+    @memoize
+    def CatalogRanker(self) -> Agent:
+        # The Catalog agent without the catalog knowledge, for tasks that carry
+        # their own candidate rows; not part of the crew
+        return Agent(
+            config=self.agents_config['Catalog'],
+            llm=get_llm(2),
+            max_retry_limit=0,
+            verbose=True
         )
     
     @agent
@@ -80,7 +153,8 @@ class ShopCrew:
         return Agent(
             config=self.agents_config['Cart'],
             verbose=True,
-            llm=llm3
+            llm=get_llm(3),
+            max_retry_limit=0
         )
     @task
     def interact_with_user(self) -> Task:
@@ -114,8 +188,8 @@ class ShopCrew:
         return Crew(
             agents=self.agents,
             tasks=self.tasks,
-            knowledge_sources=[excel_source],
+            knowledge_sources=[get_knowledge_source()],
             process=Process.sequential,
             verbose=True,
-            embedder=embedder
+            embedder=get_embedder()
     )
\ No newline at end of file
@@ -0,0 +1,15 @@
+from my_shopping_agent.extraction.cache import ResponseCache, get_extraction_cache, normalize_query
+from my_shopping_agent.extraction.fast_path import (
+    DEFAULT_CONFIDENCE_THRESHOLD,
+    RuleBasedExtractor,
+    get_fast_extractor,
+)
+
+__all__ = [
+    "DEFAULT_CONFIDENCE_THRESHOLD",
+    "RuleBasedExtractor",
+    "ResponseCache",
+    "get_extraction_cache",
+    "get_fast_extractor",
+    "normalize_query",
+]
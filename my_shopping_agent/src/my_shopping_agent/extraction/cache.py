@@ -0,0 +1,157 @@
+"""Response cache for the Orchestrator's shopping-detail extraction.
+
+Most traffic is a small set of phrasings, so the structured JSON extracted for
+a query is cached under its normalized form. Entries live in an in-process LRU
+in front of a SQLite database (WAL mode) that survives restarts and is shared
+by every worker on the machine. Entries expire after ``ttl`` seconds and the
+least recently used ones are evicted beyond ``max_entries``.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+
+DEFAULT_CACHE_PATH = Path(".cache") / "responses.db"
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MEMORY_ENTRIES = 1024
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+def normalize_query(text: Any) -> str:
+    """Lowercase, drop punctuation and thousands separators, collapse whitespace.
+
+    "Laptop under $20,000!" and "laptop  under 20000" share one key.
+    """
+    text = re.sub(r"(?<=\d),(?=\d{3}\b)", "", str(text or "").lower())
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+class ResponseCache:
+    """Two-level (memory + SQLite) TTL/LRU cache of JSON-serializable responses."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        namespace: str = "extract",
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (namespace, accessed_at)"
+        )
+
+    def get(self, query: Any) -> Optional[Any]:
+        """Return the cached response for ``query``, or None on a miss."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[1])
+
+            row = self._db.execute(
+                "SELECT value, created_at FROM responses WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            self._remember(key, row[1], row[0])
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, query: Any, value: Any) -> None:
+        """Store ``value`` for ``query`` and evict expired or excess entries."""
+        key = normalize_query(query)
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, payload)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (namespace, key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, payload, now, now),
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE namespace = ? AND created_at <= ?",
+                (self.namespace, now - self.ttl),
+            )
+            self._db.execute(
+                """DELETE FROM responses WHERE namespace = ? AND key IN (
+                    SELECT key FROM responses WHERE namespace = ?
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.namespace, self.namespace, self.max_entries),
+            )
+
+    def _remember(self, key: str, created_at: float, payload: str) -> None:
+        self._memory[key] = (created_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses WHERE namespace = ?", (self.namespace,))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters for this process, plus the shared entry count."""
+        with self._lock:
+            size = self._db.execute(
+                "SELECT COUNT(*) FROM responses WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": size,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_extraction_cache() -> ResponseCache:
+    """Return the process-wide cache for shopping-detail extraction."""
+    return ResponseCache(namespace="extract")
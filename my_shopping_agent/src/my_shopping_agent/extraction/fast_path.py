@@ -0,0 +1,214 @@
+"""Rule-based extraction of shopping details that runs before the Orchestrator LLM.
+
+The extractor knows the catalog's vocabulary (product-name terms from the
+search engine's token index and the quality values) and a small price grammar
+("under 500", "10-20", "between 10 and 20", "$9000"). It scores how much of the
+query it understood; above the confidence threshold its result is used as is
+and the LLM is skipped.
+"""
+import re
+import threading
+import weakref
+from functools import reduce
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from my_shopping_agent.catalog.search import CatalogSearchEngine, get_search_engine, price_range
+from my_shopping_agent.catalog.text_index import tokenize
+
+
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+# Fuzzy lexicon matches below this similarity do not count as understood
+MIN_TERM_SIMILARITY = 0.75
+
+_NUMBER = r"\$?\s*(\d+(?:,\d{3})*(?:\.\d+)?)\s*(k\b)?"
+_CURRENCY = r"(?:\s*(?:rs\.?|pkr|usd|dollars?|rupees?))?"
+
+_PRICE_PATTERNS: List[Tuple[str, re.Pattern]] = [
+    ("range", re.compile(r"\bbetween\s+" + _NUMBER + _CURRENCY + r"\s+and\s+" + _NUMBER)),
+    ("range", re.compile(r"\bfrom\s+" + _NUMBER + _CURRENCY + r"\s+to\s+" + _NUMBER)),
+    ("range", re.compile(_NUMBER + r"\s*(?:-|to)\s*" + _NUMBER)),
+    ("max", re.compile(r"\b(?:under|below|less than|cheaper than|up to|upto|within|max(?:imum)?|at most|no more than)\s+" + _NUMBER)),
+    ("min", re.compile(r"\b(?:over|above|more than|at least|min(?:imum)?|starting at)\s+" + _NUMBER)),
+    ("exact", re.compile(r"\b(?:around|about|approximately|approx|for|at|price|cost|costs|priced at|budget(?: of)?)\s*:?\s*" + _NUMBER)),
+    ("exact", re.compile(r"\$\s*(\d+(?:,\d{3})*(?:\.\d+)?)\s*(k\b)?")),
+    # A bare number needs three digits so model numbers ("iphone 15") are left alone
+    ("exact", re.compile(r"\b(\d{3,}(?:,\d{3})*(?:\.\d+)?)\s*(k\b)?" + _CURRENCY + r"(?!\S)")),
+]
+_ID_PATTERN = re.compile(r"\b(?:product\s*id|pd[_\s]?id|id|item|#)\s*[:#]?\s*(\d+)\b|#(\d+)\b")
+
+_FILLER_WORDS = {
+    "i", "im", "i'm", "we", "me", "my", "want", "wanna", "would", "like", "to", "buy", "purchase",
+    "order", "get", "a", "an", "the", "some", "looking", "look", "for", "need", "show", "find",
+    "search", "searching", "please", "pls", "can", "you", "with", "of", "in", "is",
+    "quality", "price", "priced", "cost", "budget", "rs", "pkr", "usd", "dollar", "rupee", "one",
+    "new", "good", "nice", "that", "which", "any", "item", "product", "shop", "shopping",
+}
+
+
+def _number(value: str, thousands: Optional[str]) -> float:
+    number = float(value.replace(",", ""))
+    return number * 1000 if thousands else number
+
+
+def _format_number(number: float) -> Any:
+    return int(number) if float(number).is_integer() else number
+
+
+class RuleBasedExtractor:
+    """Extracts product name, price, ID and quality without an LLM call."""
+
+    def __init__(self, engine: CatalogSearchEngine, threshold: float = DEFAULT_CONFIDENCE_THRESHOLD):
+        self.engine = engine
+        self.threshold = threshold
+        self.qualities = {
+            str(value).strip().lower()
+            for value in engine.catalog["quality"].dropna().unique()
+            if str(value).strip()
+        }
+        self.fast_path_count = 0
+        self.llm_count = 0
+        self._lock = threading.Lock()
+
+    def _extract_price(self, text: str) -> Tuple[Any, str]:
+        """Return the price (number or range string) and the text with it removed."""
+        for kind, pattern in _PRICE_PATTERNS:
+            match = pattern.search(text)
+            if not match:
+                continue
+            groups = match.groups()
+            if kind == "range":
+                low, high = price_range(*groups)
+                price = f"{_format_number(low)}-{_format_number(high)}"
+            elif kind == "max":
+                price = f"0-{_format_number(_number(groups[0], groups[1]))}"
+            elif kind == "min":
+                price = f"over {_format_number(_number(groups[0], groups[1]))}"
+            else:
+                price = float(_number(groups[0], groups[1]))
+            return price, text[:match.start()] + " " + text[match.end():]
+        return None, text
+
+    def extract(self, user_input: str) -> Tuple[Dict[str, Any], float]:
+        """
+        Extract shopping details from a query.
+
+        Args:
+            user_input: The shopper's raw query
+
+        Returns:
+            ``(shopping_details, confidence)``; confidence is the share of the
+            query's words that were understood, and 0 unless the details are
+            valid (a product and a price were found), every product word is in
+            the catalog's vocabulary and one product has all of them
+        """
+        text = re.sub(r"(?<=\d),(?=\d{3}\b)", "", str(user_input or "").lower())
+        details: Dict[str, Any] = {
+            "product_name": None,
+            "price": None,
+            "pd_id": None,
+            "quality": None,
+            "is_valid": False,
+        }
+
+        total_words = max(len(tokenize(text)), 1)
+
+        id_match = _ID_PATTERN.search(text)
+        if id_match:
+            details["pd_id"] = int(id_match.group(1) or id_match.group(2))
+            text = text[:id_match.start()] + " " + text[id_match.end():]
+
+        details["price"], text = self._extract_price(text)
+
+        understood = total_words - len(tokenize(text))
+        product_words: List[str] = []
+        for word in tokenize(text):
+            if word in self.qualities:
+                details["quality"] = word
+                understood += 1
+            elif word in _FILLER_WORDS or len(word) < 2:
+                understood += 1
+            else:
+                product_words.append(word)
+
+        # Match the remaining words against the catalog vocabulary; split words
+        # ("lap top") resolve to one term, so spread each term over its words
+        resolved = self.engine.text_index.resolve(" ".join(product_words))
+        words_per_term = len(product_words) / max(len(resolved), 1)
+        known_terms = []
+        for term_weights in resolved:
+            similarity = max(term_weights.values(), default=0.0)
+            if similarity >= MIN_TERM_SIMILARITY:
+                understood += similarity * words_per_term
+                known_terms.append(term_weights)
+
+        if product_words and known_terms:
+            details["product_name"] = " ".join(product_words)
+        elif details["pd_id"] is not None:
+            matches = self.engine.catalog[self.engine.catalog["pd_id"].astype(str) == str(details["pd_id"])]
+            if len(matches):
+                details["product_name"] = str(matches.iloc[0]["product_name"])
+
+        if not details["product_name"]:
+            return details, 0.0
+
+        details["is_valid"] = bool(details["product_name"] and details["price"] is not None)
+        if not details["is_valid"]:
+            # Details the flow would not accept from the Orchestrator are no reason to skip it
+            return details, 0.0
+        if len(known_terms) < len(resolved) or (known_terms and not self._one_product(known_terms)):
+            # A word outside the catalog ("not", "without") may change what is
+            # asked for, and terms no product shares name several products
+            return details, 0.0
+        confidence = min(understood / total_words, 1.0)
+        return details, confidence
+
+    def _one_product(self, resolved: List[Dict[str, float]]) -> bool:
+        """Whether some catalog row matches every resolved term."""
+        postings = self.engine.text_index.postings
+        rows = [
+            np.unique(np.concatenate([postings[term] for term in term_weights]))
+            for term_weights in resolved
+        ]
+        return len(reduce(np.intersect1d, rows)) > 0
+
+    def try_extract(self, user_input: str, threshold: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Return the details if confidence reaches the threshold, else None.
+
+        Also counts how many queries the fast path handled versus passed on
+        to the LLM.
+        """
+        details, confidence = self.extract(user_input)
+        accepted = confidence >= (self.threshold if threshold is None else threshold)
+        with self._lock:
+            if accepted:
+                self.fast_path_count += 1
+            else:
+                self.llm_count += 1
+        return details if accepted else None
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.fast_path_count + self.llm_count
+        return {
+            "fast_path": self.fast_path_count,
+            "llm": self.llm_count,
+            "fast_path_rate": self.fast_path_count / total if total else 0.0,
+        }
+
+
+# Extractor per search engine, so a reloaded catalog gets its own vocabulary
+_extractors: "weakref.WeakKeyDictionary[CatalogSearchEngine, RuleBasedExtractor]" = weakref.WeakKeyDictionary()
+_extractors_lock = threading.Lock()
+
+
+def get_fast_extractor(engine: Optional[CatalogSearchEngine] = None) -> RuleBasedExtractor:
+    """Return the process-wide extractor over ``engine`` (the current default catalog by default)."""
+    engine = engine or get_search_engine()
+    extractor = _extractors.get(engine)
+    if extractor is None:
+        # Built outside the lock; if two threads race, the first one published wins
+        extractor = RuleBasedExtractor(engine)
+        with _extractors_lock:
+            extractor = _extractors.setdefault(engine, extractor)
+    return extractor
@@ -0,0 +1,33 @@
+from my_shopping_agent.llm.key_pool import KeyPool, PooledLLM, estimate_tokens, is_rate_limit_error
+from my_shopping_agent.llm.resilience import (
+    DEFAULT_ATTEMPTS,
+    AbandonedAttempts,
+    Backoff,
+    CircuitBreaker,
+    LatencyTracker,
+    ProviderUnavailable,
+    get_abandoned_attempts,
+    get_circuit_breaker,
+    is_provider_error,
+    run_resilient,
+)
+from my_shopping_agent.llm.streaming import ProductStreamParser, stream_tokens
+
+__all__ = [
+    "DEFAULT_ATTEMPTS",
+    "AbandonedAttempts",
+    "Backoff",
+    "CircuitBreaker",
+    "KeyPool",
+    "LatencyTracker",
+    "PooledLLM",
+    "ProductStreamParser",
+    "ProviderUnavailable",
+    "estimate_tokens",
+    "get_abandoned_attempts",
+    "get_circuit_breaker",
+    "is_provider_error",
+    "is_rate_limit_error",
+    "run_resilient",
+    "stream_tokens",
+]
@@ -0,0 +1,356 @@
+"""Shared scheduler for the pool of LLM API keys.
+
+Each key has a per-minute request and token budget. A call is routed to the
+healthy key with the most headroom; a key that answers 429 cools down for a
+while and the call is retried on another key. When every key is saturated the
+call waits for a slot instead of failing. A call still unanswered after the
+usual tail latency of recent calls is hedged: a duplicate goes out on another
+key with room, and whichever answers first is used.
+"""
+import copy
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Collection, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+import litellm
+from crewai import LLM
+
+from my_shopping_agent.llm.resilience import LatencyTracker, start_thread
+from my_shopping_agent.llm.streaming import current_token_listener
+from my_shopping_agent.telemetry import REGISTRY, record_llm_usage, span
+
+
+WINDOW_SECONDS = 60.0
+DEFAULT_REQUESTS_PER_MINUTE = 15
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_COOLDOWN_SECONDS = 30.0
+DEFAULT_QUEUE_TIMEOUT = 300.0
+# Rough characters-per-token ratio used to estimate token usage
+CHARS_PER_TOKEN = 4
+# Hedge a call once it has taken longer than this share of recent calls
+DEFAULT_HEDGE_QUANTILE = 0.95
+
+LLM_HEDGES = REGISTRY.counter("shopflow_llm_hedges_total", "Hedged LLM calls, by which request answered first")
+
+
+def estimate_tokens(messages: Union[str, Sequence[Dict[str, Any]], None]) -> int:
+    """Estimate the token count of a prompt or response."""
+    if messages is None:
+        return 0
+    if isinstance(messages, str):
+        text = messages
+    else:
+        text = "".join(str(message.get("content", "")) for message in messages)
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for 429 / rate-limit errors raised by litellm or the HTTP client."""
+    return (
+        getattr(error, "status_code", None) == 429
+        or any(klass.__name__ == "RateLimitError" for klass in type(error).__mro__)
+    )
+
+
+class KeyState:
+    """Sliding-window usage of one API key."""
+
+    def __init__(self, name: str, api_key: str, requests_per_minute: int, tokens_per_minute: int):
+        self.name = name
+        self.api_key = api_key
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # (timestamp, tokens) per request started in the last minute
+        self.window: Deque[List[float]] = deque()
+        self.tokens_in_window = 0.0
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.rate_limited = 0
+
+    def expire(self, now: float) -> None:
+        while self.window and now - self.window[0][0] >= WINDOW_SECONDS:
+            _, tokens = self.window.popleft()
+            self.tokens_in_window -= tokens
+
+    def load(self) -> float:
+        """Share of the tighter of the two budgets that is in use (0-1+)."""
+        return max(
+            (len(self.window) + self.in_flight) / max(self.requests_per_minute, 1),
+            self.tokens_in_window / max(self.tokens_per_minute, 1),
+        )
+
+    def has_room(self, tokens: int, now: float) -> bool:
+        if now < self.cooldown_until:
+            return False
+        if len(self.window) >= self.requests_per_minute:
+            return False
+        # A single oversized request may still use an idle key
+        return not self.window or self.tokens_in_window + tokens <= self.tokens_per_minute
+
+    def next_free(self, now: float) -> float:
+        """Earliest time this key may have room again."""
+        times = [self.cooldown_until] if now < self.cooldown_until else []
+        if self.window:
+            times.append(self.window[0][0] + WINDOW_SECONDS)
+        return min(times) if times else now
+
+
+class Lease:
+    """A reserved request slot on one key, returned by ``KeyPool.acquire``."""
+
+    def __init__(self, key: KeyState, entry: List[float]):
+        self.key = key
+        self.entry = entry
+
+    @property
+    def api_key(self) -> str:
+        return self.key.api_key
+
+
+class KeyPool:
+    """Routes LLM calls over several API keys within their rate limits."""
+
+    def __init__(
+        self,
+        api_keys: Sequence[Tuple[str, str]],
+        requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+        cooldown_seconds: float = DEFAULT_COOLDOWN_SECONDS,
+        queue_timeout: Optional[float] = DEFAULT_QUEUE_TIMEOUT,
+    ):
+        """
+        Args:
+            api_keys: ``(name, api_key)`` pairs, e.g. ``("GOOGLE_API_KEY_1", "...")``
+            requests_per_minute: Request budget of each key
+            tokens_per_minute: Token budget of each key
+            cooldown_seconds: How long a key rests after a 429
+            queue_timeout: Longest a call waits for a free key; None waits forever
+        """
+        if not api_keys:
+            raise ValueError("The key pool needs at least one API key")
+        self.keys = [
+            KeyState(name, api_key, requests_per_minute, tokens_per_minute)
+            for name, api_key in api_keys
+        ]
+        self.cooldown_seconds = cooldown_seconds
+        self.queue_timeout = queue_timeout
+        self.queued = 0
+        self._condition = threading.Condition()
+
+    def acquire(
+        self, tokens: int = 0, timeout: Optional[float] = None, exclude: Collection[KeyState] = ()
+    ) -> Lease:
+        """
+        Reserve a request slot on the least-loaded healthy key, waiting if needed.
+
+        Args:
+            tokens: Estimated tokens of the request
+            timeout: Longest to wait; None for the pool's queue timeout, 0 not to wait
+            exclude: Keys not to use
+
+        Raises:
+            TimeoutError: If no key had room within the queue timeout
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            waiting = False
+            while True:
+                now = time.monotonic()
+                for key in self.keys:
+                    key.expire(now)
+                candidates = [key for key in self.keys if key not in exclude and key.has_room(tokens, now)]
+                if candidates:
+                    key = min(candidates, key=KeyState.load)
+                    entry = [now, float(tokens)]
+                    key.window.append(entry)
+                    key.tokens_in_window += tokens
+                    key.in_flight += 1
+                    key.requests += 1
+                    if waiting:
+                        self.queued -= 1
+                    return Lease(key, entry)
+
+                if not waiting:
+                    waiting = True
+                    self.queued += 1
+                wake = min(key.next_free(now) for key in self.keys)
+                if deadline is not None and now >= deadline:
+                    self.queued -= 1
+                    raise TimeoutError("Every API key is rate limited; gave up waiting for a free key")
+                if deadline is not None:
+                    wake = min(wake, deadline)
+                self._condition.wait(max(wake - now, 0.01))
+
+    def release(self, lease: Lease, tokens_used: Optional[int] = None, rate_limited: bool = False) -> None:
+        """Return a slot, correcting its token count and cooling the key down after a 429."""
+        with self._condition:
+            key = lease.key
+            key.in_flight -= 1
+            # Entries that already left the window no longer count against the budget
+            if tokens_used is not None and time.monotonic() - lease.entry[0] < WINDOW_SECONDS:
+                key.tokens_in_window += tokens_used - lease.entry[1]
+                lease.entry[1] = float(tokens_used)
+            if rate_limited:
+                key.rate_limited += 1
+                key.cooldown_until = time.monotonic() + self.cooldown_seconds
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-key usage and the number of calls waiting for a key."""
+        with self._condition:
+            now = time.monotonic()
+            keys = {}
+            for key in self.keys:
+                key.expire(now)
+                keys[key.name] = {
+                    "requests": key.requests,
+                    "rate_limited": key.rate_limited,
+                    "in_flight": key.in_flight,
+                    "requests_last_minute": len(key.window),
+                    "tokens_last_minute": int(key.tokens_in_window),
+                    "cooling_down": now < key.cooldown_until,
+                }
+            return {"keys": keys, "queued": self.queued}
+
+
+class PooledLLM(LLM):
+    """crewAI LLM whose calls are scheduled over a ``KeyPool``.
+
+    Agents take it like any other ``LLM``. Every call borrows an API key from
+    the pool; on a 429 the key cools down and the call moves to another key.
+    Calls made inside ``stream_tokens`` are streamed to its listener.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        pool: KeyPool,
+        max_attempts: Optional[int] = None,
+        hedge_quantile: Optional[float] = DEFAULT_HEDGE_QUANTILE,
+        **kwargs,
+    ):
+        # The pool handles 429s itself, so the HTTP client should not retry them
+        kwargs.setdefault("max_retries", 0)
+        super().__init__(model=model, **kwargs)
+        self.pool = pool
+        self.max_attempts = max_attempts or 3 * len(pool.keys)
+        # A call slower than this quantile of recent ones gets a duplicate on
+        # another key; None never hedges
+        self.hedge_quantile = hedge_quantile
+        self.latencies = LatencyTracker()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        with span("llm.call", kind="llm", model=self.model):
+            return self._pooled_call(messages, tools, callbacks, available_functions)
+
+    def _pooled_call(self, messages, tools, callbacks, available_functions):
+        prompt_tokens = estimate_tokens(messages)
+        listener = current_token_listener()
+        hedge_after = None
+        # A duplicate would run tools twice or stream the reply twice
+        if self.hedge_quantile is not None and len(self.pool.keys) > 1 and not tools and listener is None:
+            hedge_after = self.latencies.percentile(self.hedge_quantile)
+        if hedge_after is None:
+            return self._call_with_retries(messages, tools, callbacks, available_functions, prompt_tokens, listener, [])
+        return self._hedged_call(messages, callbacks, prompt_tokens, hedge_after)
+
+    def _call_with_retries(self, messages, tools, callbacks, available_functions, prompt_tokens, listener, used_keys):
+        """Call on the least-loaded key, moving to another key after a 429; adds the keys used to ``used_keys``."""
+        for attempt in range(1, self.max_attempts + 1):
+            lease = self.pool.acquire(prompt_tokens)
+            used_keys.append(lease.key)
+            try:
+                response = self._keyed_call(lease, messages, tools, callbacks, available_functions, prompt_tokens, listener)
+            except Exception as error:
+                if not is_rate_limit_error(error) or attempt == self.max_attempts:
+                    record_llm_usage(prompt_tokens, 0, attempt - 1)
+                    raise
+                print(f"Rate limited on {lease.key.name}, retrying on another key...")
+                continue
+            record_llm_usage(prompt_tokens, estimate_tokens(response if isinstance(response, str) else ""), attempt - 1)
+            return response
+
+    def _hedged_call(self, messages, callbacks, prompt_tokens, hedge_after):
+        """Call as usual, and if no answer came within ``hedge_after`` seconds, race a duplicate on another key."""
+        used_keys = []
+        primary = start_thread(
+            self._call_with_retries, messages, None, callbacks, None, prompt_tokens, None, used_keys
+        )
+        try:
+            return primary.result(timeout=hedge_after)
+        except FutureTimeout:
+            pass
+        try:
+            lease = self.pool.acquire(prompt_tokens, timeout=0, exclude=used_keys)
+        except TimeoutError:
+            # No other key has room right now; keep waiting on the first request
+            return primary.result()
+        hedge = start_thread(self._keyed_call, lease, messages, None, callbacks, None, prompt_tokens, None)
+        requests = {primary: "primary", hedge: "hedge"}
+        pending = set(requests)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for request in done:
+                if request.exception() is None:
+                    # The slower request finishes in the background and is ignored
+                    LLM_HEDGES.inc(winner=requests[request])
+                    return request.result()
+                error = error or request.exception()
+        LLM_HEDGES.inc(winner="none")
+        raise error
+
+    def _keyed_call(self, lease, messages, tools, callbacks, available_functions, prompt_tokens, listener):
+        """One request on the key ``lease`` reserved; releases the lease when it is done."""
+        # Copy so concurrent calls never share an api_key
+        client = copy.copy(self)
+        client.api_key = lease.api_key
+        start = time.perf_counter()
+        try:
+            if listener is not None and not tools:
+                response = self._stream_call(client, messages, listener)
+            else:
+                response = LLM.call(client, messages, tools, callbacks, available_functions)
+        except Exception as error:
+            self.pool.release(lease, rate_limited=is_rate_limit_error(error))
+            raise
+        if listener is None:
+            # Streamed calls take as long as their reply; they would skew the hedging threshold
+            self.latencies.observe(time.perf_counter() - start)
+        completion_tokens = estimate_tokens(response if isinstance(response, str) else "")
+        self.pool.release(lease, prompt_tokens + completion_tokens)
+        return response
+
+    def _stream_call(self, client, messages, listener):
+        """Request a streamed completion, passing chunks to ``listener`` and returning the full text."""
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        params = {
+            "model": client.model,
+            "messages": client._format_messages_for_provider(messages),
+            "timeout": client.timeout,
+            "temperature": client.temperature,
+            "top_p": client.top_p,
+            "stop": client.stop,
+            "max_tokens": client.max_tokens or client.max_completion_tokens,
+            "seed": client.seed,
+            "api_base": client.api_base,
+            "base_url": client.base_url,
+            "api_version": client.api_version,
+            "api_key": client.api_key,
+            "stream": True,
+            **client.additional_params,
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+        parts = []
+        for chunk in litellm.completion(**params):
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                parts.append(text)
+                listener(text)
+        return "".join(parts)
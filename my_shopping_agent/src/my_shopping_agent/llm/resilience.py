@@ -0,0 +1,281 @@
+"""Timeouts, retries with backoff and circuit breaking for calls to the LLM provider.
+
+``run_resilient`` runs an agent task within a time budget, retrying attempts
+that the provider failed or that timed out after a jittered exponential
+backoff; any other error is a bug and is raised as is. Provider failures are
+counted by a ``CircuitBreaker`` shared by every call: after several in a row
+it opens and calls fail at once with ``ProviderUnavailable`` (so the flow
+takes its local fallback instead of waiting on a provider that is down) until
+a trial call succeeds. A timed-out attempt cannot be stopped, so it runs on in
+its thread; ``AbandonedAttempts`` counts those and caps how many may pile up.
+``LatencyTracker`` keeps recent call latencies for ``PooledLLM``'s hedged
+requests.
+"""
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import lru_cache
+from typing import Callable, Deque, List, Optional, TypeVar
+
+from my_shopping_agent.telemetry import REGISTRY
+
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 8.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_LATENCY_WINDOW = 200
+# Latency percentiles are not trusted below this many samples
+DEFAULT_MIN_SAMPLES = 20
+# Timed-out attempts that may still be running before calls fail at once
+DEFAULT_MAX_ABANDONED = 16
+# Errors raised by these packages come from the provider or the network to it
+PROVIDER_ERROR_MODULES = ("litellm", "openai", "httpx", "httpcore", "google")
+
+TASK_FAILURES = REGISTRY.counter("shopflow_task_failures_total", "Agent task attempts that failed or timed out")
+TASK_FALLBACKS = REGISTRY.counter(
+    "shopflow_task_unavailable_total",
+    "Agent tasks given up on (circuit open, too many timed-out calls running, or attempts exhausted)",
+)
+CIRCUIT_STATE = REGISTRY.gauge("shopflow_llm_circuit_state", "LLM provider circuit: 0 closed, 1 half-open, 2 open")
+ABANDONED_RUNNING = REGISTRY.gauge(
+    "shopflow_task_abandoned_running", "Timed-out agent task attempts still running in the background"
+)
+
+T = TypeVar("T")
+
+
+class ProviderUnavailable(Exception):
+    """The LLM provider did not answer: its circuit is open, or every attempt failed or timed out."""
+
+
+def is_provider_error(error: BaseException) -> bool:
+    """Whether ``error`` came from the LLM provider or the network (worth a retry) rather than from a bug."""
+    if isinstance(error, OSError):
+        # Timeouts, refused connections, and the key pool's wait for a free key
+        return True
+    if isinstance(error, ValueError) and "Invalid response from LLM" in str(error):
+        # crewAI's complaint about an empty reply
+        return True
+    return any(klass.__module__.split(".")[0] in PROVIDER_ERROR_MODULES for klass in type(error).__mro__)
+
+
+class Backoff:
+    """Exponential backoff with full jitter: attempt n waits U(0, min(cap, base * 2^(n-1)))."""
+
+    def __init__(self, base: float = DEFAULT_BACKOFF_BASE, cap: float = DEFAULT_BACKOFF_CAP):
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.cap, self.base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` failures in a row and lets one trial call through
+    every ``reset_timeout`` seconds until one succeeds."""
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        # When the circuit opened, or when the current trial call was let through
+        self._since = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self._since < self.reset_timeout:
+                return False
+            # Time for a (new) trial call; the others keep failing fast
+            self._set_state(self.HALF_OPEN)
+            self._since = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                print("LLM provider is answering again; circuit closed")
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                print(f"LLM provider is failing; using local fallbacks for the next {self.reset_timeout:.0f}s")
+                self._set_state(self.OPEN)
+                self._since = time.monotonic()
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.set((self.CLOSED, self.HALF_OPEN, self.OPEN).index(state))
+
+
+class LatencyTracker:
+    """Latencies of the most recent calls, for percentile estimates."""
+
+    def __init__(self, window: int = DEFAULT_LATENCY_WINDOW, min_samples: int = DEFAULT_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """The ``quantile`` (0-1) of recent latencies, or None until there are enough samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered: List[float] = sorted(self._samples)
+        return ordered[min(int(quantile * len(ordered)), len(ordered) - 1)]
+
+
+class AbandonedAttempts:
+    """Attempts that timed out but still run in their threads, which cannot be stopped.
+
+    Each ends once its call returns (at the latest after the LLM client's own
+    request timeout); until then it holds a thread and, for an agent task, the
+    agent, which is why retries run on a copy of the agent.
+    """
+
+    def __init__(self, limit: int = DEFAULT_MAX_ABANDONED):
+        self.limit = limit
+        self.running = 0
+        self._lock = threading.Lock()
+
+    def add(self, call: Future) -> None:
+        """Count ``call`` until it finishes."""
+        with self._lock:
+            self.running += 1
+            ABANDONED_RUNNING.set(self.running)
+        call.add_done_callback(self._finished)
+
+    def _finished(self, call: Future) -> None:
+        with self._lock:
+            self.running -= 1
+            ABANDONED_RUNNING.set(self.running)
+
+    def full(self) -> bool:
+        """Whether no more attempts should be started until some of these finish."""
+        with self._lock:
+            return self.running >= self.limit
+
+
+def start_thread(fn: Callable[..., T], *args) -> "Future[T]":
+    """Run ``fn`` in a daemon thread, in a copy of the current context, and return its future.
+
+    Daemon threads, unlike a pool's workers, do not hold up exit for a call
+    whose answer nobody is waiting for any more.
+    """
+    future: "Future[T]" = Future()
+    context = contextvars.copy_context()
+
+    def target():
+        try:
+            future.set_result(context.run(fn, *args))
+        except BaseException as error:
+            future.set_exception(error)
+
+    threading.Thread(target=target, daemon=True).start()
+    return future
+
+
+def run_resilient(
+    operation: Callable[[int], T],
+    name: str,
+    timeout: Optional[float] = None,
+    attempts: int = DEFAULT_ATTEMPTS,
+    backoff: Optional[Backoff] = None,
+    breaker: Optional["CircuitBreaker"] = None,
+    abandoned: Optional[AbandonedAttempts] = None,
+) -> T:
+    """
+    Call ``operation(attempt)`` until it succeeds, within ``timeout`` seconds overall.
+
+    Only provider errors (see ``is_provider_error``) and timeouts are retried
+    and counted against the breaker. An attempt that times out keeps running
+    in the background; ``operation`` must not share state with the next one.
+
+    Args:
+        operation: The call to make; gets the attempt number, from 1
+        name: What is being called, for messages and metrics (e.g. the agent's name)
+        timeout: Budget for all attempts and the waits between them; None for no limit
+        attempts: Most attempts to make
+        backoff: Wait between attempts; a ``Backoff()`` by default
+        breaker: Circuit breaker that attempts are counted against
+        abandoned: Where timed-out attempts are counted; the shared
+            ``get_abandoned_attempts()`` by default
+
+    Raises:
+        ProviderUnavailable: If the circuit is open, too many timed-out attempts
+            are still running, or no attempt succeeded in time
+        Exception: Whatever else an attempt raised, at once
+    """
+    backoff = backoff or Backoff()
+    abandoned = abandoned or get_abandoned_attempts()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    error: Optional[BaseException] = None
+    for attempt in range(1, attempts + 1):
+        if breaker is not None and not breaker.allow():
+            TASK_FALLBACKS.inc(name=name, reason="circuit_open")
+            raise ProviderUnavailable(f"{name}: the LLM provider is unavailable") from error
+        if abandoned.full():
+            # Calls that hang are piling up; do not start another thread
+            TASK_FALLBACKS.inc(name=name, reason="abandoned")
+            raise ProviderUnavailable(f"{name}: {abandoned.running} timed-out calls are still running") from error
+        remaining = None if deadline is None else deadline - time.monotonic()
+        call = start_thread(operation, attempt)
+        try:
+            try:
+                result = call.result(timeout=remaining)
+            except FutureTimeout:
+                # The attempt is abandoned and finishes in the background
+                abandoned.add(call)
+                raise TimeoutError(f"no answer within {timeout:.0f}s") from None
+        except Exception as e:
+            TASK_FAILURES.inc(name=name, error=type(e).__name__)
+            if not is_provider_error(e):
+                # A bug, not the provider: another attempt would fail the same way
+                raise
+            error = e
+            if breaker is not None:
+                breaker.record_failure()
+            delay = backoff.delay(attempt)
+            if attempt == attempts or (deadline is not None and time.monotonic() + delay >= deadline):
+                break
+            print(f"{name} call failed ({type(e).__name__}); retrying in {delay:.1f}s...")
+            time.sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+    TASK_FALLBACKS.inc(name=name, reason="failed")
+    reason = "timed out" if isinstance(error, TimeoutError) else f"failed ({type(error).__name__})"
+    raise ProviderUnavailable(f"{name}: {reason} after {attempt} attempt(s)") from error
+
+
+@lru_cache(maxsize=None)
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the circuit breaker shared by every call to the LLM provider."""
+    return CircuitBreaker()
+
+
+@lru_cache(maxsize=None)
+def get_abandoned_attempts() -> AbandonedAttempts:
+    """Return the count of timed-out attempts shared by every ``run_resilient`` call."""
+    return AbandonedAttempts()
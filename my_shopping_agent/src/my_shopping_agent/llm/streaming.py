@@ -0,0 +1,123 @@
+"""Token streaming for LLM calls and incremental parsing of product lists.
+
+crewAI agents only ever see a finished reply, so streaming is opt-in per
+calling context: inside ``with stream_tokens(callback):`` a ``PooledLLM``
+requests a streamed completion and hands every text chunk to ``callback``
+while it assembles the reply the agent gets back.
+
+``ProductStreamParser`` is fed those chunks and returns each object of the
+reply's ``products`` array as soon as its closing brace arrives, so the first
+match can be shown while the rest are still being generated.
+"""
+import contextlib
+import contextvars
+import json
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+TokenListener = Callable[[str], None]
+
+_token_listener: contextvars.ContextVar = contextvars.ContextVar("token_listener", default=None)
+
+_PRODUCTS_KEY = re.compile(r'"products"\s*:\s*\[')
+
+
+@contextlib.contextmanager
+def stream_tokens(listener: TokenListener) -> Iterator[None]:
+    """Stream LLM calls made in this context, passing each text chunk to ``listener``."""
+    token = _token_listener.set(listener)
+    try:
+        yield
+    finally:
+        _token_listener.reset(token)
+
+
+def current_token_listener() -> Optional[TokenListener]:
+    return _token_listener.get()
+
+
+class ProductStreamParser:
+    """Incremental parser for the ``products`` array of a streamed JSON reply.
+
+    Text before the array (a "Thought:" line, a ```json fence, other keys) is
+    skipped. Objects are decoded one at a time, tolerating trailing commas, and
+    a product is only returned once; one that fails to decode is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.products: List[Dict[str, Any]] = []
+        self.done = False
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self._seen = set()
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Add a chunk of the reply; returns the products it completed."""
+        self.buffer += text
+        completed = []
+        if self.done:
+            return completed
+
+        if not self._in_array:
+            match = _PRODUCTS_KEY.search(self.buffer, max(self._pos - 32, 0))
+            if not match:
+                # Keep scanning from near the end; the key may be split across chunks
+                self._pos = len(self.buffer)
+                return completed
+            self._in_array = True
+            self._pos = match.end()
+
+        buffer = self.buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = pos
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # End of the products array
+                    self.done = True
+                    self._pos = pos + 1
+                    return completed
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    product = self._decode(buffer[self._object_start:pos + 1])
+                    self._object_start = None
+                    if product is not None:
+                        completed.append(product)
+        self._pos = len(buffer)
+        return completed
+
+    def _decode(self, text: str) -> Optional[Dict[str, Any]]:
+        try:
+            product = json.loads(text)
+        except json.JSONDecodeError:
+            fixed = re.sub(r',\s*([}\]])', r'\1', text)
+            try:
+                product = json.loads(fixed)
+            except json.JSONDecodeError:
+                return None
+        if not isinstance(product, dict):
+            return None
+        key = str(product.get("product_id", product.get("product_name")))
+        if key in self._seen:
+            return None
+        self._seen.add(key)
+        self.products.append(product)
+        return product
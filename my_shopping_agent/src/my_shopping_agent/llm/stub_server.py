@@ -0,0 +1,252 @@
+"""Local OpenAI-compatible LLM endpoint for offline testing.
+
+It answers ``POST /v1/chat/completions`` with a canned reply and enforces a
+per-API-key requests-per-minute limit, answering 429 like the real service
+when a key goes over it. Requests with ``"stream": true`` get the reply as
+server-sent events, one word per chunk. ``GET /stats`` reports the requests and 429s per key.
+
+Faults can be injected to exercise retries, hedging and the circuit breaker:
+a share of requests fails with a 503 (``error_rate``) and a share is answered
+only after an extra delay (``slow_rate``, ``slow_latency``). Both can be
+changed on a running server, e.g. ``server.error_rate = 1.0`` for an outage.
+
+Point the crew at it with::
+
+    python -m my_shopping_agent.llm.stub_server --port 8089 --rpm 5
+    LLM_MODEL=openai/stub LLM_BASE_URL=http://127.0.0.1:8089/v1 kickoff
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from my_shopping_agent.llm.key_pool import WINDOW_SECONDS, estimate_tokens
+
+
+DEFAULT_PORT = 8089
+# Answer in the shape crewAI agents expect; "{}" is an empty JSON result
+DEFAULT_REPLY = "Thought: I now know the final answer\nFinal Answer: {}"
+
+Responder = Callable[[List[Dict[str, Any]]], str]
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the stub's rate limits and counters."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = DEFAULT_PORT,
+        host: str = "127.0.0.1",
+        requests_per_minute: Optional[int] = None,
+        latency: float = 0.0,
+        reply: Union[str, Responder] = DEFAULT_REPLY,
+        token_delay: float = 0.0,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            port: Port to listen on (0 picks a free one)
+            host: Interface to bind
+            requests_per_minute: Per-key limit before answering 429; None for no limit
+            latency: Seconds to sleep before each answer
+            reply: Reply text, or a function of the request messages returning it
+            token_delay: Seconds between chunks of a streamed reply
+            error_rate: Share of requests (0-1) answered with a 503
+            slow_rate: Share of requests (0-1) delayed by ``slow_latency`` more
+            slow_latency: Extra seconds a slow request takes
+            seed: Seed for choosing which requests fail or are slow
+        """
+        super().__init__((host, port), _StubHandler)
+        self.requests_per_minute = requests_per_minute
+        self.latency = latency
+        self.reply = reply
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+        self.requests: Dict[str, deque] = defaultdict(deque)
+        self.counts: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"ok": 0, "rate_limited": 0, "failed": 0, "slow": 0}
+        )
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def admit(self, api_key: str) -> bool:
+        """Count a request against ``api_key``; False if it is over the limit."""
+        with self.lock:
+            now = time.monotonic()
+            window = self.requests[api_key]
+            while window and now - window[0] >= WINDOW_SECONDS:
+                window.popleft()
+            if self.requests_per_minute is not None and len(window) >= self.requests_per_minute:
+                self.counts[api_key]["rate_limited"] += 1
+                return False
+            window.append(now)
+            self.counts[api_key]["ok"] += 1
+            return True
+
+    def fault(self, api_key: str) -> Optional[str]:
+        """Pick the fault to inject into a request: "fail", "slow" or None."""
+        with self.lock:
+            roll = self.random.random()
+            if roll < self.error_rate:
+                self.counts[api_key]["failed"] += 1
+                return "fail"
+            if roll < self.error_rate + self.slow_rate:
+                self.counts[api_key]["slow"] += 1
+                return "slow"
+            return None
+
+    def answer(self, messages: List[Dict[str, Any]]) -> str:
+        return self.reply(messages) if callable(self.reply) else self.reply
+
+    def start(self) -> threading.Thread:
+        """Serve from a daemon thread and return it."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: StubLLMServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.lock:
+                self._send_json(200, dict(self.server.counts))
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        api_key = self.headers.get("Authorization", "").replace("Bearer", "").strip() or "anonymous"
+
+        if not self.server.admit(api_key):
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit exceeded", "type": "rate_limit_exceeded", "code": 429}},
+                {"Retry-After": str(int(WINDOW_SECONDS))},
+            )
+            return
+
+        fault = self.server.fault(api_key)
+        if fault == "fail":
+            self._send_json(503, {"error": {"message": "Service unavailable (injected)", "type": "server_error", "code": 503}})
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if fault == "slow":
+            time.sleep(self.server.slow_latency)
+        messages = request.get("messages", [])
+        reply = self.server.answer(messages)
+        if request.get("stream"):
+            self._send_stream(request, reply)
+            return
+        prompt_tokens = estimate_tokens(messages)
+        completion_tokens = estimate_tokens(reply)
+        self._send_json(200, {
+            "id": f"stub-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _send_stream(self, request: Dict[str, Any], reply: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        completion_id = f"stub-{time.time_ns()}"
+
+        def event(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> None:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        for word in re.findall(r"\s*\S+", reply):
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+            event({"content": word})
+        event({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub LLM with per-key rate limits and fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--rpm", type=int, default=None, help="requests per minute allowed per API key")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="reply text")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of requests answered late")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="extra seconds a late request takes")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the injected faults")
+    args = parser.parse_args(argv)
+
+    server = StubLLMServer(
+        args.port, args.host, args.rpm, args.latency, args.reply, args.token_delay,
+        args.error_rate, args.slow_rate, args.slow_latency, args.seed,
+    )
+    print(f"Stub LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
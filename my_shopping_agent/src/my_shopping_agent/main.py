@@ -1,44 +1,320 @@
 #!/usr/bin/env python
-from crewai.flow.flow import Flow, listen, start
+from crewai.flow.flow import Flow, FlowMeta, listen, start
 from crewai import Task
-from my_shopping_agent.crews.poem_crew.Shopping_crew import ShopCrew, excel_source
+from my_shopping_agent.crews.poem_crew.Shopping_crew import ShopCrew, get_embedder, get_knowledge_source, get_llm
+from my_shopping_agent.catalog import (
+    DEFAULT_CANDIDATES,
+    CatalogPrefetch,
+    CatalogWatcher,
+    get_search_engine,
+    get_semantic_index,
+    parse_price,
+)
+from my_shopping_agent.catalog.reload import DEFAULT_POLL_INTERVAL
+from my_shopping_agent.checkpoints import get_checkpoint_store
+from my_shopping_agent.extraction import DEFAULT_CONFIDENCE_THRESHOLD, get_extraction_cache, get_fast_extractor
+from my_shopping_agent.llm import (
+    DEFAULT_ATTEMPTS,
+    ProductStreamParser,
+    ProviderUnavailable,
+    get_circuit_breaker,
+    run_resilient,
+    stream_tokens,
+)
+from my_shopping_agent.llm.resilience import start_thread
+from my_shopping_agent.orders import Cart, cart_total, get_order_ledger, get_order_service
+from my_shopping_agent.telemetry import REGISTRY, record_parse, session_trace, span
 from datetime import datetime
+from functools import partial
 import re
 import json
-import pandas as pd
-from pathlib import Path
+import os
 import traceback
-import csv
+import sys
+import asyncio
+import uuid
 
 
+# Number of nearest products the vector index contributes to a search
+SEMANTIC_TOP_K = 20
+# Seconds an agent's task (or the match explanation) may take, retries
+# included, before its stage falls back to the local path
+TASK_TIMEOUTS = {"Orchestrator": 20.0, "Catalog": 45.0, "Cart": 20.0, "Explanation": 10.0}
+# Asked once a product is picked
+CHECKOUT_PROMPT = "\nCheck out now (y), add to cart and keep shopping (a), or cancel (n)? "
+# Stages whose outputs are checkpointed, in flow order; complete_shopping_session
+# ends the session and drops its checkpoints
+CHECKPOINT_STAGES = (
+    "interaction_with_user",
+    "extract_shopping_details",
+    "search_product_catalog",
+    "handle_product_selection",
+    "save_cart_to_file",
+)
 
-class ShopFlow(Flow):
+
+class ShopFlowMeta(FlowMeta):
+    """FlowMeta that also keeps the stages registered on base classes.
+
+    crewAI only registers the stages declared on the class itself, so without
+    this a subclass that just overrides a helper (``ask``, say) has no stages.
+    """
+
+    def __new__(mcs, name, bases, dct):
+        cls = super().__new__(mcs, name, bases, dct)
+        start_methods, listeners, routers, router_paths = [], {}, set(), {}
+        for klass in reversed(cls.__mro__):
+            if isinstance(klass, FlowMeta):
+                start_methods += [method for method in klass._start_methods if method not in start_methods]
+                listeners.update(klass._listeners)
+                routers |= klass._routers
+                router_paths.update(klass._router_paths)
+        cls._start_methods = start_methods
+        cls._listeners = listeners
+        cls._routers = routers
+        cls._router_paths = router_paths
+        return cls
+
+
+class ShopFlow(Flow, metaclass=ShopFlowMeta):
     """Flow for the shopping application."""
     
-    def __init__(self):
+    def __init__(self, use_llm_scoring=False, semantic_search=False, cache_extractions=True,
+                 fast_path_threshold=DEFAULT_CONFIDENCE_THRESHOLD, stream_matches=False,
+                 llm_confirmation=False, trace_dir=None, metrics_file=None,
+                 catalog_candidates=DEFAULT_CANDIDATES, checkpoints=True, task_timeouts=None,
+                 task_attempts=DEFAULT_ATTEMPTS, speculative_search=True):
         super().__init__()
-        # Initialize ShopCrew
+        # Score products locally; set use_llm_scoring to let the Catalog agent score them
+        self.use_llm_scoring = use_llm_scoring
+        # With LLM scoring, the agent scores only this many candidate rows picked
+        # by the local search; 0 or None lets it search the catalog knowledge
+        self.catalog_candidates = catalog_candidates
+        # With LLM scoring, stream the Catalog agent's reply and show each
+        # product option as soon as it has been generated
+        self.stream_matches = stream_matches
+        # Order IDs and delivery dates are computed locally; set llm_confirmation
+        # to have the Cart agent write the order confirmation instead
+        self.llm_confirmation = llm_confirmation
+        # When a session ends, write its spans to <trace_dir>/<trace id>.json
+        # and the process's Prometheus metrics to metrics_file
+        self.trace_dir = trace_dir or os.getenv("SHOPFLOW_TRACE_DIR")
+        self.metrics_file = metrics_file or os.getenv("SHOPFLOW_METRICS_FILE")
+        self.trace = None
+        # Id of the next trace; a random one when None
+        self.trace_id = None
+        # Also match product names by embedding similarity through the local vector index
+        self.semantic_search = semantic_search
+        # Reuse extracted details for queries seen before (shared on-disk cache)
+        self.extraction_cache = get_extraction_cache() if cache_extractions else None
+        # Skip the Orchestrator for queries the rule-based extractor understands
+        # with at least this confidence; None always asks the LLM
+        self.fast_path_threshold = fast_path_threshold
+        # Time budgets per agent (see TASK_TIMEOUTS) and attempts per task;
+        # failed attempts are retried with backoff
+        self.task_timeouts = {**TASK_TIMEOUTS, **(task_timeouts or {})}
+        self.task_attempts = task_attempts
+        # While the Orchestrator extracts the details, look up the raw query's
+        # product names in the catalog, for the search to reuse or refine
+        self.speculative_search = speculative_search
+        self._prefetch = None
+        # Products picked so far this session; checked out together as one order
+        self.cart = Cart()
+        # Save each stage's output under session_id as it completes, so an
+        # interrupted session can be resumed without repeating LLM calls
+        self.checkpoint_store = get_checkpoint_store() if checkpoints else None
+        self.session_id = uuid.uuid4().hex
+        # Outputs of the stages a resumed session already completed
+        self._replay = {}
+        # Initialize ShopCrew; its agents are memoized and only built when a
+        # stage first calls shop_crew.Orchestrator(), Catalog() or Cart()
         self.shop_crew = ShopCrew()
-        self.orchestrator_agent = self.shop_crew.Orchestrator()
-        self.catalog_agent = self.shop_crew.Catalog()
-        self.knowledge_sources = [excel_source]
-        self.cart_agent = self.shop_crew.Cart()
+    
+    def ask(self, prompt):
+        """Read the shopper's answer to a prompt (from the terminal by default)."""
+        return input(prompt)
+    
+    def _converse(self, dialog):
+        """
+        Run a dialog generator to its end and return its result.
+        
+        A dialog yields either a prompt, answered with ``ask()``, or a callable
+        doing blocking work, answered with its result, so that ``AsyncShopFlow``
+        can run the same dialogs without blocking its event loop.
+        """
+        try:
+            step = next(dialog)
+            while True:
+                step = dialog.send(self.ask(step) if isinstance(step, str) else step())
+        except StopIteration as end:
+            return end.value
+    
+    async def kickoff_async(self, inputs=None):
+        """Run the flow as one traced session."""
+        with session_trace(self.trace_id) as trace:
+            self.trace = trace
+            try:
+                return await super().kickoff_async(inputs)
+            finally:
+                if self.trace_dir:
+                    trace.write(self.trace_dir)
+                if self.metrics_file:
+                    REGISTRY.write(self.metrics_file)
+    
+    def resume(self, session_id):
+        """Run an interrupted session again from its first stage without a checkpoint."""
+        self._restore(session_id)
+        return self.kickoff()
+    
+    async def resume_async(self, session_id):
+        self._restore(session_id)
+        return await self.kickoff_async()
+    
+    def _restore(self, session_id):
+        if self.checkpoint_store is None:
+            self.checkpoint_store = get_checkpoint_store()
+        self.session_id = session_id
+        checkpoints = self.checkpoint_store.load(session_id)
+        if not checkpoints:
+            print(f"No checkpoints for session {session_id}; starting it from the beginning.")
+            return
+        self._replay = {stage: checkpoint["output"] for stage, checkpoint in checkpoints}
+        self.cart.items = checkpoints[-1][1]["cart"]
+        next_stage = (CHECKPOINT_STAGES + ("complete_shopping_session",))[len(checkpoints)]
+        print(f"Resuming session {session_id} at {next_stage}")
+    
+    async def _execute_method(self, method_name, method, *args, **kwargs):
+        # Every @start/@listen stage runs through here
+        with span(method_name, kind="stage") as stage_span:
+            if method_name in self._replay:
+                # Completed before the session was interrupted; reuse its output
+                output = self._replay.pop(method_name)
+                stage_span.set(restored=True)
+                return await super()._execute_method(method_name, lambda *args, **kwargs: output, *args, **kwargs)
+            result = await super()._execute_method(method_name, method, *args, **kwargs)
+        await asyncio.to_thread(self._checkpoint, method_name, result)
+        return result
+    
+    def _checkpoint(self, stage, result):
+        """Save a completed stage's output, and the cart, under the session ID."""
+        if self.checkpoint_store is None:
+            return
+        if stage == "complete_shopping_session":
+            self.checkpoint_store.discard(self.session_id)
+        elif stage in CHECKPOINT_STAGES and not (isinstance(result, dict) and "error" in result):
+            # A stage that failed is not saved, so it runs again on resume
+            with span("checkpoint.save", kind="io", stage=stage) as save_span:
+                size = self.checkpoint_store.save(
+                    self.session_id, CHECKPOINT_STAGES.index(stage), stage,
+                    {"output": result, "cart": self.cart.items}
+                )
+                save_span.set(bytes=size)
+    
+    def _run_task(self, agent_name, agent, task):
+        """
+        Execute an agent task inside a timing span, retrying within the agent's time budget.
+        
+        Raises:
+            ProviderUnavailable: If the LLM provider's circuit is open, or no attempt succeeded in time
+        """
+        def attempt(number):
+            # An attempt that timed out may still be running on the agent; retry on a copy
+            return (agent if number == 1 else agent.copy()).execute_task(task)
+        
+        with span("execute_task", kind="task", agent=agent_name):
+            return self._call_resiliently(agent_name, attempt)
+    
+    def _call_resiliently(self, name, operation):
+        return run_resilient(
+            operation, name, timeout=self.task_timeouts.get(name), attempts=self.task_attempts,
+            breaker=get_circuit_breaker()
+        )
     
     @start()
     def interaction_with_user(self):
         """Get the user's shopping query."""
         print("Welcome to our Agentic AI Shopping Mart!")
-        user_input = input("What would you like to shop for today? ")
+        user_input = self.ask("What would you like to shop for today? ")
         return user_input
         
     @listen(interaction_with_user)
     def extract_shopping_details(self, user_input):
         """Extract shopping details from the user query."""
         print("Analyzing your shopping needs...")
+        
+        self._prefetch = None
+        shopping_details = self._known_shopping_details(user_input)
+        if shopping_details is not None:
+            return shopping_details
+        
         print("Extracting details...")
+        self._start_prefetch(user_input)
+        
+        # Execute the task
+        try:
+            result = self._run_task("Orchestrator", self.shop_crew.Orchestrator(), self._extraction_task(user_input))
+        except ProviderUnavailable as e:
+            return self._fallback_shopping_details(user_input, e)
+        return self._parse_shopping_details(result, user_input)
+    
+    def _known_shopping_details(self, user_input):
+        """Details from the extraction cache or the rule-based fast path, if either has them."""
+        if self.extraction_cache is not None:
+            cached_details = self.extraction_cache.get(user_input)
+            if cached_details is not None:
+                print(f"Extracted shopping details (cached): {json.dumps(cached_details, indent=2)}")
+                record_parse("extraction", "cache")
+                return cached_details
         
+        if self.fast_path_threshold is not None:
+            fast_details = get_fast_extractor().try_extract(user_input, self.fast_path_threshold)
+            if fast_details is not None:
+                print(f"Extracted shopping details (rule-based): {json.dumps(fast_details, indent=2)}")
+                record_parse("extraction", "rule_based")
+                return fast_details
+        return None
+    
+    def _start_prefetch(self, user_input):
+        """Start searching the catalog for the raw query's details while the Orchestrator runs."""
+        if not self.speculative_search:
+            return
+        raw_details, _ = get_fast_extractor().extract(user_input)
+        if not raw_details["product_name"] and raw_details["pd_id"] is None:
+            return
+        self._prefetch = CatalogPrefetch(
+            get_search_engine(),
+            raw_details["product_name"],
+            price=raw_details["price"],
+            quality=raw_details["quality"],
+            pd_id=raw_details["pd_id"],
+        )
+        start_thread(self._run_prefetch, self._prefetch)
+    
+    def _run_prefetch(self, prefetch):
+        with span("catalog.prefetch", kind="search", catalog_generation=prefetch.engine.generation) as current:
+            prefetch.run()
+            current.set(rows=len(prefetch.rows), results=len(prefetch.products))
+    
+    def _take_prefetch(self):
+        """The prefetch started for this query, if any; each one serves a single search."""
+        prefetch, self._prefetch = self._prefetch, None
+        return prefetch
+    
+    def _fallback_shopping_details(self, user_input, error):
+        """Rule-based details, whatever their confidence, for when the Orchestrator cannot answer."""
+        print(f"{error}; reading the details from your query instead.")
+        shopping_details, _ = get_fast_extractor().extract(user_input)
+        if not shopping_details["product_name"]:
+            # Nothing in the query was recognised; search with no specific criteria
+            shopping_details["product_name"] = "unknown product"
+        record_parse("extraction", "fallback")
+        print(f"Extracted shopping details (rule-based): {json.dumps(shopping_details, indent=2)}")
+        return shopping_details
+    
+    def _extraction_task(self, user_input):
+        """Orchestrator task that extracts shopping details from the query."""
         # Create task for the Orchestrator agent
-        extract_task = Task(
+        return Task(
             description=f"""
             Extract shopping details from this query: "{user_input}"
             
@@ -56,12 +332,11 @@ class ShopFlow(Flow):
             - is_valid (true if required fields are present)
             """,
             expected_output="json",
-            agent=self.orchestrator_agent
+            agent=self.shop_crew.Orchestrator()
         )
-        
-        # Execute the task
-        result = self.orchestrator_agent.execute_task(extract_task)
-        
+    
+    def _parse_shopping_details(self, result, user_input):
+        """Parse the Orchestrator's answer, falling back to regexes on the raw query."""
         # Parse JSON result
         try:
             # Try to extract JSON using regex
@@ -69,6 +344,7 @@ class ShopFlow(Flow):
             if json_match:
                 json_str = json_match.group(1) if json_match.group(1) else json_match.group(0)
                 shopping_details = json.loads(json_str)
+                record_parse("extraction", "json")
             else:
                 # Fallback: create basic structure
                 shopping_details = {
@@ -92,9 +368,11 @@ class ShopFlow(Flow):
                 # Mark as valid if we have product name and price
                 if shopping_details['product_name'] and shopping_details['price']:
                     shopping_details['is_valid'] = True
+                record_parse("extraction", "query_regex")
         
         except Exception as e:
             print(f"Error parsing extraction result: {str(e)}")
+            record_parse("extraction", "error")
             shopping_details = {
                 'product_name': "unknown product",
                 'price': "market price",
@@ -103,6 +381,10 @@ class ShopFlow(Flow):
                 'is_valid': False
             }
         
+        # Only complete extractions are worth reusing
+        if self.extraction_cache is not None and shopping_details.get('is_valid'):
+            self.extraction_cache.set(user_input, shopping_details)
+        
         print(f"Extracted shopping details: {json.dumps(shopping_details, indent=2)}")
         return shopping_details
     
@@ -111,11 +393,42 @@ class ShopFlow(Flow):
         """Find matching products using the Catalog agent."""
         print("Searching product catalog for matching items...")
         
+        product_name, search_criteria_text = self._search_criteria(shopping_details)
+        
+        try:
+            if self.use_llm_scoring:
+                matching_products = self._llm_match_products(search_criteria_text, shopping_details)
+            else:
+                matching_products = self._local_match_products(shopping_details, search_criteria_text)
+            
+            matching_products = self._finalize_matches(matching_products)
+            self._add_facet_counts(shopping_details, matching_products)
+            if matching_products["products"]:
+                # Present product options
+                self._present_product_options(matching_products)
+            else:
+                suggestions = []
+                # Generate suggestions based on the catalog
+                if product_name and product_name != "unknown product":
+                    try:
+                        suggestions_result = self._run_task("Catalog", self.shop_crew.Catalog(), self._suggestions_task(product_name))
+                        suggestions = self._parse_suggestions(suggestions_result)
+                    except ProviderUnavailable as e:
+                        print(f"No suggestions available: {e}")
+                self._report_suggestions(matching_products, suggestions)
+            
+            return self._search_result(shopping_details, matching_products)
+            
+        except Exception as e:
+            return self._search_error(shopping_details, e)
+    
+    def _search_criteria(self, shopping_details):
+        """Log the search parameters and return ``(product_name, search_criteria_text)``."""
         # Extract search parameters
-        product_name = shopping_details.get('product_name', '').lower()
-        price = shopping_details.get('price', '')
-        pd_id = shopping_details.get('pd_id', '')
-        quality = shopping_details.get('quality', '')
+        product_name = (shopping_details.get('product_name') or '').lower()
+        price = shopping_details.get('price') or ''
+        pd_id = shopping_details.get('pd_id') or ''
+        quality = shopping_details.get('quality') or ''
         
         # Build search criteria for logging
         search_criteria = []
@@ -136,148 +449,360 @@ class ShopFlow(Flow):
         else:
             print("Searching with no specific criteria")
         
+        search_query = {
+            "product_name": product_name,
+            "price": price,
+            "product_id": pd_id,
+            "quality": quality,
+            "search_criteria": ", ".join(search_criteria) if search_criteria else "No specific criteria"
+        }
+        return product_name, json.dumps(search_query, indent=2)
+    
+    def _finalize_matches(self, matching_products):
+        """Ensure the expected structure, drop weak matches and print a summary."""
+        # Ensure expected structure
+        if not isinstance(matching_products, dict):
+            matching_products = {"products": [], "search_summary": "No matching products found"}
+        if "products" not in matching_products:
+            matching_products["products"] = []
+        if "search_summary" not in matching_products:
+            matching_products["search_summary"] = f"Found {len(matching_products.get('products', []))} matching products"
+        
+        # Filter out products with match score below 60 (as a safeguard)
+        if "products" in matching_products:
+            matching_products["products"] = [
+                product for product in matching_products["products"] 
+                if product.get("match_score", 0) >= 60
+            ]
+            matching_products["search_summary"] = f"Found {len(matching_products['products'])} matching products with score >= 60"
+        
+        # Print search results summary
+        if matching_products["products"]:
+            print(f"Found {len(matching_products['products'])} matching products")
+            for idx, product in enumerate(matching_products["products"], 1):
+                print(f"Match #{idx}: {product.get('product_name')} - ${product.get('price')} " +
+                      f"(Match score: {product.get('match_score', 'N/A')})")
+        else:
+            print("No matching products found in catalog")
+        return matching_products
+    
+    def _add_facet_counts(self, shopping_details, matching_products):
+        """Tell the shopper how many products by that name the catalog has in their price range, per quality."""
+        product_name = shopping_details.get('product_name')
+        if not product_name or product_name == "unknown product":
+            return
+        engine = get_search_engine()
+        if "quality" not in engine.facets.facets:
+            return
+        low, high = parse_price(shopping_details.get('price'))
+        if low is not None and low == high:
+            # "Around" a price has no range to count within
+            low = high = None
+        with span("catalog.facets", kind="search"):
+            counts = engine.facets.counts("quality", engine.match_rows(product_name), low, high)
+        matching_products["facets"] = {
+            "quality": counts,
+            "price_range": [low, None if high is None or high == float("inf") else high],
+        }
+        if not counts:
+            return
+        if low is None:
+            where = "in the catalog"
+        elif high == float("inf"):
+            where = f"from ${low:,.0f}"
+        elif low <= 0:
+            where = f"up to ${high:,.0f}"
+        else:
+            where = f"between ${low:,.0f} and ${high:,.0f}"
+        breakdown = ", ".join(f"{count} {quality}" for quality, count in counts.items())
+        print(f"{product_name.title()} {where}: {breakdown} quality")
+    
+    def _suggestions_task(self, product_name):
+        """Catalog task asking for alternatives when nothing matched."""
+        # Add suggestions feature
+        return Task(
+            description=f"""
+            The user searched for "{product_name}" but we found no matches.
+            Provide 3-5 alternative product suggestions that might be similar.
+            Format your response as a simple JSON array of product names.
+            """,
+            expected_output="json",
+            agent=self.shop_crew.Catalog(),
+            knowledge_sources=[get_knowledge_source()]
+        )
+    
+    def _parse_suggestions(self, suggestions_result):
+        suggestions = []
         try:
-            # Define task for the Catalog agent
-            search_query = {
-                "product_name": product_name,
-                "price": price,
-                "product_id": pd_id,
-                "quality": quality,
-                "search_criteria": ", ".join(search_criteria) if search_criteria else "No specific criteria"
-            }
-            
-            search_criteria_text = json.dumps(search_query, indent=2)
-            task_description = f"""
-            Search the product catalog for items matching these criteria:
-            {search_criteria_text}
-
-            For each product, calculate a match score based on:
-            1. Product name similarity (50 points max)
-            2. Price match (40 points max)
-            3. Quality match (10 points max)
-            
-            ONLY return products with a match score of 60 or higher.
-            If no products meet this threshold, return an empty products array.
-            
-            Return a maximum of 3 matches with detailed reasoning for each match.
-            Format your response as JSON with products array, each containing:
-            - product_id
-            - product_name
-            - price
-            - quality
-            - in_stock (default to true)
-            - description
-            - match_score
-            - reasoning
-            
-            Also include a search_summary field with a brief analysis of the results.
-            """
-            
-            search_task = Task(
-                description=task_description,
-                expected_output="json",
-                agent=self.catalog_agent,
-                knowledge_sources=self.knowledge_sources
+            suggestions_match = re.search(r'```json\s*([\s\S]*?)\s*```|\[[\s\S]*\]', suggestions_result)
+            if suggestions_match:
+                suggestions_str = suggestions_match.group(1) if suggestions_match.group(1) else suggestions_match.group(0)
+                suggestions = json.loads(suggestions_str)
+        except:
+            suggestions = []
+        return suggestions
+    
+    def _report_suggestions(self, matching_products, suggestions):
+        matching_products["suggestions"] = suggestions
+        if suggestions:
+            print(f"You might be interested in: {', '.join(suggestions)}")
+        print("Would you like to refine your search criteria?")
+    
+    def _search_result(self, shopping_details, matching_products):
+        # Return structured result
+        return {
+            "original_query": shopping_details,
+            "matching_products": matching_products,
+            "search_timestamp": datetime.now().isoformat()
+        }
+    
+    def _search_error(self, shopping_details, e):
+        print(f"Error searching product catalog: {str(e)}")
+        print(traceback.format_exc())
+        
+        return {
+            "original_query": shopping_details,
+            "matching_products": {
+                "products": [],
+                "search_summary": f"Search failed: {str(e)}"
+            },
+            "search_timestamp": datetime.now().isoformat(),
+            "error": str(e),
+            "error_type": type(e).__name__
+        }
+    
+    def _llm_match_products(self, search_criteria_text, shopping_details=None):
+        """Ask the Catalog agent to score the top candidates, or the whole catalog when candidates are off."""
+        candidates = None
+        if self.catalog_candidates and shopping_details is not None:
+            candidates = self._catalog_candidates(shopping_details)
+        
+        # Execute search task
+        def run_search():
+            if candidates is None:
+                agent = self.shop_crew.Catalog()
+            else:
+                # The candidates are the agent's whole context; skip the knowledge lookup
+                agent = self.shop_crew.CatalogRanker()
+            return self._run_task("Catalog", agent, self._catalog_search_task(search_criteria_text, candidates, agent))
+        
+        try:
+            if self.stream_matches:
+                return self._stream_catalog_matches(run_search)
+            return self._parse_catalog_matches(run_search())
+        except ProviderUnavailable as e:
+            if shopping_details is None:
+                raise
+            print(f"{e}; scoring the catalog locally instead.")
+            return self._score_locally(shopping_details)
+    
+    def _stream_catalog_matches(self, run_search):
+        """Run the Catalog search, printing each product option as soon as the reply completes it."""
+        parser = ProductStreamParser()
+        shown = []
+        
+        def on_tokens(text):
+            for product in parser.feed(text):
+                if product.get("match_score", 0) < 60:
+                    continue
+                for key, default in (("quality", "N/A"), ("in_stock", True), ("description", ""), ("reasoning", "")):
+                    product.setdefault(key, default)
+                if not shown:
+                    print("\n=== Product Options ===")
+                shown.append(product)
+                self._print_product_option(len(shown), product)
+        
+        with stream_tokens(on_tokens):
+            result = run_search()
+        
+        matching_products = self._parse_catalog_matches(result)
+        if shown:
+            # Keep the options, and their numbering, that the shopper has already seen
+            if not isinstance(matching_products, dict):
+                matching_products = {}
+            matching_products["products"] = shown
+            matching_products["options_shown"] = True
+        return matching_products
+    
+    def _catalog_candidates(self, shopping_details):
+        """The catalog rows, picked by the local search, that the Catalog agent gets to score."""
+        engine = get_search_engine()
+        with span("catalog.candidates", kind="search", k=self.catalog_candidates) as current:
+            name_match = None
+            prefetch = self._take_prefetch()
+            if prefetch is not None:
+                outcome, name_match = prefetch.name_match(
+                    engine, shopping_details.get("product_name"), shopping_details.get("pd_id")
+                )
+                current.set(prefetch=outcome)
+            candidates = engine.candidates(
+                product_name=shopping_details.get("product_name"),
+                price=shopping_details.get("price"),
+                quality=shopping_details.get("quality"),
+                pd_id=shopping_details.get("pd_id"),
+                k=self.catalog_candidates,
+                name_match=name_match,
             )
-            
-            # Execute search task
-            result = self.catalog_agent.execute_task(search_task)
-            
-            # Parse the agent's response
-            json_match = re.search(r'```json\s*([\s\S]*?)\s*```|{[\s\S]*}', result)
-            if json_match:
-                json_str = json_match.group(1) if json_match.group(1) else json_match.group(0)
+            current.set(results=len(candidates))
+        return candidates
+    
+    def _catalog_search_task(self, search_criteria_text, candidates=None, agent=None):
+        """Catalog task that scores the candidate rows, or the whole catalog, against the criteria."""
+        if candidates is None:
+            catalog_text = "Search the product catalog for items matching these criteria:"
+            knowledge_sources = [get_knowledge_source()]
+        else:
+            rows = "\n".join(json.dumps(candidate, default=str) for candidate in candidates)
+            catalog_text = (
+                f"Here are the {len(candidates)} catalog products most likely to match, one JSON object per line:\n"
+                f"{rows}\n\n"
+                "Score only these products (use their product_id as given) against these criteria:"
+            )
+            knowledge_sources = []
+        task_description = f"""
+        {catalog_text}
+        {search_criteria_text}
+
+        For each product, calculate a match score based on:
+        1. Product name similarity (50 points max)
+        2. Price match (40 points max)
+        3. Quality match (10 points max)
+        
+        ONLY return products with a match score of 60 or higher.
+        If no products meet this threshold, return an empty products array.
+        
+        Return a maximum of 3 matches with detailed reasoning for each match.
+        Format your response as JSON with products array, each containing:
+        - product_id
+        - product_name
+        - price
+        - quality
+        - in_stock (default to true)
+        - description
+        - match_score
+        - reasoning
+        
+        Also include a search_summary field with a brief analysis of the results.
+        """
+        
+        return Task(
+            description=task_description,
+            expected_output="json",
+            agent=agent or self.shop_crew.Catalog(),
+            knowledge_sources=knowledge_sources
+        )
+    
+    def _parse_catalog_matches(self, result):
+        """Parse the Catalog agent's JSON, repairing trailing commas before giving up."""
+        # Parse the agent's response
+        json_match = re.search(r'```json\s*([\s\S]*?)\s*```|{[\s\S]*}', result)
+        if json_match:
+            json_str = json_match.group(1) if json_match.group(1) else json_match.group(0)
+            try:
+                matching_products = json.loads(json_str)
+                record_parse("catalog", "json")
+            except json.JSONDecodeError:
+                # Try to fix common JSON issues
+                fixed_json = re.sub(r',\s*}', '}', json_str)
+                fixed_json = re.sub(r',\s*]', ']', fixed_json)
                 try:
-                    matching_products = json.loads(json_str)
+                    matching_products = json.loads(fixed_json)
+                    record_parse("catalog", "comma_repair")
                 except json.JSONDecodeError:
-                    # Try to fix common JSON issues
-                    fixed_json = re.sub(r',\s*}', '}', json_str)
-                    fixed_json = re.sub(r',\s*]', ']', fixed_json)
-                    try:
-                        matching_products = json.loads(fixed_json)
-                    except json.JSONDecodeError:
-                        matching_products = self._fallback_parsing(result)
-            else:
-                matching_products = self._fallback_parsing(result)
-            
-            # Ensure expected structure
-            if not isinstance(matching_products, dict):
-                matching_products = {"products": [], "search_summary": "No matching products found"}
-            if "products" not in matching_products:
-                matching_products["products"] = []
-            if "search_summary" not in matching_products:
-                matching_products["search_summary"] = f"Found {len(matching_products.get('products', []))} matching products"
-            
-            # Filter out products with match score below 60 (as a safeguard)
-            if "products" in matching_products:
-                matching_products["products"] = [
-                    product for product in matching_products["products"] 
-                    if product.get("match_score", 0) >= 60
-                ]
-                matching_products["search_summary"] = f"Found {len(matching_products['products'])} matching products with score >= 60"
-            
-            # Print search results summary
-            if matching_products["products"]:
-                print(f"Found {len(matching_products['products'])} matching products")
-                for idx, product in enumerate(matching_products["products"], 1):
-                    print(f"Match #{idx}: {product.get('product_name')} - ${product.get('price')} " +
-                          f"(Match score: {product.get('match_score', 'N/A')})")
-                
-                # Present product options
-                self._present_product_options(matching_products)
-            else:
-                print("No matching products found in catalog")
-                suggestions = []
-                # Generate suggestions based on the catalog
-                if product_name and product_name != "unknown product":
-                    # Add suggestions feature
-                    suggestions_task = Task(
-                        description=f"""
-                        The user searched for "{product_name}" but we found no matches.
-                        Provide 3-5 alternative product suggestions that might be similar.
-                        Format your response as a simple JSON array of product names.
-                        """,
-                        expected_output="json",
-                        agent=self.catalog_agent,
-                        knowledge_sources=self.knowledge_sources
-                    )
-                    suggestions_result = self.catalog_agent.execute_task(suggestions_task)
-                    try:
-                        suggestions_match = re.search(r'```json\s*([\s\S]*?)\s*```|\[[\s\S]*\]', suggestions_result)
-                        if suggestions_match:
-                            suggestions_str = suggestions_match.group(1) if suggestions_match.group(1) else suggestions_match.group(0)
-                            suggestions = json.loads(suggestions_str)
-                    except:
-                        suggestions = []
-                
-                matching_products["suggestions"] = suggestions
-                if suggestions:
-                    print(f"You might be interested in: {', '.join(suggestions)}")
-                print("Would you like to refine your search criteria?")
-            
-            # Return structured result
-            result = {
-                "original_query": shopping_details,
-                "matching_products": matching_products,
-                "search_timestamp": datetime.now().isoformat()
+                    matching_products = self._fallback_parsing(result)
+                    record_parse("catalog", "fallback")
+        else:
+            matching_products = self._fallback_parsing(result)
+            record_parse("catalog", "fallback")
+        
+        return matching_products
+    
+    def _local_match_products(self, shopping_details, search_criteria_text):
+        """Score the catalog in-process and let the LLM only explain the matches."""
+        matching_products = self._score_locally(shopping_details)
+        if matching_products["products"]:
+            self._explain_matches(matching_products, search_criteria_text)
+        return matching_products
+    
+    def _score_locally(self, shopping_details):
+        """Run the deterministic catalog search (optionally with the vector index)."""
+        # One engine for the whole search, even if the catalog is reloaded meanwhile
+        engine = get_search_engine()
+        semantic = None
+        if self.semantic_search and shopping_details.get('product_name'):
+            with span("vector_index.search", kind="search"):
+                semantic_index = get_semantic_index(get_embedder()["config"]["embedder"], engine=engine)
+                semantic = semantic_index.search(shopping_details['product_name'], k=SEMANTIC_TOP_K)
+        
+        with span("catalog.search", kind="search", catalog_generation=engine.generation) as search_span:
+            criteria = {
+                "product_name": shopping_details.get('product_name'),
+                "price": shopping_details.get('price'),
+                "quality": shopping_details.get('quality'),
+                "pd_id": shopping_details.get('pd_id'),
+                "semantic": semantic,
             }
-            
-            return result
-            
+            prefetch = self._take_prefetch()
+            if prefetch is not None:
+                outcome, products = prefetch.search(engine, **criteria)
+                search_span.set(prefetch=outcome)
+            else:
+                products = engine.search(**criteria)
+            search_span.set(results=len(products))
+        return {
+            "products": products,
+            "search_summary": f"Found {len(products)} matching products with score >= 60"
+        }
+    
+    def _explain_matches(self, matching_products, search_criteria_text):
+        """Replace the rule-based reasoning with a short LLM-written explanation."""
+        try:
+            result = self._explain(self._explanation_prompt(matching_products, search_criteria_text))
+            self._apply_explanation(matching_products, result)
         except Exception as e:
-            print(f"Error searching product catalog: {str(e)}")
-            print(traceback.format_exc())
-            
-            return {
-                "original_query": shopping_details,
-                "matching_products": {
-                    "products": [],
-                    "search_summary": f"Search failed: {str(e)}"
-                },
-                "search_timestamp": datetime.now().isoformat(),
-                "error": str(e),
-                "error_type": type(e).__name__
-            }
+            # The deterministic reasoning is already in place
+            print(f"Could not generate match explanations: {str(e)}")
+    
+    def _explain(self, prompt):
+        llm = self._explanation_llm()
+        return self._call_resiliently("Explanation", lambda attempt: llm.call(prompt))
+    
+    def _explanation_llm(self):
+        # The Catalog agent's LLM, called directly: no agent or knowledge lookup needed
+        return get_llm(2)
+    
+    def _explanation_prompt(self, matching_products, search_criteria_text):
+        candidates = [
+            {key: product[key] for key in ("product_id", "product_name", "price", "quality", "match_score", "reasoning")}
+            for product in matching_products["products"]
+        ]
+        return f"""
+        A shopper searched our catalog with these criteria:
+        {search_criteria_text}
+        
+        These products were selected and scored already; do not change them:
+        {json.dumps(candidates, indent=2)}
+        
+        Write a one-sentence reason for each product explaining why it fits the shopper,
+        and a brief search_summary of the results.
+        Format your response as JSON with:
+        - reasons (object mapping each product_id to its reason)
+        - search_summary
+        """
+    
+    def _apply_explanation(self, matching_products, result):
+        json_match = re.search(r'```json\s*([\s\S]*?)\s*```|{[\s\S]*}', result)
+        if not json_match:
+            return
+        json_str = json_match.group(1) if json_match.group(1) else json_match.group(0)
+        explanation = json.loads(json_str)
+        reasons = explanation.get("reasons") or {}
+        for product in matching_products["products"]:
+            reason = reasons.get(str(product["product_id"]))
+            if reason:
+                product["reasoning"] = reason
+        if explanation.get("search_summary"):
+            matching_products["search_summary"] = explanation["search_summary"]
     
     def _fallback_parsing(self, result_text):
         """Fallback method to extract product information when JSON parsing fails."""
@@ -320,55 +845,84 @@ class ShopFlow(Flow):
     
     def _present_product_options(self, matching_products):
         """Present product options to the user and handle selection."""
+        return self._converse(self._product_menu(matching_products))
+    
+    def _product_menu(self, matching_products):
+        """Dialog that shows the product options and returns the shopper's selection."""
         if not matching_products.get("products"):
             return None
         
+        self._show_product_options(matching_products)
+        
+        # Get user selection
+        while True:
+            choice = (yield "\nSelect an option (1-3, R, Q): ").strip().upper()
+            selection = self._product_choice(choice, matching_products)
+            if selection is None:
+                print("Invalid selection. Please try again.")
+                continue
+            if selection["action"] == "refine":
+                selection["refined_query"] = yield "Please provide more specific details: "
+            return selection
+    
+    def _show_product_options(self, matching_products):
+        """Print the options, unless they were streamed to the shopper already."""
+        if not matching_products.pop("options_shown", False):
+            self._print_product_options(matching_products)
+            return
+        print("\n[R] Refine search")
+        print("[Q] Quit search")
+    
+    def _print_product_options(self, matching_products):
         print("\n=== Product Options ===")
         for idx, product in enumerate(matching_products["products"], 1):
-            print(f"\n[{idx}] {product['product_name']}")
-            print(f"    Price: ${product['price']}")
-            print(f"    Quality: {product['quality']}")
-            print(f"    Description: {product['description']}")
-            print(f"    In Stock: {'Yes' if product['in_stock'] else 'No'}")
-            print(f"    Match Score: {product['match_score']}")
-            print(f"    Why This Match: {product['reasoning']}")
+            self._print_product_option(idx, product)
         
         print("\n[R] Refine search")
         print("[Q] Quit search")
+    
+    def _print_product_option(self, idx, product):
+        print(f"\n[{idx}] {product['product_name']}")
+        print(f"    Price: ${product['price']}")
+        print(f"    Quality: {product['quality']}")
+        print(f"    Description: {product['description']}")
+        print(f"    In Stock: {'Yes' if product['in_stock'] else 'No'}")
+        print(f"    Match Score: {product['match_score']}")
+        print(f"    Why This Match: {product['reasoning']}")
+    
+    def _product_choice(self, choice, matching_products):
+        """Turn a menu choice into a selection dict, or None if it is invalid."""
+        if choice == 'Q':
+            print("Ending search. Thank you for shopping with us!")
+            return {"action": "quit"}
         
-        # Get user selection
-        while True:
-            choice = input("\nSelect an option (1-3, R, Q): ").strip().upper()
-            
-            if choice == 'Q':
-                print("Ending search. Thank you for shopping with us!")
-                return {"action": "quit"}
-            
-            elif choice == 'R':
-                print("Let's refine your search.")
-                refined_query = input("Please provide more specific details: ")
-                return {
-                    "action": "refine",
-                    "refined_query": refined_query
-                }
-            
-            elif choice.isdigit() and 1 <= int(choice) <= len(matching_products["products"]):
-                selected_idx = int(choice) - 1
-                selected_product = matching_products["products"][selected_idx]
-                print(f"\nYou selected: {selected_product['product_name']}")
-                print("Great choice! Adding to cart...")
-                
-                return {
-                    "action": "select",
-                    "selected_product": selected_product
-                }
+        elif choice == 'R':
+            print("Let's refine your search.")
+            return {
+                "action": "refine",
+                "refined_query": None
+            }
+        
+        elif choice.isdigit() and 1 <= int(choice) <= len(matching_products["products"]):
+            selected_idx = int(choice) - 1
+            selected_product = matching_products["products"][selected_idx]
+            print(f"\nYou selected: {selected_product['product_name']}")
+            print("Great choice! Adding to cart...")
             
-            else:
-                print("Invalid selection. Please try again.")
+            return {
+                "action": "select",
+                "selected_product": selected_product
+            }
+        
+        return None
     
     @listen(search_product_catalog)
     def handle_product_selection(self, search_results):
         """Handle the next steps after product search results."""
+        return self._converse(self._selection_dialog(search_results))
+    
+    def _selection_dialog(self, search_results):
+        """Dialog that lets the shopper pick a product, then buy it, add it to the cart or search again."""
         if not search_results or "error" in search_results:
             print("Sorry, we encountered an issue with your search.")
             return {"status": "failed", "reason": "search_error"}
@@ -378,9 +932,9 @@ class ShopFlow(Flow):
         
         if not products:
             print("No products matched your search criteria.")
-            refine_search = input("Would you like to refine your search? (y/n): ").strip().lower()
+            refine_search = (yield "Would you like to refine your search? (y/n): ").strip().lower()
             if refine_search == 'y':
-                new_query = input("Please provide more details for your search: ")
+                new_query = yield "Please provide more details for your search: "
                 return {
                     "status": "refine",
                     "new_query": new_query,
@@ -391,7 +945,7 @@ class ShopFlow(Flow):
                 return {"status": "ended", "reason": "no_products_found"}
         
         # Let the user select a product
-        selection = self._present_product_options(matching_products)
+        selection = yield from self._product_menu(matching_products)
         
         if selection and selection.get("action") == "select":
             selected_product = selection.get("selected_product")
@@ -400,10 +954,10 @@ class ShopFlow(Flow):
             if not selected_product.get("in_stock", True):
                 print(f"We're sorry, but {selected_product['product_name']} is currently out of stock.")
                 print("Would you like to be notified when it becomes available?")
-                notify = input("Enter 'y' for yes or 'n' for no: ").strip().lower()
+                notify = (yield "Enter 'y' for yes or 'n' for no: ").strip().lower()
                 
                 if notify == 'y':
-                    email = input("Please enter your email address: ")
+                    email = yield "Please enter your email address: "
                     print(f"Thank you! We'll notify you at {email} when {selected_product['product_name']} is back in stock.")
                     return {
                         "status": "notification_set",
@@ -412,9 +966,9 @@ class ShopFlow(Flow):
                     }
                 else:
                     print("Would you like to select a different product?")
-                    try_again = input("Enter 'y' for yes or 'n' for no: ").strip().lower()
+                    try_again = (yield "Enter 'y' for yes or 'n' for no: ").strip().lower()
                     if try_again == 'y':
-                        return self.handle_product_selection(search_results)
+                        return (yield from self._selection_dialog(search_results))
                     else:
                         print("Thank you for using our shopping assistant. Have a great day!")
                         return {"status": "ended", "reason": "product_out_of_stock"}
@@ -423,128 +977,19 @@ class ShopFlow(Flow):
             print(f"\nProcessing purchase for: {selected_product['product_name']}")
             print(f"Price: ${selected_product['price']}")
             
-            # Confirm purchase
-            confirm = input("\nWould you like to proceed with this purchase? (y/n): ").strip().lower()
-            if confirm == 'y':
-                # Collect shipping information
-                print("\nPlease provide shipping information:")
-                name = input("Full Name: ")
-                address = input("Shipping Address: ")
-                phone = input("Contact Phone: ")
-                
-                # Collect payment information
-                print("\nPlease provide payment information:")
-                card_type = input("Card Type (Visa/Mastercard/etc.): ")
-                card_number = input("Card Number: ")
-                
-                # Use Cart agent to process the order
-                cart_task_description = f"""
-                Process this purchase:
-                - Product: {selected_product['product_name']}
-                - Product ID: {selected_product['product_id']}
-                - Price: ${selected_product['price']}
-                - Quality: {selected_product['quality']}
-                
-                Customer information:
-                - Name: {name}
-                - Address: {address}
-                - Phone: {phone}
-                - Payment: {card_type} card
-                
-                Generate an order confirmation with:
-                1. A unique order ID
-                2. Purchase details
-                3. Shipping information
-                4. Estimated delivery date (5-7 business days from now)
-                
-                Format response as JSON with:
-                - order_id
-                - product (object with all product details)
-                - customer (object with customer details)
-                - payment_status
-                - shipping_status
-                - estimated_delivery
-                """
-
-                cart_task = Task(
-                    description=cart_task_description,
-                    expected_output="json",
-                    agent=self.cart_agent
-                )
-                
-                # Execute cart task
-                cart_result = self.cart_agent.execute_task(cart_task)
-                
-                # Parse the JSON response
-                try:
-                    json_match = re.search(r'```json\s*([\s\S]*?)\s*```|{[\s\S]*}', cart_result)
-                    if json_match:
-                        json_str = json_match.group(1) if json_match.group(1) else json_match.group(0)
-                        order_info = json.loads(json_str)
-                    else:
-                        # Fallback order_info
-                        order_id = f"ORD-{hash(selected_product['product_name'] + str(datetime.now()))}"
-                        order_info = {
-                            "order_id": order_id,
-                            "product": selected_product,
-                            "customer": {
-                                "name": name,
-                                "address": address,
-                                "phone": phone
-                            },
-                            "payment_status": "completed",
-                            "shipping_status": "processing",
-                            "estimated_delivery": (datetime.now() + pd.Timedelta(days=7)).strftime("%Y-%m-%d")
-                        }
-                except Exception as e:
-                    print(f"Error processing order: {str(e)}")
-                    # Fallback order_info
-                    order_id = f"ORD-{hash(selected_product['product_name'] + str(datetime.now()))}"
-                    order_info = {
-                        "order_id": order_id,
-                        "product": selected_product,
-                        "customer": {
-                            "name": name,
-                            "address": address,
-                            "phone": phone
-                        },
-                        "payment_status": "completed",
-                        "shipping_status": "processing",
-                        "estimated_delivery": (datetime.now() + pd.Timedelta(days=7)).strftime("%Y-%m-%d")
-                    }
-                
-                # Display order confirmation
-                print("\n" + "="*50)
-                print(f"ORDER CONFIRMATION - {order_info.get('order_id', 'N/A')}")
-                print("="*50)
-                print(f"Thank you for your purchase, {name}!")
-                print(f"Your {selected_product['product_name']} will be shipped to:")
-                print(f"{address}")
-                print(f"\nEstimated delivery: {order_info.get('estimated_delivery', 'N/A')}")
-                print(f"Payment status: {order_info.get('payment_status', 'completed')}")
-                print("="*50)
-                
-                # Return order information
-                return {
-                    "status": "purchase_complete",
-                    "order_id": order_info.get("order_id"),
-                    "product": selected_product,
-                    "customer": {
-                        "name": name,
-                        "address": address,
-                        "phone": phone
-                    },
-                    "payment_status": order_info.get("payment_status", "completed"),
-                    "shipping_status": order_info.get("shipping_status", "processing"),
-                    "estimated_delivery": order_info.get("estimated_delivery"),
-                    "timestamp": datetime.now().isoformat()
-                }
+            # Check out now, or keep the product in the cart and shop on
+            confirm = (yield CHECKOUT_PROMPT).strip().lower()
+            if confirm in ('y', 'a'):
+                self.cart.add(selected_product)
+                if confirm == 'a':
+                    return self._added_to_cart(selected_product)
+                return (yield from self._checkout_dialog())
             else:
                 print("Purchase cancelled.")
                 print("Would you like to select a different product?")
-                try_again = input("Enter 'y' for yes or 'n' for no: ").strip().lower()
+                try_again = (yield "Enter 'y' for yes or 'n' for no: ").strip().lower()
                 if try_again == 'y':
-                    return self.handle_product_selection(search_results)
+                    return (yield from self._selection_dialog(search_results))
                 else:
                     print("Thank you for using our shopping assistant. Have a great day!")
                     return {"status": "ended", "reason": "purchase_cancelled"}
@@ -565,9 +1010,9 @@ class ShopFlow(Flow):
         
         else:
             print("No selection was made. Would you like to search for something else?")
-            new_search = input("Enter 'y' for yes or 'n' for no: ").strip().lower()
+            new_search = (yield "Enter 'y' for yes or 'n' for no: ").strip().lower()
             if new_search == 'y':
-                new_query = input("What would you like to search for? ")
+                new_query = yield "What would you like to search for? "
                 return {
                     "status": "new_search",
                     "new_query": new_query
@@ -576,135 +1021,259 @@ class ShopFlow(Flow):
                 print("Thank you for using our shopping assistant. Have a great day!")
                 return {"status": "ended", "reason": "no_selection"}
     
+    def _added_to_cart(self, selected_product):
+        print(f"\n{selected_product['product_name']} added to your cart.")
+        self._print_cart()
+        print("Check out whenever you are done shopping.")
+        return {
+            "status": "added_to_cart",
+            "product": selected_product,
+            "cart_items": self.cart.quantity
+        }
+    
+    def _print_cart(self):
+        print("\n=== Your Cart ===")
+        for idx, item in enumerate(self.cart.items, 1):
+            product = item["product"]
+            print(f"[{idx}] {product['product_name']} x{item['quantity']} - ${product['price']}")
+        print(f"Total: ${self.cart.total:.2f}")
+    
+    def _checkout_dialog(self):
+        """Dialog that collects shipping and payment details once and places one order for the whole cart."""
+        self._print_cart()
+        
+        # Collect shipping information
+        print("\nPlease provide shipping information:")
+        name = yield "Full Name: "
+        address = yield "Shipping Address: "
+        phone = yield "Contact Phone: "
+        
+        # Collect payment information
+        print("\nPlease provide payment information:")
+        card_type = yield "Card Type (Visa/Mastercard/etc.): "
+        card_number = yield "Card Number: "
+        
+        customer = {
+            "name": name,
+            "address": address,
+            "phone": phone
+        }
+        
+        items = list(self.cart.items)
+        order_info = yield partial(self._place_order, items, customer, card_type)
+        self.cart.clear()
+        return self._confirm_order(order_info, items, customer)
+    
+    def _place_order(self, items, customer, card_type):
+        """Confirm one order for the cart's items locally, or through the Cart agent with llm_confirmation."""
+        if self.llm_confirmation:
+            try:
+                cart_result = self._run_task("Cart", self.shop_crew.Cart(), self._order_task(items, customer, card_type))
+            except ProviderUnavailable as e:
+                print(f"{e}; confirming the order locally instead.")
+            else:
+                return self._parse_order(cart_result, items, customer)
+        return get_order_service().confirm_cart(items, customer)
+    
+    def _order_task(self, items, customer, card_type):
+        """Cart task that turns the whole cart into one order confirmation."""
+        products = "\n".join(
+            f"        - {item['product']['product_name']} (Product ID: {item['product']['product_id']}, "
+            f"Price: ${item['product']['price']}, Quality: {item['product']['quality']}, "
+            f"Quantity: {item['quantity']})"
+            for item in items
+        )
+        cart_task_description = f"""
+        Process this purchase of {len(items)} product(s) as a single order:
+{products}
+        
+        Customer information:
+        - Name: {customer['name']}
+        - Address: {customer['address']}
+        - Phone: {customer['phone']}
+        - Payment: {card_type} card
+        
+        Generate an order confirmation with:
+        1. A unique order ID
+        2. Purchase details
+        3. Shipping information
+        4. Estimated delivery date (5-7 business days from now)
+        
+        Format response as JSON with:
+        - order_id
+        - items (array of objects with product details and quantity)
+        - customer (object with customer details)
+        - payment_status
+        - shipping_status
+        - estimated_delivery
+        """
+
+        return Task(
+            description=cart_task_description,
+            expected_output="json",
+            agent=self.shop_crew.Cart()
+        )
+    
+    def _parse_order(self, cart_result, items, customer):
+        """Parse the Cart agent's confirmation, confirming the order locally if that fails."""
+        # Parse the JSON response
+        try:
+            json_match = re.search(r'```json\s*([\s\S]*?)\s*```|{[\s\S]*}', cart_result)
+            if json_match:
+                json_str = json_match.group(1) if json_match.group(1) else json_match.group(0)
+                order_info = json.loads(json_str)
+                record_parse("order", "json")
+            else:
+                order_info = get_order_service().confirm_cart(items, customer)
+                record_parse("order", "local")
+        except Exception as e:
+            print(f"Error processing order: {str(e)}")
+            order_info = get_order_service().confirm_cart(items, customer)
+            record_parse("order", "local")
+        return order_info
+    
+    def _confirm_order(self, order_info, items, customer):
+        """Print the order confirmation and return the purchase result."""
+        # Display order confirmation
+        print("\n" + "="*50)
+        print(f"ORDER CONFIRMATION - {order_info.get('order_id', 'N/A')}")
+        print("="*50)
+        print(f"Thank you for your purchase, {customer['name']}!")
+        if len(items) == 1 and items[0]["quantity"] == 1:
+            print(f"Your {items[0]['product']['product_name']} will be shipped to:")
+        else:
+            for item in items:
+                print(f"  {item['product']['product_name']} x{item['quantity']} - ${item['product']['price']}")
+            print(f"Order total: ${cart_total(items):.2f}")
+            print("Your items will be shipped to:")
+        print(f"{customer['address']}")
+        print(f"\nEstimated delivery: {order_info.get('estimated_delivery', 'N/A')}")
+        print(f"Payment status: {order_info.get('payment_status', 'completed')}")
+        print("="*50)
+        
+        # Return order information
+        return {
+            "status": "purchase_complete",
+            "order_id": order_info.get("order_id"),
+            "items": items,
+            "total": cart_total(items),
+            "customer": customer,
+            "payment_status": order_info.get("payment_status", "completed"),
+            "shipping_status": order_info.get("shipping_status", "processing"),
+            "estimated_delivery": order_info.get("estimated_delivery"),
+            "timestamp": datetime.now().isoformat()
+        }
+    
     @listen(handle_product_selection)
     def save_cart_to_file(self, selection_result):
-        """Save selected products to a cart file."""
+        """Save the purchase to the order ledger."""
         print("Attempting to save cart to file...")
 
+        if selection_result and selection_result.get("status") == "added_to_cart":
+            return self._cart_pending()
         if not selection_result or selection_result.get("status") != "purchase_complete":
             print("No purchase to save - skipping cart update")
             return {
                 "cart_update": "skipped",
                 "reason": "No product was purchased"
             }
-            
-        # Use the Cart agent to save the purchase
-        cart_save_task = f"""
-        Save this purchase to the shopping cart files:
-        
-        Order ID: {selection_result.get('order_id', 'Unknown')}
-        Product: {selection_result.get('product', {}).get('product_name', 'Unknown')}
-        Product ID: {selection_result.get('product', {}).get('product_id', 'Unknown')}
-        Price: ${selection_result.get('product', {}).get('price', 0)}
-        Quality: {selection_result.get('product', {}).get('quality', 'Standard')}
-        
-        Customer:
-        Name: {selection_result.get('customer', {}).get('name', 'Unknown')}
-        Address: {selection_result.get('customer', {}).get('address', 'Unknown')}
-        Phone: {selection_result.get('customer', {}).get('phone', 'Unknown')}
-        
-        Create both CSV and TXT files in the shopping_cart directory with timestamp.
-        Confirm when the files have been created and provide the file paths.
-        """
         
         try:
-            # Execute the cart save task
-            cart_save_task_obj = Task(
-                description=cart_save_task,
-                expected_output="text",
-                agent=self.cart_agent
-            )
-
-            cart_save_result = self.cart_agent.execute_task(cart_save_task_obj)
-            
-            # Ensure shopping_cart directory exists
-            cart_dir = Path("shopping_cart")
-            cart_dir.mkdir(exist_ok=True)
-            
-            # Generate filenames with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            order_id = selection_result.get('order_id', 'order').replace("-", "_")
-            
-            csv_filename = cart_dir / f"cart_{order_id}_{timestamp}.csv"
-            txt_filename = cart_dir / f"cart_{order_id}_{timestamp}.txt"
-            
-            # Write to CSV file
-            with open(csv_filename, 'w', newline='') as csvfile:
-                fieldnames = ['order_id', 'product_name', 'product_id', 'price', 'quality', 
-                             'customer_name', 'customer_address', 'customer_phone', 
-                             'payment_status', 'shipping_status', 'estimated_delivery']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                writer.writerow({
-                    'order_id': selection_result.get('order_id', 'Unknown'),
-                    'product_name': selection_result.get('product', {}).get('product_name', 'Unknown'),
-                    'product_id': selection_result.get('product', {}).get('product_id', 'Unknown'),
-                    'price': selection_result.get('product', {}).get('price', 0),
-                    'quality': selection_result.get('product', {}).get('quality', 'Standard'),
-                    'customer_name': selection_result.get('customer', {}).get('name', 'Unknown'),
-                    'customer_address': selection_result.get('customer', {}).get('address', 'Unknown'),
-                    'customer_phone': selection_result.get('customer', {}).get('phone', 'Unknown'),
-                    'payment_status': selection_result.get('payment_status', 'completed'),
-                    'shipping_status': selection_result.get('shipping_status', 'processing'),
-                    'estimated_delivery': selection_result.get('estimated_delivery', 'Unknown')
-                })
-            
-            # Write to TXT file
-            with open(txt_filename, 'w') as txtfile:
-                txtfile.write(f"ORDER CONFIRMATION - {selection_result.get('order_id', 'Unknown')}\n")
-                txtfile.write("="*50 + "\n")
-                txtfile.write(f"Purchase Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                txtfile.write("PRODUCT DETAILS:\n")
-                txtfile.write(f"Product: {selection_result.get('product', {}).get('product_name', 'Unknown')}\n")
-                txtfile.write(f"Product ID: {selection_result.get('product', {}).get('product_id', 'Unknown')}\n")
-                txtfile.write(f"Price: ${selection_result.get('product', {}).get('price', 0)}\n")
-                txtfile.write(f"Quality: {selection_result.get('product', {}).get('quality', 'Standard')}\n\n")
-                txtfile.write("CUSTOMER INFORMATION:\n")
-                txtfile.write(f"Name: {selection_result.get('customer', {}).get('name', 'Unknown')}\n")
-                txtfile.write(f"Address: {selection_result.get('customer', {}).get('address', 'Unknown')}\n")
-                txtfile.write(f"Phone: {selection_result.get('customer', {}).get('phone', 'Unknown')}\n\n")
-                txtfile.write("ORDER STATUS:\n")
-                txtfile.write(f"Payment Status: {selection_result.get('payment_status', 'completed')}\n")
-                txtfile.write(f"Shipping Status: {selection_result.get('shipping_status', 'processing')}\n")
-                txtfile.write(f"Estimated Delivery: {selection_result.get('estimated_delivery', 'Unknown')}\n")
-                txtfile.write("="*50 + "\n")
-                txtfile.write("Thank you for shopping with us!\n")
-            
-            print(f"Cart saved successfully!")
-            print(f"CSV File: {csv_filename}")
-            print(f"TXT File: {txt_filename}")
-            
-            return {
-                "cart_update": "success",
-                "csv_file": str(csv_filename),
-                "txt_file": str(txt_filename),
-                "timestamp": datetime.now().isoformat()
-            }
+            return self._record_order(selection_result)
             
         except Exception as e:
-            print(f"Error saving cart to file: {str(e)}")
-            traceback.print_exc()
-            
-            return {
-                "cart_update": "failed",
-                "error": str(e),
-                "error_type": type(e).__name__,
-                "timestamp": datetime.now().isoformat()
-            }
+            return self._cart_save_error(e)
+    
+    def _cart_pending(self):
+        print("Cart not checked out yet - nothing to save")
+        return {
+            "cart_update": "pending",
+            "cart_items": self.cart.quantity,
+            "cart_total": self.cart.total
+        }
+    
+    def _cart_save_error(self, e):
+        print(f"Error saving cart to file: {str(e)}")
+        traceback.print_exc()
+        
+        return {
+            "cart_update": "failed",
+            "error": str(e),
+            "error_type": type(e).__name__,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def _record_order(self, selection_result):
+        """Add the order, every line item in one write, to the order ledger (shopping_cart/orders.db)."""
+        ledger = get_order_ledger()
+        with span("ledger.record", kind="io") as record_span:
+            # Committed before the shopper is told the order was saved
+            rows = ledger.record(selection_result, commit=True)
+            record_span.set(line_items=len(rows))
+        
+        print(f"Cart saved successfully!")
+        print(f"Order ledger: {ledger.path}")
         
+        return {
+            "cart_update": "success",
+            "order_id": selection_result.get("order_id"),
+            "line_items": len(rows),
+            "ledger": str(ledger.path),
+            "timestamp": datetime.now().isoformat()
+        }
+    
     @listen(save_cart_to_file)
     def complete_shopping_session(self, cart_result):
         """Complete the shopping session and provide summary."""
+        return self._converse(self._session_dialog(cart_result))
+    
+    def _session_dialog(self, cart_result):
+        """Dialog that shops again or checks out the cart until the shopper is done."""
+        while True:
+            self._print_session_summary(cart_result)
+            
+            # Ask if user wants to continue shopping
+            continue_shopping = (yield "\nWould you like to shop for something else? (y/n): ").strip().lower()
+            
+            if continue_shopping == 'y':
+                print("\nStarting a new shopping session...")
+                # Search again in this session, keeping the cart
+                cart_result = yield self._shop_again
+            elif self.cart and (yield self._pending_cart_prompt()).strip().lower() == 'y':
+                selection_result = yield from self._checkout_dialog()
+                cart_result = yield partial(self._run_stage, self.save_cart_to_file, selection_result)
+            else:
+                print("\nThank you for shopping with us! Have a great day!")
+                return self._session_completed(cart_result)
+    
+    def _pending_cart_prompt(self):
+        return f"\nYou have {self.cart.quantity} item(s) in your cart. Check out now? (y/n): "
+    
+    def _run_stage(self, stage, *args):
+        with span(stage.__name__, kind="stage"):
+            result = stage(*args)
+        self._checkpoint(stage.__name__, result)
+        return result
+    
+    def _shop_again(self):
+        """Run the stages from the shopping query to saving the order once more."""
+        result = self._run_stage(self.interaction_with_user)
+        for stage in (self.extract_shopping_details, self.search_product_catalog,
+                      self.handle_product_selection, self.save_cart_to_file):
+            result = self._run_stage(stage, result)
+        return result
+    
+    def _print_session_summary(self, cart_result):
         print("\n" + "="*50)
         print("SHOPPING SESSION COMPLETE")
         print("="*50)
         
         if cart_result.get("cart_update") == "success":
             print("Your order has been processed successfully!")
-            print(f"Order saved to files:")
-            print(f"- CSV: {cart_result.get('csv_file')}")
-            print(f"- TXT: {cart_result.get('txt_file')}")
+            print(f"Order {cart_result.get('order_id')} saved to the order ledger: {cart_result.get('ledger')}")
+        elif cart_result.get("cart_update") == "pending":
+            print(f"Your cart holds {cart_result.get('cart_items')} item(s), ${cart_result.get('cart_total', 0):.2f} in total.")
+            print("Keep shopping, or check out to place one order for all of them.")
         elif cart_result.get("cart_update") == "failed":
             print("Your order was processed, but there was an issue saving the receipt.")
             print(f"Error: {cart_result.get('error', 'Unknown error')}")
@@ -712,27 +1281,76 @@ class ShopFlow(Flow):
             print("Your shopping session has ended.")
             print(f"Status: {cart_result.get('cart_update', 'No purchase made')}")
             print(f"Reason: {cart_result.get('reason', 'N/A')}")
-        
-        # Ask if user wants to continue shopping
-        continue_shopping = input("\nWould you like to shop for something else? (y/n): ").strip().lower()
-        
-        if continue_shopping == 'y':
-            print("\nStarting a new shopping session...")
-            # Restart the flow
-            return self.interaction_with_user()
-        else:
-            print("\nThank you for shopping with us! Have a great day!")
-            return {
-                "session_status": "completed",
-                "timestamp": datetime.now().isoformat(),
-                "cart_result": cart_result
-            }
-        
+    
+    def _session_completed(self, cart_result):
+        return {
+            "session_status": "completed",
+            "timestamp": datetime.now().isoformat(),
+            "cart_result": cart_result
+        }
+
+
+def watch_catalog(interval: float = DEFAULT_POLL_INTERVAL) -> CatalogWatcher:
+    """Start reloading the catalog whenever knowledge/spreadsheet.xlsx changes.
+
+    The fast extractor is rebuilt for the new catalog before it is served,
+    and agents created after a reload get a knowledge source synced to it.
+    """
+    return CatalogWatcher(
+        interval=interval,
+        prepare=[get_fast_extractor],
+        on_swap=[lambda engine: get_knowledge_source.cache_clear()],
+    ).start()
+
+
+def _catalog_watcher():
+    """The watcher asked for with ``--watch-catalog`` or SHOPFLOW_WATCH_CATALOG=1, else None."""
+    if "--watch-catalog" in sys.argv or os.getenv("SHOPFLOW_WATCH_CATALOG", "").lower() in ("1", "true", "yes"):
+        return watch_catalog(float(os.getenv("SHOPFLOW_CATALOG_POLL", DEFAULT_POLL_INTERVAL)))
+    return None
 
 
 def kickoff():
-    shop_flow = ShopFlow()
-    shop_flow.kickoff()
+    if "--startup-profile" in sys.argv:
+        from my_shopping_agent.startup import startup_profile
+        sys.exit(startup_profile())
+    watcher = _catalog_watcher()
+    try:
+        if "--async" in sys.argv:
+            from my_shopping_agent.async_flow import AsyncShopFlow
+            shop_flow = AsyncShopFlow()
+            print(f"Session {shop_flow.session_id} (if interrupted, continue it with: resume {shop_flow.session_id})")
+            asyncio.run(shop_flow.kickoff_async())
+            return
+        shop_flow = ShopFlow()
+        print(f"Session {shop_flow.session_id} (if interrupted, continue it with: resume {shop_flow.session_id})")
+        shop_flow.kickoff()
+    finally:
+        if watcher is not None:
+            watcher.stop()
+
+
+def resume():
+    """Continue an interrupted session: ``resume <session id>``; with no ID, list them."""
+    session_ids = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not session_ids:
+        sessions = get_checkpoint_store().sessions()
+        if not sessions:
+            print("No interrupted sessions to resume.")
+        for session in sessions:
+            updated_at = datetime.fromtimestamp(session["updated_at"]).isoformat(timespec="seconds")
+            print(f"{session['session_id']}  last completed: {session['last_stage']}  at {updated_at}")
+        return
+    watcher = _catalog_watcher()
+    try:
+        if "--async" in sys.argv:
+            from my_shopping_agent.async_flow import AsyncShopFlow
+            asyncio.run(AsyncShopFlow().resume_async(session_ids[0]))
+            return
+        ShopFlow().resume(session_ids[0])
+    finally:
+        if watcher is not None:
+            watcher.stop()
 
 
 def plot():
@@ -0,0 +1,19 @@
+from my_shopping_agent.orders.cart import Cart, cart_total
+from my_shopping_agent.orders.ledger import DEFAULT_LEDGER_PATH, OrderLedger, get_order_ledger
+from my_shopping_agent.orders.receipts import receipt_row, receipt_rows, write_receipts
+from my_shopping_agent.orders.service import OrderService, add_business_days, estimate_delivery, get_order_service
+
+__all__ = [
+    "Cart",
+    "cart_total",
+    "DEFAULT_LEDGER_PATH",
+    "OrderLedger",
+    "OrderService",
+    "add_business_days",
+    "estimate_delivery",
+    "get_order_ledger",
+    "get_order_service",
+    "receipt_row",
+    "receipt_rows",
+    "write_receipts",
+]
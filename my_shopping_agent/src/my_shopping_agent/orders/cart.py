@@ -0,0 +1,63 @@
+"""The shopper's cart: products picked across searches, checked out together."""
+from typing import Any, Dict, List
+
+
+def _price(product: Dict[str, Any]) -> float:
+    try:
+        return float(str(product.get('price', 0)).replace(",", "").lstrip("$"))
+    except ValueError:
+        return 0.0
+
+
+class Cart:
+    """Line items of one shopping session.
+
+    Each item is ``{"product": <product dict>, "quantity": <int>}``; adding a
+    product that is already in the cart raises its quantity instead of adding
+    a second line.
+    """
+
+    def __init__(self):
+        self.items: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def add(self, product: Dict[str, Any], quantity: int = 1) -> Dict[str, Any]:
+        """Add ``quantity`` of ``product`` and return its line item."""
+        for item in self.items:
+            if str(item["product"].get('product_id')) == str(product.get('product_id')):
+                item["quantity"] += quantity
+                return item
+        item = {"product": product, "quantity": quantity}
+        self.items.append(item)
+        return item
+
+    def remove(self, product_id: Any) -> bool:
+        """Drop the line for ``product_id``; False if it was not in the cart."""
+        for index, item in enumerate(self.items):
+            if str(item["product"].get('product_id')) == str(product_id):
+                del self.items[index]
+                return True
+        return False
+
+    def clear(self) -> List[Dict[str, Any]]:
+        """Empty the cart and return the items it held."""
+        items, self.items = self.items, []
+        return items
+
+    @property
+    def quantity(self) -> int:
+        return sum(item["quantity"] for item in self.items)
+
+    @property
+    def total(self) -> float:
+        return cart_total(self.items)
+
+
+def cart_total(items: List[Dict[str, Any]]) -> float:
+    """Sum of price times quantity over line items."""
+    return sum(_price(item["product"]) * item["quantity"] for item in items)
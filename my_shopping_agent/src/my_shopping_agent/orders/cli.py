@@ -0,0 +1,60 @@
+"""``orders`` command: import, query and export the order ledger.
+
+    orders import shopping_cart        load the legacy CSV files
+    orders find --customer "Aisha"     print matching orders as JSON lines
+    orders export --order-id ORD-1 --to receipts
+"""
+import argparse
+import json
+
+from my_shopping_agent.orders.ledger import DEFAULT_LEDGER_PATH, OrderLedger
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Manage the order ledger")
+    parser.add_argument("--ledger", default=str(DEFAULT_LEDGER_PATH), help="ledger database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="load shopping_cart/*.csv files")
+    import_parser.add_argument("directory", nargs="?", default="shopping_cart")
+
+    for name, help_text in (("find", "print matching orders"), ("export", "write CSV/TXT receipts")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--order-id")
+        command.add_argument("--product-id")
+        command.add_argument("--customer")
+        command.add_argument("--since", help="ISO date or timestamp")
+        command.add_argument("--until", help="ISO date or timestamp (exclusive)")
+        command.add_argument("--limit", type=int)
+    commands.choices["export"].add_argument("--to", default="shopping_cart", help="directory for the receipts")
+
+    args = parser.parse_args(argv)
+    ledger = OrderLedger(args.ledger)
+    try:
+        if args.command == "import":
+            added = ledger.import_csv_files(args.directory)
+            print(f"Imported {added} orders from {args.directory} ({ledger.count()} in the ledger)")
+            return
+
+        filters = {
+            "order_id": args.order_id,
+            "product_id": args.product_id,
+            "customer": args.customer,
+            "since": args.since,
+            "until": args.until,
+            "limit": args.limit,
+        }
+        if args.command == "find":
+            for row in ledger.find(**filters):
+                print(json.dumps(row))
+        else:
+            files = ledger.export(args.to, **filters)
+            for csv_file, txt_file in files:
+                print(f"{csv_file}\n{txt_file}")
+            print(f"Exported {len(files)} orders")
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Order ledger: every purchased line item as one row of a SQLite database.
+
+Replaces the CSV + TXT file pair the flow used to write per order. The
+database runs in WAL mode so several processes can append while others read,
+and the columns orders are looked up by are indexed. Rows are buffered and
+committed in batches: when ``batch_size`` rows are waiting, or at the latest
+``flush_interval`` seconds after the first of them (and at exit). Callers that
+confirm an order to the shopper record it with ``commit=True`` instead, so it
+is on disk before they report it saved.
+
+The database also holds the counter order numbers are drawn from (see
+``next_order_number``). Receipts in the old layouts can still be produced on
+demand with ``export``,
+and the existing ``shopping_cart/*.csv`` files loaded with ``import_csv_files``.
+"""
+import atexit
+import csv
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from my_shopping_agent.orders.receipts import RECEIPT_FIELDS, receipt_rows, write_receipts
+
+
+DEFAULT_LEDGER_PATH = Path("shopping_cart") / "orders.db"
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+COLUMNS = RECEIPT_FIELDS + ['created_at', 'source']
+# A line item is identified by its order and product
+ORDER_ID, PRODUCT_ID = COLUMNS.index('order_id'), COLUMNS.index('product_id')
+
+# cart_<order>_<YYYYMMDD>_<HHMMSS>.csv, written per order by earlier versions
+_RECEIPT_FILE = re.compile(r"_(\d{8}_\d{6})$")
+
+
+class OrderLedger:
+    """Append-mostly store of orders in a WAL-mode SQLite database."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_LEDGER_PATH,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        """
+        Args:
+            path: Database file
+            batch_size: Buffered orders that trigger a commit
+            flush_interval: Longest an order waits in the buffer, in seconds
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple] = []
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+
+        self._db = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id TEXT NOT NULL,
+                product_name TEXT,
+                product_id TEXT,
+                price REAL,
+                quantity INTEGER NOT NULL DEFAULT 1,
+                quality TEXT,
+                customer_name TEXT,
+                customer_address TEXT,
+                customer_phone TEXT,
+                payment_status TEXT,
+                shipping_status TEXT,
+                estimated_delivery TEXT,
+                created_at TEXT NOT NULL,
+                source TEXT NOT NULL,
+                UNIQUE (order_id, product_id)
+            )"""
+        )
+        # Ledgers created before orders could hold several line items
+        if "quantity" not in {column[1] for column in self._db.execute("PRAGMA table_info(orders)")}:
+            try:
+                self._db.execute("ALTER TABLE orders ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1")
+            except sqlite3.OperationalError as e:
+                # Another process added it first
+                if "duplicate column" not in str(e):
+                    raise
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_order_id ON orders (order_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_product_id ON orders (product_id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_customer ON orders (customer_name)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS orders_created_at ON orders (created_at)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def record(
+        self,
+        order: Dict[str, Any],
+        created_at: Optional[datetime] = None,
+        source: str = "flow",
+        commit: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Queue a purchase result, all of its line items together, and return its rows.
+
+        Args:
+            commit: Commit it (and anything else buffered) before returning,
+                instead of with the next batch
+        """
+        rows = receipt_rows(order)
+        created_at = (created_at or datetime.now()).isoformat()
+        for row in rows:
+            row['created_at'] = created_at
+            row['source'] = source
+        with self._lock:
+            self._add(rows)
+            if commit:
+                self.flush()
+        return rows
+
+    def _add(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._pending.extend(tuple(_column_value(row, column) for column in COLUMNS) for row in rows)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            elif self._timer is None and self._pending:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> int:
+        """Commit the buffered orders in one transaction; returns how many line items were new."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return 0
+            rows, self._pending = self._pending, []
+            before = self._db.total_changes
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # A line item already recorded (an order saved again on resume, a
+                # receipt imported twice) is skipped; ledgers created before the
+                # key was (order_id, product_id) do not enforce it themselves
+                self._db.executemany(
+                    f"INSERT OR IGNORE INTO orders ({', '.join(COLUMNS)}) "
+                    f"SELECT {', '.join('?' for _ in COLUMNS)} WHERE NOT EXISTS "
+                    f"(SELECT 1 FROM orders WHERE order_id = ? AND product_id IS ?)",
+                    [row + (row[ORDER_ID], row[PRODUCT_ID]) for row in rows],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                self._pending = rows + self._pending
+                raise
+            return self._db.total_changes - before
+
+    def next_order_number(self) -> int:
+        """Next value of the order counter, unique across processes sharing the database."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('order', 0)")
+                self._db.execute("UPDATE counters SET value = value + 1 WHERE name = 'order'")
+                number = self._db.execute("SELECT value FROM counters WHERE name = 'order'").fetchone()[0]
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            return number
+
+    def find(
+        self,
+        order_id: Optional[str] = None,
+        product_id: Optional[Any] = None,
+        customer: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Orders matching every given filter, oldest first.
+
+        ``since`` and ``until`` are ISO dates or timestamps; ``until`` is exclusive.
+        """
+        clauses, params = [], []
+        for column, value in (("order_id", order_id), ("product_id", product_id), ("customer_name", customer)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(str(value))
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("created_at < ?")
+            params.append(until)
+        query = f"SELECT {', '.join(COLUMNS)} FROM orders"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created_at, id"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        with self._lock:
+            self.flush()
+            rows = self._db.execute(query, params).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            self.flush()
+            return self._db.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def import_csv_files(self, directory: Union[str, Path] = "shopping_cart") -> int:
+        """
+        Load the per-order ``cart_*.csv`` receipts and daily ``shopping_cart_*.csv``
+        files written by earlier versions. Files already imported are skipped.
+
+        Returns:
+            Number of orders added
+        """
+        rows = []
+        for path in sorted(Path(directory).glob("*.csv")):
+            rows.extend(_read_order_csv(path))
+        with self._lock:
+            self._add(rows)
+            return self.flush()
+
+    def export(
+        self,
+        directory: Union[str, Path] = "shopping_cart",
+        **filters,
+    ) -> List[Tuple[Path, Path]]:
+        """Write the CSV and TXT receipts of the orders matching ``filters`` (see ``find``)."""
+        orders: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for row in self.find(**filters):
+            orders.setdefault((row['order_id'], row['created_at']), []).append(row)
+        return [
+            write_receipts(rows, directory, datetime.fromisoformat(created_at))
+            for (_, created_at), rows in orders.items()
+        ]
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+
+
+def _column_value(row: Dict[str, Any], column: str) -> Any:
+    value = row.get(column)
+    if column == 'quantity':
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 1
+    if column == 'price':
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return None if value is None else str(value)
+
+
+def _read_order_csv(path: Path) -> List[Dict[str, Any]]:
+    """Rows of one legacy CSV file in the ledger's columns."""
+    with open(path, newline='') as f:
+        records = list(csv.DictReader(f))
+    receipt_time = _RECEIPT_FILE.search(path.stem)
+    if receipt_time:
+        created_at = datetime.strptime(receipt_time.group(1), "%Y%m%d_%H%M%S").isoformat()
+    else:
+        created_at = datetime.fromtimestamp(path.stat().st_mtime).isoformat()
+
+    rows = []
+    for record in records:
+        if not record.get('order_id'):
+            continue
+        row = {field: record.get(field) for field in RECEIPT_FIELDS}
+        # The daily files carry their own timestamp column
+        row['created_at'] = record.get('timestamp') or created_at
+        row['source'] = path.name
+        rows.append(row)
+    return rows
+
+
+@lru_cache(maxsize=None)
+def get_order_ledger() -> OrderLedger:
+    """Return the process-wide ledger; buffered orders are committed at exit."""
+    ledger = OrderLedger()
+    atexit.register(ledger.flush)
+    return ledger
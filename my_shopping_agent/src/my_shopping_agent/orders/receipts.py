@@ -0,0 +1,98 @@
+"""CSV and TXT receipt layouts for a single order (one row per line item)."""
+import csv
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+RECEIPT_FIELDS = [
+    'order_id', 'product_name', 'product_id', 'price', 'quantity', 'quality',
+    'customer_name', 'customer_address', 'customer_phone',
+    'payment_status', 'shipping_status', 'estimated_delivery',
+]
+
+
+def receipt_rows(order: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a purchase result (as returned by the flow) into one receipt row per line item.
+
+    Orders from a cart carry ``items`` (``{"product", "quantity"}`` dicts);
+    single-product orders carry ``product``.
+    """
+    items = order.get('items') or [{"product": order.get('product', {}), "quantity": 1}]
+    return [receipt_row(order, item["product"], item.get("quantity", 1)) for item in items]
+
+
+def receipt_row(order: Dict[str, Any], product: Optional[Dict[str, Any]] = None, quantity: int = 1) -> Dict[str, Any]:
+    """Receipt row for one product of a purchase result (its ``product`` by default)."""
+    product = order.get('product', {}) if product is None else product
+    customer = order.get('customer', {})
+    return {
+        'order_id': order.get('order_id', 'Unknown'),
+        'product_name': product.get('product_name', 'Unknown'),
+        'product_id': product.get('product_id', 'Unknown'),
+        'price': product.get('price', 0),
+        'quantity': quantity,
+        'quality': product.get('quality', 'Standard'),
+        'customer_name': customer.get('name', 'Unknown'),
+        'customer_address': customer.get('address', 'Unknown'),
+        'customer_phone': customer.get('phone', 'Unknown'),
+        'payment_status': order.get('payment_status', 'completed'),
+        'shipping_status': order.get('shipping_status', 'processing'),
+        'estimated_delivery': order.get('estimated_delivery', 'Unknown'),
+    }
+
+
+def write_receipts(
+    rows: Union[Dict[str, Any], List[Dict[str, Any]]],
+    directory: Union[str, Path] = "shopping_cart",
+    purchased_at: Optional[datetime] = None,
+) -> Tuple[Path, Path]:
+    """
+    Write ``cart_<order>_<timestamp>.csv`` and ``.txt`` for one order.
+
+    Args:
+        rows: The order's receipt rows, one per line item (or a single row)
+
+    Returns:
+        The CSV and TXT paths
+    """
+    rows = [rows] if isinstance(rows, dict) else rows
+    row = rows[0]
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    purchased_at = purchased_at or datetime.now()
+
+    timestamp = purchased_at.strftime("%Y%m%d_%H%M%S")
+    order_id = str(row['order_id'] or 'order').replace("-", "_")
+    csv_filename = directory / f"cart_{order_id}_{timestamp}.csv"
+    txt_filename = directory / f"cart_{order_id}_{timestamp}.txt"
+
+    with open(csv_filename, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=RECEIPT_FIELDS)
+        writer.writeheader()
+        writer.writerows({field: line.get(field) for field in RECEIPT_FIELDS} for line in rows)
+
+    with open(txt_filename, 'w') as txtfile:
+        txtfile.write(f"ORDER CONFIRMATION - {row['order_id']}\n")
+        txtfile.write("="*50 + "\n")
+        txtfile.write(f"Purchase Date: {purchased_at.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        txtfile.write("PRODUCT DETAILS:\n")
+        for line in rows:
+            txtfile.write(f"Product: {line['product_name']}\n")
+            txtfile.write(f"Product ID: {line['product_id']}\n")
+            txtfile.write(f"Price: ${line['price']}\n")
+            if len(rows) > 1 or (line.get('quantity') or 1) != 1:
+                txtfile.write(f"Quantity: {line.get('quantity') or 1}\n")
+            txtfile.write(f"Quality: {line['quality']}\n\n")
+        txtfile.write("CUSTOMER INFORMATION:\n")
+        txtfile.write(f"Name: {row['customer_name']}\n")
+        txtfile.write(f"Address: {row['customer_address']}\n")
+        txtfile.write(f"Phone: {row['customer_phone']}\n\n")
+        txtfile.write("ORDER STATUS:\n")
+        txtfile.write(f"Payment Status: {row['payment_status']}\n")
+        txtfile.write(f"Shipping Status: {row['shipping_status']}\n")
+        txtfile.write(f"Estimated Delivery: {row['estimated_delivery']}\n")
+        txtfile.write("="*50 + "\n")
+        txtfile.write("Thank you for shopping with us!\n")
+
+    return csv_filename, txt_filename
@@ -0,0 +1,107 @@
+"""Local order confirmation: order IDs, delivery estimates and statuses.
+
+Checkout used to ask the Cart agent to make these up. Here they are computed:
+order numbers come from a counter in the order ledger's database, incremented
+in its own transaction, so they are unique and increasing across every process
+sharing the ledger; delivery is estimated in business days, skipping weekends
+and any given holidays.
+"""
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+from my_shopping_agent.orders.cart import cart_total
+from my_shopping_agent.orders.ledger import OrderLedger, get_order_ledger
+
+
+DELIVERY_BUSINESS_DAYS = (5, 7)
+PAYMENT_STATUS = "completed"
+SHIPPING_STATUS = "processing"
+
+
+def add_business_days(start: date, days: int, holidays: Iterable[date] = ()) -> date:
+    """The date ``days`` business days after ``start``."""
+    holidays = set(holidays)
+    current = start
+    while days > 0:
+        current += timedelta(days=1)
+        if current.weekday() < 5 and current not in holidays:
+            days -= 1
+    return current
+
+
+def estimate_delivery(
+    ordered_on: date,
+    business_days=DELIVERY_BUSINESS_DAYS,
+    holidays: Iterable[date] = (),
+) -> str:
+    """Delivery window as ``"YYYY-MM-DD to YYYY-MM-DD"``, the layout of the receipts."""
+    holidays = set(holidays)
+    earliest, latest = (add_business_days(ordered_on, days, holidays) for days in business_days)
+    return f"{earliest.isoformat()} to {latest.isoformat()}"
+
+
+class OrderService:
+    """Confirms orders without an LLM round-trip."""
+
+    def __init__(
+        self,
+        ledger: Optional[OrderLedger] = None,
+        business_days=DELIVERY_BUSINESS_DAYS,
+        holidays: Iterable[date] = (),
+    ):
+        """
+        Args:
+            ledger: Ledger whose counter numbers the orders (the shared one by default)
+            business_days: ``(earliest, latest)`` delivery, in business days
+            holidays: Dates that are not business days
+        """
+        self.ledger = ledger or get_order_ledger()
+        self.business_days = business_days
+        self.holidays = set(holidays)
+
+    def new_order_id(self, now: Optional[datetime] = None) -> str:
+        """``ORD-<YYYYMMDD>-<number>``; the number never repeats, so IDs sort in order."""
+        number = self.ledger.next_order_number()
+        return f"ORD-{(now or datetime.now()):%Y%m%d}-{number:06d}"
+
+    def confirm(
+        self,
+        selected_product: Dict[str, Any],
+        customer: Dict[str, Any],
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Order confirmation in the shape the Cart agent was asked to return."""
+        now = now or datetime.now()
+        return {
+            "order_id": self.new_order_id(now),
+            "product": selected_product,
+            "customer": customer,
+            "payment_status": PAYMENT_STATUS,
+            "shipping_status": SHIPPING_STATUS,
+            "estimated_delivery": estimate_delivery(now.date(), self.business_days, self.holidays),
+        }
+
+    def confirm_cart(
+        self,
+        items: List[Dict[str, Any]],
+        customer: Dict[str, Any],
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """One order for every line item of a cart (``{"product", "quantity"}`` dicts)."""
+        now = now or datetime.now()
+        return {
+            "order_id": self.new_order_id(now),
+            "items": items,
+            "total": cart_total(items),
+            "customer": customer,
+            "payment_status": PAYMENT_STATUS,
+            "shipping_status": SHIPPING_STATUS,
+            "estimated_delivery": estimate_delivery(now.date(), self.business_days, self.holidays),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_order_service() -> OrderService:
+    """Return the process-wide order service, numbering orders from the shared ledger."""
+    return OrderService()
@@ -0,0 +1,292 @@
+"""Multi-session TCP front end for the shopping flow.
+
+Each connection gets its own ``AsyncShopFlow``. The server speaks a line
+protocol: it sends one JSON object per line and reads the shopper's answers as
+plain text lines.
+
+    {"type": "session", "id": "..."}       sent once on connect
+    {"type": "output", "text": "..."}      what the flow prints
+    {"type": "prompt", "text": "..."}      the next line the client sends answers it
+    {"type": "result", "result": {...}}    the flow's final result; the server then hangs up
+    {"type": "closed", "reason": "..."}    the session was closed by the server
+
+Sessions live in an in-memory map; ones that have left a prompt unanswered for
+``idle_timeout`` seconds are closed. All sessions share one event loop, so a
+shopper who is thinking costs no thread.
+
+Run ``serve --port 8765`` and try it with ``nc localhost 8765``.
+"""
+import argparse
+import asyncio
+import contextvars
+import io
+import json
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from my_shopping_agent.async_flow import DEFAULT_MAX_WORKERS, AsyncShopFlow
+from my_shopping_agent.catalog import DEFAULT_CANDIDATES
+from my_shopping_agent.catalog.reload import DEFAULT_POLL_INTERVAL
+from my_shopping_agent.main import watch_catalog
+from my_shopping_agent.telemetry import serve_metrics
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_IDLE_TIMEOUT = 600.0
+DEFAULT_MAX_SESSIONS = 1000
+
+_current_session: contextvars.ContextVar = contextvars.ContextVar("shopper_session", default=None)
+
+
+class SessionStdout(io.TextIOBase):
+    """``sys.stdout`` replacement that sends prints to the session they came from.
+
+    The session is found through a context variable, which asyncio tasks and
+    ``asyncio.to_thread`` workers inherit; prints outside any session go to the
+    real stdout.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        session = _current_session.get()
+        if session is None:
+            return self.stream.write(text)
+        session.output(text)
+        return len(text)
+
+    def flush(self):
+        session = _current_session.get()
+        if session is None:
+            self.stream.flush()
+        else:
+            session.flush_output()
+
+
+class ShopperSession:
+    """One connected shopper: their flow, pending answers and output buffer."""
+
+    def __init__(self, session_id: str, writer: asyncio.StreamWriter, flow_options: Dict[str, Any]):
+        self.id = session_id
+        self.writer = writer
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self.answers: asyncio.Queue = asyncio.Queue()
+        self.last_active = time.monotonic()
+        self.waiting = False
+        self.flow = SessionShopFlow(self, **flow_options)
+        self.task: Optional[asyncio.Task] = None
+        self._buffer = ""
+        self._lock = threading.Lock()
+
+    def send(self, message_type: str, **fields) -> None:
+        """Queue one JSON message; safe to call from worker threads."""
+        data = (json.dumps({"type": message_type, **fields}, default=str) + "\n").encode("utf-8")
+        if threading.get_ident() == self._loop_thread:
+            self._write(data)
+        else:
+            self.loop.call_soon_threadsafe(self._write, data)
+
+    def _write(self, data: bytes) -> None:
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def output(self, text: str) -> None:
+        """Buffer printed text and send it a line at a time."""
+        with self._lock:
+            self._buffer += text
+            if "\n" not in self._buffer:
+                return
+            lines, self._buffer = self._buffer.rsplit("\n", 1)
+        self.send("output", text=lines)
+
+    def flush_output(self) -> None:
+        with self._lock:
+            text, self._buffer = self._buffer, ""
+        if text:
+            self.send("output", text=text)
+
+    async def ask(self, prompt: str) -> str:
+        self.flush_output()
+        self.send("prompt", text=prompt)
+        self.last_active = time.monotonic()
+        self.waiting = True
+        try:
+            return await self.answers.get()
+        finally:
+            self.waiting = False
+
+    async def run(self) -> Any:
+        """Run the flow with this session's output routing in place."""
+        _current_session.set(self)
+        self.send("session", id=self.id)
+        try:
+            result = await self.flow.kickoff_async()
+            self.flush_output()
+            self.send("result", result=result)
+            return result
+        finally:
+            self.flush_output()
+
+
+class SessionShopFlow(AsyncShopFlow):
+    """AsyncShopFlow whose prompts are messages on the shopper's connection."""
+
+    def __init__(self, session: ShopperSession, **options):
+        super().__init__(**options)
+        self.session = session
+        self.trace_id = self.session_id = session.id
+
+    async def ask_async(self, prompt):
+        return await self.session.ask(prompt)
+
+
+class ShopServer:
+    """Accepts shopper connections and keeps their sessions in memory."""
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        **flow_options,
+    ):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free one)
+            idle_timeout: Seconds a prompt may go unanswered before the session is closed
+            max_sessions: Connections beyond this many are turned away
+            **flow_options: Passed to every session's flow (e.g. ``use_llm_scoring``)
+        """
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.flow_options = flow_options
+        self.sessions: Dict[str, ShopperSession] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if not isinstance(sys.stdout, SessionStdout):
+            sys.stdout = SessionStdout(sys.stdout)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._sweeper = asyncio.create_task(self._evict_idle())
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        print(f"Shopping server listening on {self.host}:{self.port}")
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        for session in list(self.sessions.values()):
+            self._close(session, "server shutting down")
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(b'{"type": "closed", "reason": "server busy"}\n')
+            await writer.drain()
+            writer.close()
+            return
+
+        session = ShopperSession(uuid.uuid4().hex, writer, self.flow_options)
+        self.sessions[session.id] = session
+        session.task = asyncio.create_task(session.run())
+        session.task.add_done_callback(lambda _: writer.close())
+        try:
+            while not session.task.done():
+                read = asyncio.ensure_future(reader.readline())
+                done, _ = await asyncio.wait({read, session.task}, return_when=asyncio.FIRST_COMPLETED)
+                if read not in done:
+                    read.cancel()
+                    break
+                line = read.result()
+                if not line:
+                    break
+                session.last_active = time.monotonic()
+                await session.answers.put(line.decode("utf-8", errors="replace").rstrip("\r\n"))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if not session.task.done():
+                session.task.cancel()
+            self.sessions.pop(session.id, None)
+
+    def _close(self, session: ShopperSession, reason: str) -> None:
+        session.send("closed", reason=reason)
+        if session.task is not None:
+            session.task.cancel()
+        session.writer.close()
+        self.sessions.pop(session.id, None)
+
+    async def _evict_idle(self) -> None:
+        while True:
+            await asyncio.sleep(max(min(self.idle_timeout / 2, 30.0), 0.1))
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if session.waiting and now - session.last_active > self.idle_timeout:
+                    self._close(session, "idle timeout")
+
+
+def serve(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Serve shopping sessions over TCP")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="threads for blocking agent and LLM calls")
+    parser.add_argument("--llm-scoring", action="store_true", help="let the Catalog agent score products")
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES,
+                        help="with --llm-scoring, rows the local search picks for the agent to score "
+                             "(0 = let the agent search the whole catalog)")
+    parser.add_argument("--stream-matches", action="store_true",
+                        help="with --llm-scoring, show each product as soon as the agent has generated it")
+    parser.add_argument("--trace-dir", help="write each session's trace JSON to this directory")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics at /metrics on this port")
+    parser.add_argument("--watch-catalog", action="store_true",
+                        help="reload the catalog whenever knowledge/spreadsheet.xlsx changes")
+    parser.add_argument("--catalog-poll", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="with --watch-catalog, seconds between checks of the spreadsheet")
+    args = parser.parse_args(argv)
+
+    async def main():
+        from concurrent.futures import ThreadPoolExecutor
+
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(args.workers))
+        if args.metrics_port is not None:
+            serve_metrics(args.metrics_port, args.host)
+            print(f"Metrics at http://{args.host}:{args.metrics_port}/metrics")
+        if args.watch_catalog:
+            watch_catalog(args.catalog_poll)
+        server = ShopServer(
+            args.host, args.port, args.idle_timeout, args.max_sessions,
+            use_llm_scoring=args.llm_scoring, stream_matches=args.stream_matches,
+            catalog_candidates=args.candidates,
+            trace_dir=args.trace_dir,
+        )
+        await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    serve()
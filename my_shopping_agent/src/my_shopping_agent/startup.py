@@ -0,0 +1,87 @@
+"""Cold-start profiling for the ``kickoff`` entry point.
+
+``kickoff --startup-profile`` imports the flow in a fresh interpreter with
+``-X importtime``, times ``ShopFlow()`` and the components it now builds
+lazily, and checks the cold start against ``STARTUP_BUDGET_SECONDS``.
+"""
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, List, Tuple
+
+
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "8.0"))
+FLOW_MODULE = "my_shopping_agent.main"
+
+
+def import_times(module: str = FLOW_MODULE, top: int = 10) -> Tuple[float, List[Tuple[float, str]]]:
+    """
+    Import ``module`` in a fresh interpreter and collect ``-X importtime`` data.
+
+    Returns:
+        The module's total import time in seconds and the ``top`` packages
+        with the most import time of their own, as ``(seconds, name)`` pairs
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            self_seconds = int(self_us) / 1_000_000
+            cumulative = int(cumulative_us) / 1_000_000
+        except ValueError:
+            continue  # header line
+        name = name.strip()
+        if name == module:
+            total = cumulative
+        # Charge each module's own time to its top-level package
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0.0) + self_seconds
+    heaviest = sorted(((seconds, name) for name, seconds in packages.items()), reverse=True)[:top]
+    return total, heaviest
+
+
+def _timed(build: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    build()
+    return time.perf_counter() - start
+
+
+def startup_profile(budget: float = STARTUP_BUDGET_SECONDS) -> int:
+    """Print the startup report; return 0 within budget, 1 over it."""
+    from my_shopping_agent.crews.poem_crew.Shopping_crew import get_embedder, get_knowledge_source, get_llm
+    from my_shopping_agent.main import ShopFlow
+
+    total_import, heaviest = import_times()
+    flow_init = _timed(ShopFlow)
+    cold_start = total_import + flow_init
+
+    print("=" * 50)
+    print("STARTUP PROFILE")
+    print("=" * 50)
+    print(f"import {FLOW_MODULE}: {total_import:.3f}s")
+    for seconds, name in heaviest:
+        print(f"    {name:<30} {seconds:.3f}s")
+    print(f"ShopFlow(): {flow_init:.3f}s")
+    print("\nBuilt on first use (not part of cold start):")
+    for label, build in [
+        ("LLM clients (3)", lambda: [get_llm(index) for index in (1, 2, 3)]),
+        ("Embedder", get_embedder),
+        ("Knowledge source", get_knowledge_source),
+    ]:
+        print(f"    {label:<30} {_timed(build):.3f}s")
+    print("    Agents                         on the first stage that needs them")
+    print("=" * 50)
+
+    within_budget = cold_start <= budget
+    print(f"Cold start: {cold_start:.3f}s (budget {budget:.3f}s) - {'OK' if within_budget else 'OVER BUDGET'}")
+    return 0 if within_budget else 1
@@ -0,0 +1,23 @@
+from my_shopping_agent.telemetry.metrics import REGISTRY, MetricsRegistry, serve_metrics
+from my_shopping_agent.telemetry.tracing import (
+    Span,
+    Trace,
+    current_span,
+    record_llm_usage,
+    record_parse,
+    session_trace,
+    span,
+)
+
+__all__ = [
+    "REGISTRY",
+    "MetricsRegistry",
+    "Span",
+    "Trace",
+    "current_span",
+    "record_llm_usage",
+    "record_parse",
+    "serve_metrics",
+    "session_trace",
+    "span",
+]
@@ -0,0 +1,181 @@
+"""Prometheus text-format metrics: histograms, counters and gauges with labels.
+
+Everything is kept in one process-wide ``REGISTRY``. It can be written to a
+file (for the node exporter's textfile collector, or to inspect by hand) or
+served over HTTP at ``/metrics`` with ``serve_metrics``.
+"""
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+DEFAULT_METRICS_PORT = 9464
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted((name, str(label)) for name, label in labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', repr(float(bound))))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._series: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted((name, str(label)) for name, label in labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return "\n".join(lines)
+
+
+class Gauge:
+    """Value that can go up and down, one series per label combination."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._series: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(sorted((name, str(label)) for name, label in labels.items()))
+        with self._lock:
+            self._series[key] = value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for labels, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Named metrics, created on first use and rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Histogram, Counter, Gauge]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help_text, buckets)
+            return self._metrics[name]
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help_text)
+            return self._metrics[name]
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Gauge(name, help_text)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def write(self, path: Union[str, Path]) -> Path:
+        """Write the metrics to ``path``, replacing it atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        partial.write_text(self.render())
+        partial.replace(path)
+        return path
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("/metrics", ""):
+            self.send_error(404)
+            return
+        data = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve_metrics(port: int = DEFAULT_METRICS_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``REGISTRY`` at ``http://host:port/metrics`` from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
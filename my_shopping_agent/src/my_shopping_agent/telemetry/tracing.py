@@ -0,0 +1,154 @@
+"""Timing spans for the shopping flow, collected into one trace per session.
+
+``span()`` times a block of work and nests under the span that is open when
+it starts. The current trace and span live in context variables, which
+asyncio tasks and ``asyncio.to_thread`` workers inherit, so agent tasks and
+LLM calls made from worker threads still land in the right session's trace.
+Every finished span is also observed in the ``shopflow_span_duration_seconds``
+histogram, labelled by kind and name.
+"""
+import contextlib
+import contextvars
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from my_shopping_agent.telemetry.metrics import REGISTRY, TOKEN_BUCKETS
+
+
+SPAN_SECONDS = REGISTRY.histogram(
+    "shopflow_span_duration_seconds", "Duration of flow stages, agent tasks, LLM calls and other spans"
+)
+LLM_TOKENS = REGISTRY.histogram("shopflow_llm_tokens", "Estimated tokens per LLM call", TOKEN_BUCKETS)
+LLM_RETRIES = REGISTRY.counter("shopflow_llm_retries_total", "LLM calls retried after a rate limit")
+PARSE_PATHS = REGISTRY.counter("shopflow_parse_path_total", "Which parsing path handled an LLM reply")
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    """One timed piece of work and what it recorded."""
+
+    def __init__(self, name: str, kind: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.duration = None
+        self.status = "ok"
+        self._lock = threading.Lock()
+
+    def set(self, **attributes) -> None:
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """The spans of one shopping session."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.started_at)
+        return {
+            "trace_id": self.trace_id,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "duration_ms": round((time.time() - self.started_at) * 1000, 3),
+            "spans": [span.to_dict() for span in spans],
+        }
+
+    def write(self, directory: Union[str, Path]) -> Path:
+        """Write the trace as ``<directory>/<trace_id>.json``."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.trace_id}.json"
+        path.write_text(json.dumps(self.to_dict(), indent=2, default=str))
+        return path
+
+
+@contextlib.contextmanager
+def session_trace(trace_id: Optional[str] = None) -> Iterator[Trace]:
+    """Collect the spans started in this context into a new trace."""
+    trace = Trace(trace_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Span]:
+    """Time the enclosed block as a span of the current trace."""
+    parent = _current_span.get()
+    current = Span(name, kind, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current_span.reset(token)
+        SPAN_SECONDS.observe(current.duration, kind=kind, name=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def record_parse(parser: str, path: str) -> None:
+    """Note which parsing path handled a reply (e.g. "json", "comma_repair", "fallback")."""
+    PARSE_PATHS.inc(parser=parser, path=path)
+    current = _current_span.get()
+    if current is not None:
+        current.set(**{f"{parser}_parse_path": path})
+
+
+def record_llm_usage(prompt_tokens: int, completion_tokens: int, retries: int) -> None:
+    """Observe an LLM call's token counts and retries, and add them to the open span."""
+    LLM_TOKENS.observe(prompt_tokens, type="prompt")
+    LLM_TOKENS.observe(completion_tokens, type="completion")
+    if retries:
+        LLM_RETRIES.inc(retries)
+    current = _current_span.get()
+    if current is not None:
+        current.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, retries=retries)
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+from my_shopping_agent.benchmarks.stubs import StubCrew, StubLLM
+from my_shopping_agent.checkpoints import get_checkpoint_store
+from my_shopping_agent.extraction import get_extraction_cache
+from my_shopping_agent.llm import get_abandoned_attempts, get_circuit_breaker
+from my_shopping_agent.main import ShopFlow
+from my_shopping_agent.orders import get_order_ledger, get_order_service
+
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+PER_TEST = (
+    get_abandoned_attempts, get_circuit_breaker, get_checkpoint_store,
+    get_extraction_cache, get_order_ledger, get_order_service,
+)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Run each test in an empty directory that sees the project's catalog.
+
+    The process-wide stores and the circuit breaker are recreated for each
+    test, so they live in (and only see) that directory.
+    """
+    (tmp_path / "knowledge").symlink_to(PROJECT_DIR / "knowledge")
+    monkeypatch.chdir(tmp_path)
+    for getter in PER_TEST:
+        getter.cache_clear()
+    yield tmp_path
+    for getter in PER_TEST:
+        getter.cache_clear()
+
+
+class ScriptedFlow(ShopFlow):
+    """ShopFlow with stub agents that answers its prompts from a list."""
+
+    def __init__(self, answers=(), replies=None, **options):
+        options = {"cache_extractions": False, "checkpoints": False, **options}
+        super().__init__(**options)
+        self.shop_crew = StubCrew(replies)
+        self.answers = list(answers)
+
+    def ask(self, prompt):
+        return self.answers.pop(0) if self.answers else "n"
+
+    def _explanation_llm(self):
+        return StubLLM()
+
+
+@pytest.fixture
+def scripted_flow():
+    return ScriptedFlow
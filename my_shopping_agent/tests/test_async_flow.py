@@ -0,0 +1,45 @@
+import asyncio
+
+from my_shopping_agent.async_flow import AsyncShopFlow
+from my_shopping_agent.benchmarks.stubs import StubCrew, StubLLM
+from my_shopping_agent.main import TASK_TIMEOUTS
+
+
+class ScriptedAsyncFlow(AsyncShopFlow):
+    def __init__(self, answers=(), replies=None, **options):
+        options = {"cache_extractions": False, "checkpoints": False, "fast_path_threshold": None, **options}
+        super().__init__(**options)
+        self.shop_crew = StubCrew(replies)
+        self.answers = list(answers)
+        self.calls = []
+
+    async def ask_async(self, prompt):
+        # Answered on the loop, as the server does; ShopFlow.ask would read the terminal
+        return self.answers.pop(0) if self.answers else "n"
+
+    def _explanation_llm(self):
+        return StubLLM()
+
+    def _call_resiliently(self, name, operation):
+        self.calls.append(name)
+        return super()._call_resiliently(name, operation)
+
+
+def test_agent_calls_use_the_agents_time_budgets():
+    # The Catalog agent finds nothing, so the suggestions call is awaited too
+    flow = ScriptedAsyncFlow(use_llm_scoring=True, catalog_candidates=0)
+    details = asyncio.run(flow.extract_shopping_details("I want a laptop"))
+    result = asyncio.run(flow.search_product_catalog(details))
+    assert "error" not in result
+    assert flow.calls == ["Orchestrator", "Catalog", "Catalog"]
+    assert all(name in TASK_TIMEOUTS for name in flow.calls)
+
+
+def test_session_buys_then_checks_out_the_cart_from_the_summary():
+    checkout = ["Ann Lee", "1 Main St", "555-0100", "Visa", "4111"]
+    answers = ["I want a laptop", "1", "y", *checkout, "y", "laptop", "1", "a", "n", "y", *checkout, "n"]
+    flow = ScriptedAsyncFlow(answers, fast_path_threshold=0.5)
+    result = asyncio.run(flow.kickoff_async())
+    assert result["session_status"] == "completed"
+    assert result["cart_result"]["cart_update"] == "success"
+    assert flow.answers == [] and not flow.cart
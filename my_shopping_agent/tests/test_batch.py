@@ -0,0 +1,45 @@
+import pytest
+
+import my_shopping_agent.main as main
+from my_shopping_agent.batch import run_script
+from my_shopping_agent.benchmarks.stubs import StubCrew, StubLLM
+
+
+FLOW_OPTIONS = {"cache_extractions": False, "checkpoints": False, "fast_path_threshold": None}
+PURCHASE = ["1", "1", "y", "Ann Lee", "1 Main St", "555-0100", "Visa", "4111", "n"]
+
+
+class BrokenCrew(StubCrew):
+    def Orchestrator(self):
+        raise RuntimeError("could not build the Orchestrator")
+
+
+@pytest.fixture
+def stub_llms(monkeypatch):
+    monkeypatch.setattr(main, "ShopCrew", StubCrew)
+    monkeypatch.setattr(main, "get_llm", lambda index: StubLLM())
+
+
+def test_completed_session_is_ok(stub_llms):
+    record = run_script({"id": "buy", "query": "I want a laptop", "answers": PURCHASE}, FLOW_OPTIONS)
+    assert record["status"] == "ok", record.get("error")
+    assert record["result"]["session_status"] == "completed"
+
+
+def test_exception_in_a_stage_is_an_error(stub_llms, monkeypatch):
+    monkeypatch.setattr(main, "ShopCrew", BrokenCrew)
+    record = run_script({"id": "broken", "query": "I want a laptop", "answers": PURCHASE}, FLOW_OPTIONS)
+    assert record["status"] == "error"
+    assert record["error"].startswith("RuntimeError: could not build the Orchestrator")
+
+
+def test_running_out_of_answers_is_an_error(stub_llms):
+    record = run_script({"id": "short", "query": "I want a laptop", "answers": ["1"]}, FLOW_OPTIONS)
+    assert record["status"] == "error"
+    assert record["error"].startswith("ScriptExhausted")
+
+
+def test_unused_answers_are_an_error(stub_llms):
+    record = run_script({"id": "long", "query": "I want a laptop", "answers": PURCHASE + ["extra"]}, FLOW_OPTIONS)
+    assert record["status"] == "error"
+    assert "1 answer(s) unused" in record["error"]
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from my_shopping_agent.catalog import CatalogPrefetch, CatalogSearchEngine, FacetIndex
+
+
+CATALOG = pd.DataFrame(
+    [
+        (1, "Laptop", "high", 20000),
+        (2, "Apple Laptop", "high", 90000),
+        (3, "Gaming Laptop", "low", 20000),
+        (4, "Mens watch", "medium", 1000),
+        (5, "Smart Phone", "high", 30000),
+        (6, "Laptop bag", "medium", 1500),
+        (7, "Laptop stand", "medium", 2000),
+    ],
+    columns=["pd_id", "product_name", "quality", "price"],
+)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return CatalogSearchEngine(CATALOG)
+
+
+def names(products):
+    return [product["product_name"] for product in products]
+
+
+def names_of(engine, rows):
+    return engine.catalog["product_name"].iloc[rows].tolist()
+
+
+def test_search_scores_name_price_and_quality(engine):
+    products = engine.search("laptop", "10000-30000", "high")
+    # Name 50 + price 40 + quality 10; a longer name matches "laptop" less
+    # closely (45), and prices fall off with their distance from the window
+    assert [(p["product_name"], p["match_score"]) for p in products] == [
+        ("Laptop", 100),
+        ("Gaming Laptop", 85),
+        ("Laptop bag", 74),
+    ]
+    assert products[0]["reasoning"] == "Name match 50/50, price match 40/40, quality match 10/10"
+
+
+def test_search_keeps_the_top_three_above_the_threshold(engine):
+    everything = engine.search("laptop", "10000-30000", "high", limit=10)
+    # Apple Laptop (45 + 0 + 10) is under 60; Laptop stand ties Laptop bag
+    # at 74 and loses to the cheaper product
+    assert names(everything) == ["Laptop", "Gaming Laptop", "Laptop bag", "Laptop stand"]
+    assert names(engine.search("laptop", "10000-30000", "high")) == names(everything)[:3]
+    assert engine.search("laptop", "10000-30000", "high", min_score=101) == []
+
+
+def test_search_without_price_or_quality_gives_their_points(engine):
+    products = engine.search("watch")
+    # "watch" is half of the name: 40 for coverage + 5 for precision, then 40 + 10
+    assert [(p["product_name"], p["match_score"]) for p in products] == [("Mens watch", 95)]
+
+
+def test_search_by_id(engine):
+    assert names(engine.search(pd_id=5)) == ["Smart Phone"]
+
+
+@pytest.mark.parametrize("query", ["lap top", "labtop", "laptops", "LAPTOP"])
+def test_names_match_split_misspelt_and_plural_words(engine, query):
+    assert names(engine.search(query, "10000-30000", "high"))[0] == "Laptop"
+    assert "Laptop" in names_of(engine, engine.match_rows(query))
+
+
+def test_joined_words_match_split_names(engine):
+    assert names_of(engine, engine.match_rows("smartphone")) == ["Smart Phone"]
+
+
+def test_match_rows_prefers_rows_with_every_term(engine):
+    assert names_of(engine, engine.match_rows("gaming laptop")) == ["Gaming Laptop"]
+    # No row has both terms, so rows with either are returned
+    assert set(names_of(engine, engine.match_rows("gaming watch"))) == {"Gaming Laptop", "Mens watch"}
+
+
+def test_facet_filter_by_price_window(engine):
+    rows = engine.facets.filter(None, 1000, 20000)
+    # Bounds are inclusive, and the rows come cheapest first
+    assert engine.catalog["price"].iloc[rows].tolist() == [1000, 1500, 2000, 20000, 20000]
+    assert engine.facets.count(1000, 20000) == len(rows)
+    assert len(engine.facets.filter(None, 90001)) == 0
+
+
+def test_facet_filter_by_value_and_price(engine):
+    rows = engine.facets.filter(None, None, 30000, quality="high")
+    assert names_of(engine, rows) == ["Laptop", "Smart Phone"]
+    assert engine.facets.count(None, 30000, quality="HIGH") == 2
+    assert names_of(engine, engine.facets.filter(quality=["low", "medium"], high=1500)) == ["Mens watch", "Laptop bag"]
+    assert len(engine.facets.filter(quality="refurbished")) == 0
+    with pytest.raises(KeyError):
+        engine.facets.filter(colour="red")
+
+
+def test_facet_filter_keeps_the_order_of_given_rows(engine):
+    rows = engine.match_rows("laptop")
+    filtered = engine.facets.filter(rows, 1500, 20000, quality="medium")
+    assert names_of(engine, filtered) == [name for name in names_of(engine, rows) if name in ("Laptop bag", "Laptop stand")]
+    assert engine.facets.counts("quality", rows, high=20000) == {"medium": 2, "high": 1, "low": 1}
+
+
+def test_rows_without_a_price_are_outside_every_window():
+    catalog = pd.DataFrame({"quality": ["high", "high", "low"], "price": [10.0, np.nan, 30.0]})
+    facets = FacetIndex(catalog, catalog["price"].to_numpy())
+    assert facets.price_rows(0, 100).tolist() == [0, 2]
+    assert facets.price_rows().tolist() == [0, 2, 1]
+    assert facets.filter(None, 0, 100, quality="high").tolist() == [0]
+
+
+def test_prefetch_is_reused_for_the_same_details(engine):
+    prefetch = CatalogPrefetch(engine, "gaming laptop", "10000-30000").run()
+    outcome, products = prefetch.search(engine, "Laptop Gaming", "10000-30000")
+    assert outcome == "reused"
+    assert products is prefetch.products
+
+
+def test_prefetch_is_refined_for_a_narrower_name(engine):
+    prefetch = CatalogPrefetch(engine, "gaming laptop", "10000-30000").run()
+    outcome, products = prefetch.search(engine, "laptop", "10000-30000", "high")
+    assert outcome == "refined"
+    assert products == engine.search("laptop", "10000-30000", "high")
+
+
+@pytest.mark.parametrize("product_name, pd_id", [
+    ("watch", None),
+    ("gaming laptop bag stand", None),
+    ("gaming laptop", 3),
+])
+def test_prefetch_is_discarded_for_other_details(engine, product_name, pd_id):
+    prefetch = CatalogPrefetch(engine, "gaming laptop").run()
+    outcome, products = prefetch.search(engine, product_name, pd_id=pd_id)
+    assert outcome == "discarded"
+    assert products == engine.search(product_name, pd_id=pd_id)
+
+
+def test_prefetch_is_discarded_after_a_reload(engine):
+    prefetch = CatalogPrefetch(engine, "laptop").run()
+    reloaded = CatalogSearchEngine(CATALOG)
+    assert prefetch.search(reloaded, "laptop")[0] == "discarded"
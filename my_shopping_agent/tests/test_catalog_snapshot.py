@@ -0,0 +1,120 @@
+import os
+
+import pandas as pd
+import pytest
+
+from my_shopping_agent.catalog import snapshot
+from my_shopping_agent.catalog.knowledge import CatalogKnowledgeSource
+from my_shopping_agent.catalog.snapshot import load_catalog, open_snapshot
+
+
+ROWS = [
+    (1, "Laptop", "high", 20000),
+    (2, "Mens watch", "medium", 1000),
+    (3, "Smart Phone", "high", 30000),
+]
+
+
+def write_catalog(path, rows, mtime):
+    pd.DataFrame(rows, columns=["pd_id", "product_name", "quality", "price"]).to_excel(path, index=False)
+    # Pin the mtime so two writes within the clock's resolution still differ
+    os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def catalog_file(workdir):
+    # Not under knowledge/, which links to the project's own catalog
+    (workdir / "catalog").mkdir()
+    path = workdir / "catalog" / "spreadsheet.xlsx"
+    write_catalog(path, ROWS, 1_000_000_000_000_000_000)
+    return path
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Files whose content hash was computed."""
+    hashed = []
+    file_sha256 = snapshot._file_sha256
+
+    def spy(path):
+        hashed.append(path)
+        return file_sha256(path)
+
+    monkeypatch.setattr(snapshot, "_file_sha256", spy)
+    return hashed
+
+
+def snapshot_dirs(catalog_file):
+    return sorted(path.name for path in (catalog_file.parent / ".snapshots").iterdir() if path.is_dir())
+
+
+def test_unchanged_file_is_neither_parsed_nor_hashed_again(catalog_file, hashed, monkeypatch):
+    first = open_snapshot(catalog_file)
+    assert len(hashed) == 1
+    monkeypatch.setattr(snapshot.CatalogSnapshot, "build", None)
+    assert open_snapshot(catalog_file).directory == first.directory
+    assert len(hashed) == 1
+    assert load_catalog(catalog_file)["product_name"].tolist() == ["Laptop", "Mens watch", "Smart Phone"]
+
+
+def test_touched_file_is_hashed_but_not_parsed_again(catalog_file, hashed, monkeypatch):
+    first = open_snapshot(catalog_file)
+    os.utime(catalog_file, ns=(2_000_000_000_000_000_000,) * 2)
+    monkeypatch.setattr(snapshot.CatalogSnapshot, "build", None)
+    assert open_snapshot(catalog_file).directory == first.directory
+    assert len(hashed) == 2
+
+
+def test_edited_file_gets_a_new_snapshot(catalog_file):
+    first = open_snapshot(catalog_file)
+    write_catalog(catalog_file, [(1, "Laptop", "high", 18000), *ROWS[1:]], 2_000_000_000_000_000_000)
+    second = open_snapshot(catalog_file)
+    assert second.sha256 != first.sha256
+    assert load_catalog(catalog_file)["price"].tolist() == [18000, 1000, 30000]
+    # The old version's snapshot is removed
+    assert snapshot_dirs(catalog_file) == [second.directory.name]
+
+
+class Collection:
+    """The parts of a Chroma collection that ``CatalogKnowledgeSource.sync`` uses."""
+
+    def __init__(self):
+        self.metadata = None
+        self.chunks = {}
+        self.upserted = []
+
+    def get(self, include, limit, offset):
+        ids = list(self.chunks)[offset:offset + limit]
+        return {"ids": ids, "metadatas": [self.chunks[chunk_id][1] for chunk_id in ids]}
+
+    def upsert(self, ids, documents, metadatas):
+        self.upserted.extend(ids)
+        self.chunks.update(zip(ids, zip(documents, metadatas)))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            del self.chunks[chunk_id]
+
+    def modify(self, metadata):
+        self.metadata = metadata
+
+
+def test_knowledge_sync_only_writes_rows_that_changed(catalog_file):
+    collection = Collection()
+    assert CatalogKnowledgeSource(file_paths=[catalog_file]).sync(collection) == {
+        "added": 3, "changed": 0, "removed": 0, "unchanged": 0,
+    }
+    assert CatalogKnowledgeSource(file_paths=[catalog_file]).sync(collection) == {
+        "added": 0, "changed": 0, "removed": 0, "unchanged": 3,
+    }
+
+    # Reprice the laptop, drop the watch, add a bag
+    rows = [(1, "Laptop", "high", 18000), ROWS[2], (4, "Laptop bag", "medium", 1500)]
+    write_catalog(catalog_file, rows, 2_000_000_000_000_000_000)
+    collection.upserted.clear()
+    assert CatalogKnowledgeSource(file_paths=[catalog_file]).sync(collection) == {
+        "added": 1, "changed": 1, "removed": 1, "unchanged": 1,
+    }
+    assert sorted(collection.upserted) == ["spreadsheet.xlsx:1", "spreadsheet.xlsx:4"]
+    assert sorted(collection.chunks) == ["spreadsheet.xlsx:1", "spreadsheet.xlsx:3", "spreadsheet.xlsx:4"]
+    assert "18000" in collection.chunks["spreadsheet.xlsx:1"][0]
@@ -0,0 +1,42 @@
+import sys
+import threading
+
+import pytest
+
+from my_shopping_agent import main
+
+
+def watcher_running():
+    return any(thread.name == "catalog-watcher" for thread in threading.enumerate())
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Replace the flow run by ``kickoff`` with one that notes whether the catalog is being watched."""
+    seen = []
+
+    class Flow:
+        session_id = "test"
+
+        def kickoff(self):
+            seen.append(watcher_running())
+
+    monkeypatch.setattr(main, "ShopFlow", Flow)
+    monkeypatch.delenv("SHOPFLOW_WATCH_CATALOG", raising=False)
+    return seen
+
+
+@pytest.mark.parametrize("argv, env", [(["--watch-catalog"], None), ([], "1")])
+def test_kickoff_watches_the_catalog_when_asked(session, monkeypatch, argv, env):
+    monkeypatch.setattr(sys, "argv", ["kickoff", *argv])
+    if env:
+        monkeypatch.setenv("SHOPFLOW_WATCH_CATALOG", env)
+    main.kickoff()
+    assert session == [True]
+    assert not watcher_running()
+
+
+def test_kickoff_does_not_watch_the_catalog_by_default(session, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["kickoff"])
+    main.kickoff()
+    assert session == [False]
@@ -0,0 +1,40 @@
+from my_shopping_agent.llm import get_circuit_breaker
+
+
+def open_circuit():
+    breaker = get_circuit_breaker()
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+
+
+def test_unrecognised_query_with_provider_down_searches_without_criteria(scripted_flow):
+    open_circuit()
+    flow = scripted_flow()
+
+    details = flow.extract_shopping_details("something nice for my mom")
+    assert details["product_name"] == "unknown product"
+
+    result = flow.search_product_catalog(details)
+    assert "error" not in result
+    assert result["matching_products"]["products"] == []
+
+
+def test_search_criteria_tolerates_missing_fields(scripted_flow):
+    flow = scripted_flow()
+    product_name, criteria = flow._search_criteria(
+        {"product_name": None, "price": None, "pd_id": None, "quality": None}
+    )
+    assert product_name == ""
+    assert "No specific criteria" in criteria
+
+
+def test_recognised_query_with_provider_down_uses_rule_based_details(scripted_flow):
+    open_circuit()
+    flow = scripted_flow(answers=["q"])
+
+    details = flow.extract_shopping_details("laptop under 25000")
+    assert details["product_name"] == "laptop"
+
+    result = flow.search_product_catalog(details)
+    assert result["matching_products"]["products"][0]["product_name"] == "Laptop"
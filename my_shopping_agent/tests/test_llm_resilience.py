@@ -0,0 +1,186 @@
+import itertools
+import random
+import time
+
+import pytest
+
+from my_shopping_agent.llm import (
+    AbandonedAttempts,
+    Backoff,
+    CircuitBreaker,
+    KeyPool,
+    PooledLLM,
+    ProviderUnavailable,
+    is_rate_limit_error,
+    run_resilient,
+)
+from my_shopping_agent.llm.key_pool import LLM_HEDGES
+from my_shopping_agent.llm.stub_server import StubLLMServer
+
+
+NO_WAIT = Backoff(base=0)
+
+
+@pytest.fixture
+def stub():
+    server = StubLLMServer(port=0, reply="ok")
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def pooled_llm(stub, keys=1, **options):
+    pool = KeyPool([(f"K{i}", f"key-{i}") for i in range(keys)], requests_per_minute=10**6, queue_timeout=1.0)
+    return PooledLLM(model="openai/stub", pool=pool, base_url=stub.base_url, **options)
+
+
+def failed_requests(stub):
+    return sum(counts["failed"] for counts in stub.counts.values())
+
+
+def test_run_resilient_retries_until_the_provider_answers(stub):
+    llm = pooled_llm(stub)
+    breaker = CircuitBreaker()
+
+    def call(attempt):
+        # The first attempt hits an outage, the second a healthy provider
+        stub.error_rate = 1.0 if attempt == 1 else 0.0
+        return llm.call("hi")
+
+    assert run_resilient(call, "Test", attempts=3, backoff=NO_WAIT, breaker=breaker) == "ok"
+    assert failed_requests(stub) == 1
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_run_resilient_gives_up_after_its_attempts(stub):
+    llm = pooled_llm(stub)
+    stub.error_rate = 1.0
+    with pytest.raises(ProviderUnavailable, match="after 2 attempt"):
+        run_resilient(lambda attempt: llm.call("hi"), "Test", attempts=2, backoff=NO_WAIT)
+    assert failed_requests(stub) == 2
+
+
+def test_run_resilient_times_out_a_hung_provider(stub):
+    llm = pooled_llm(stub)
+    stub.latency = 2.0
+    started = time.monotonic()
+    with pytest.raises(ProviderUnavailable, match="timed out"):
+        run_resilient(lambda attempt: llm.call("hi"), "Test", timeout=0.3, backoff=NO_WAIT)
+    assert time.monotonic() - started < 1.5
+
+
+def test_circuit_opens_fails_fast_and_closes_after_a_trial_call(stub):
+    llm = pooled_llm(stub)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    stub.error_rate = 1.0
+    with pytest.raises(ProviderUnavailable):
+        run_resilient(lambda attempt: llm.call("hi"), "Test", attempts=2, backoff=NO_WAIT, breaker=breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Open: fails at once, without a request to the provider
+    with pytest.raises(ProviderUnavailable, match="unavailable"):
+        run_resilient(lambda attempt: llm.call("hi"), "Test", backoff=NO_WAIT, breaker=breaker)
+    assert failed_requests(stub) == 2
+
+    stub.error_rate = 0.0
+    time.sleep(0.25)
+    assert run_resilient(lambda attempt: llm.call("hi"), "Test", backoff=NO_WAIT, breaker=breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limited_key_cools_down_and_the_call_moves_on(stub):
+    stub.requests_per_minute = 1
+    # Use up key-0's allowance at the provider behind the pool's back
+    assert pooled_llm(stub).call("hi") == "ok"
+
+    llm = pooled_llm(stub, keys=3)
+    assert llm.call("hi") == "ok"
+    keys = llm.pool.stats()["keys"]
+    assert keys["K0"]["rate_limited"] == 1 and keys["K0"]["cooling_down"]
+    assert stub.counts["key-0"]["rate_limited"] == 1
+    assert sum(stub.counts[f"key-{i}"]["ok"] for i in (1, 2)) == 1
+
+
+def test_only_429_responses_are_rate_limits():
+    import litellm
+
+    error = litellm.RateLimitError("Rate limit exceeded", llm_provider="openai", model="stub")
+    assert is_rate_limit_error(error)
+    assert not is_rate_limit_error(ConnectionError("connect to 10.0.0.1:4290 failed"))
+    assert not is_rate_limit_error(ValueError("request req_4291 returned no content"))
+
+
+def hedged_calls():
+    return sum(count for labels, count in LLM_HEDGES._series.items() if labels != (("winner", "none"),))
+
+
+def slow_then_fast_seed(slow_rate):
+    """A fault seed under which the first request to reach the stub is slow and the second is not."""
+    for seed in itertools.count():
+        rolls = random.Random(seed)
+        if rolls.random() < slow_rate <= rolls.random():
+            return seed
+
+
+def test_slow_call_is_hedged_on_another_key():
+    server = StubLLMServer(port=0, reply="ok", slow_rate=0.5, slow_latency=2.0, seed=slow_then_fast_seed(0.5))
+    server.start()
+    try:
+        llm = pooled_llm(server, keys=2)
+        for _ in range(llm.latencies.min_samples):
+            llm.latencies.observe(0.05)
+        hedged = hedged_calls()
+        started = time.monotonic()
+        assert llm.call("hi") == "ok"
+        # Whichever request reached the stub first was the slow one; the other answered
+        assert time.monotonic() - started < 1.5
+        assert hedged_calls() == hedged + 1
+        assert sum(counts["slow"] for counts in server.counts.values()) == 1
+        assert [counts["ok"] for _, counts in sorted(server.counts.items())] == [1, 1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_no_hedge_without_latency_history(stub):
+    llm = pooled_llm(stub, keys=2)
+    hedged = hedged_calls()
+    assert llm.call("hi") == "ok"
+    assert hedged_calls() == hedged
+    assert sum(counts["ok"] for counts in stub.counts.values()) == 1
+
+
+def test_programming_errors_are_raised_at_once_and_not_counted(stub):
+    breaker = CircuitBreaker(failure_threshold=1)
+    attempts = []
+
+    def broken(attempt):
+        attempts.append(attempt)
+        return None.execute_task()
+
+    with pytest.raises(AttributeError):
+        run_resilient(broken, "Test", attempts=3, backoff=NO_WAIT, breaker=breaker)
+    assert attempts == [1]
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_timed_out_attempts_are_capped_while_they_run(stub):
+    llm = pooled_llm(stub)
+    abandoned = AbandonedAttempts(limit=1)
+    stub.latency = 1.0
+    with pytest.raises(ProviderUnavailable, match="timed out"):
+        run_resilient(lambda attempt: llm.call("hi"), "Test", timeout=0.2, attempts=1, abandoned=abandoned)
+    assert abandoned.running == 1
+
+    # The hung call still holds its thread, so no new one is started
+    with pytest.raises(ProviderUnavailable, match="still running"):
+        run_resilient(lambda attempt: llm.call("hi"), "Test", timeout=0.2, abandoned=abandoned)
+    assert sum(counts["ok"] for counts in stub.counts.values()) == 1
+
+    deadline = time.monotonic() + 5
+    while abandoned.running and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert abandoned.running == 0
+    stub.latency = 0.0
+    assert run_resilient(lambda attempt: llm.call("hi"), "Test", timeout=2, abandoned=abandoned) == "ok"
@@ -0,0 +1,73 @@
+import sqlite3
+
+from my_shopping_agent.orders.ledger import OrderLedger
+
+
+ORDER = {
+    "status": "purchase_complete",
+    "order_id": "ORD-TEST-1",
+    "items": [
+        {"product": {"product_id": 9, "product_name": "Laptop", "price": 20000, "quality": "high"}, "quantity": 2},
+        {"product": {"product_id": 2, "product_name": "LCD", "price": 1000, "quality": "medium"}, "quantity": 1},
+    ],
+    "customer": {"name": "Ann", "address": "Street 1", "phone": "555"},
+    "payment_status": "completed",
+    "shipping_status": "processing",
+    "estimated_delivery": "soon",
+}
+
+
+def committed_rows(path):
+    """Rows another connection (or a process started after a crash) would see."""
+    with sqlite3.connect(str(path)) as db:
+        return db.execute("SELECT product_name, quantity FROM orders ORDER BY id").fetchall()
+
+
+def test_record_buffers_rows_by_default(workdir):
+    ledger = OrderLedger(workdir / "orders.db", flush_interval=60)
+    ledger.record(ORDER)
+    assert committed_rows(ledger.path) == []
+    ledger.flush()
+    assert committed_rows(ledger.path) == [("Laptop", 2), ("LCD", 1)]
+
+
+def test_record_with_commit_is_on_disk_when_it_returns(workdir):
+    ledger = OrderLedger(workdir / "orders.db", flush_interval=60)
+    rows = ledger.record(ORDER, commit=True)
+    assert len(rows) == 2
+    assert committed_rows(ledger.path) == [("Laptop", 2), ("LCD", 1)]
+
+
+def test_flow_commits_the_order_before_reporting_it_saved(scripted_flow, workdir):
+    flow = scripted_flow()
+    result = flow.save_cart_to_file(ORDER)
+    assert result["cart_update"] == "success"
+    assert committed_rows(workdir / "shopping_cart" / "orders.db") == [("Laptop", 2), ("LCD", 1)]
+
+
+def test_an_order_recorded_again_is_not_duplicated(workdir):
+    ledger = OrderLedger(workdir / "orders.db")
+    ledger.record(ORDER, commit=True)
+    assert ledger.record(ORDER, commit=True)
+    assert committed_rows(ledger.path) == [("Laptop", 2), ("LCD", 1)]
+
+
+def test_resumed_save_does_not_record_the_order_twice(scripted_flow, workdir):
+    # The session stopped after the order was committed but before the save was checkpointed
+    scripted_flow().save_cart_to_file(ORDER)
+    scripted_flow().save_cart_to_file(ORDER)
+    assert committed_rows(workdir / "shopping_cart" / "orders.db") == [("Laptop", 2), ("LCD", 1)]
+
+
+def test_ledgers_with_the_old_key_skip_recorded_orders_too(workdir):
+    path = workdir / "orders.db"
+    OrderLedger(path).close()
+    with sqlite3.connect(str(path)) as db:
+        # Recreate the table the way earlier versions keyed it
+        schema = db.execute("SELECT sql FROM sqlite_master WHERE name = 'orders'").fetchone()[0]
+        db.execute("DROP TABLE orders")
+        db.execute(schema.replace("UNIQUE (order_id, product_id)", "UNIQUE (order_id, product_id, created_at)"))
+    ledger = OrderLedger(path)
+    ledger.record(ORDER, commit=True)
+    ledger.record(ORDER, commit=True)
+    assert committed_rows(path) == [("Laptop", 2), ("LCD", 1)]
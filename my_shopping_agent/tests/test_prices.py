@@ -0,0 +1,59 @@
+import pytest
+
+from my_shopping_agent.catalog import get_search_engine, parse_price
+from my_shopping_agent.extraction.fast_path import RuleBasedExtractor
+
+
+@pytest.mark.parametrize("price, window", [
+    ("10-20k", (10000, 20000)),
+    ("10k-20k", (10000, 20000)),
+    ("10k-20", (20, 10000)),
+    ("500-2k", (500, 2000)),
+    ("between 10 and 20", (10, 20)),
+    ("under 5k", (0, 5000)),
+])
+def test_parse_price(price, window):
+    assert parse_price(price) == window
+
+
+@pytest.mark.parametrize("query, price", [
+    ("laptop 10-20k", "10000-20000"),
+    ("laptop between 10 and 20k", "10000-20000"),
+    ("laptop 500-2k", "500-2000"),
+    ("laptop under 25k", "0-25000"),
+])
+def test_fast_path_price(query, price):
+    details, _ = RuleBasedExtractor(get_search_engine()).extract(query)
+    assert details["price"] == price
+
+
+@pytest.mark.parametrize("query, accepted", [
+    ("watch", False),
+    ("high quality laptop", False),
+    ("watch under 500", True),
+    ("laptop 10-20k", True),
+])
+def test_fast_path_needs_valid_details(query, accepted):
+    extractor = RuleBasedExtractor(get_search_engine())
+    details, confidence = extractor.extract(query)
+    assert (confidence > 0) == details["is_valid"] == accepted
+    assert (extractor.try_extract(query) is not None) == accepted
+
+
+@pytest.mark.parametrize("query", [
+    "not high quality laptop under 20000",
+    "laptop except apple under 20000",
+    "laptop without apple under 20000",
+    "laptop and phone under 20000",
+    "laptop or phone under 20000",
+    "laptop phone under 20000",
+])
+def test_fast_path_leaves_negations_and_several_products_to_the_llm(query):
+    extractor = RuleBasedExtractor(get_search_engine())
+    assert extractor.extract(query)[1] == 0.0
+    assert extractor.try_extract(query) is None
+
+
+def test_fast_path_accepts_a_brand_with_its_product():
+    details = RuleBasedExtractor(get_search_engine()).try_extract("apple laptop under 20000")
+    assert details["product_name"] == "apple laptop"
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from my_shopping_agent.llm import ProductStreamParser
+
+
+PRODUCTS = [
+    {"product_id": 1, "product_name": "Laptop {pro}", "price": 20000, "tags": ["a", "b"]},
+    {"product_id": 2, "product_name": "Say \"hi\" watch", "price": 1000, "tags": []},
+    {"product_id": 3, "product_name": "Phone, [new]", "price": 30000, "tags": ["c"]},
+]
+REPLY = (
+    "Thought: I now know the final answer\n```json\n"
+    + json.dumps({"summary": "three", "products": PRODUCTS, "note": {"products": []}}, indent=2)
+    + "\n```"
+)
+
+
+def feed_in_chunks(parser, text, size):
+    """Products returned after each chunk, and the position in ``text`` each chunk ended at."""
+    completed = []
+    for start in range(0, len(text), size):
+        for product in parser.feed(text[start:start + size]):
+            completed.append((product, start + size))
+    return completed
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(REPLY)])
+def test_products_are_returned_once_each_whatever_the_chunking(size):
+    parser = ProductStreamParser()
+    completed = feed_in_chunks(parser, REPLY, size)
+    assert [product for product, _ in completed] == PRODUCTS
+    assert parser.products == PRODUCTS
+    assert parser.done
+
+
+def test_each_product_is_returned_as_soon_as_it_is_closed():
+    parser = ProductStreamParser()
+    completed = feed_in_chunks(parser, REPLY, 1)
+    first_closed = REPLY.index("}", REPLY.index('"tags": [\n        "a"')) + 1
+    assert completed[0][1] == first_closed
+    # The array ended before the rest of the reply, whose "products" key is ignored
+    assert parser.feed('{"products": [{"product_id": 9}]}') == []
+
+
+def test_trailing_commas_are_tolerated_and_duplicates_dropped():
+    parser = ProductStreamParser()
+    reply = '{"products": [{"product_id": 1, "price": 5,}, {"product_id": 1, "price": 5}, {"bad": }, {"product_id": 2}]}'
+    feed_in_chunks(parser, reply, 5)
+    assert parser.products == [
+        {"product_id": 1, "price": 5},
+        {"product_id": 2},
+    ]